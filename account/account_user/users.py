@@ -1,6 +1,6 @@
 from enum import auto, StrEnum
 from bank_accounts import BankAccount
-from typing import List, Tuple, Dict
+from typing import List, Set, Tuple
 
 
 class UserType(StrEnum):
@@ -10,6 +10,8 @@ class UserType(StrEnum):
 
 
 class User:
+    __slots__ = ('_username', 'user_type', 'user_id', 'assigned_account', 'assigned_expense', '_password_hash')
+
     def __init__(self, username: str, user_type: UserType, user_id: int):
         self._username = ""
         self.username = username
@@ -17,7 +19,7 @@ class User:
         self.user_id = user_id
 
         self.assigned_account: List[int] = []
-        self.assigned_expense: Dict[int,bool] = {}
+        self.assigned_expense: Set[int] = set()
 
         self._password_hash = ""
 
@@ -53,14 +55,14 @@ class User:
     def add_expense(self, expense: int) -> bool:
         if expense in self.assigned_expense:
             return False
-        self.assigned_expense[expense] = True
+        self.assigned_expense.add(expense)
         return True
 
     def get_assigned_account(self) -> List[int]:
         return self.assigned_account
 
     def get_assigned_expense(self) -> List[int]:
-        return list(self.assigned_expense.keys())
+        return sorted(self.assigned_expense)
 
     def __str__(self):
         return (f"User ID: {self.user_id}, Username: {self.username}, Type: {self.user_type.value.capitalize()}\n"
@@ -1,9 +1,12 @@
 from datetime import datetime
-from typing import List
+from typing import Set
 from decimal import Decimal
 
 
 class BankAccount:
+    __slots__ = ('account_id', 'user_id', 'account_type', 'balance', 'is_active',
+                 'assigned_expense_ids', '_creation_date')
+
     def __init__(self, account_id: int, user_id: int, account_type: str,
                  initial_balance: Decimal, is_active: bool = True ):
         self.account_id = account_id
@@ -12,7 +15,7 @@ class BankAccount:
         self.balance: Decimal = initial_balance
         self.is_active = is_active
 
-        self.assigned_expense_ids: List[int] = []
+        self.assigned_expense_ids: Set[int] = set()
 
         self._creation_date: datetime = datetime.today()
 
@@ -39,7 +42,7 @@ class BankAccount:
 
     def add_expense_id(self, expense_id: int) -> bool:
         if expense_id not in self.assigned_expense_ids:
-            self.assigned_expense_ids.append(expense_id)
+            self.assigned_expense_ids.add(expense_id)
             print(f"Expense added to account")
             return True
         return False
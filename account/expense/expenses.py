@@ -15,6 +15,8 @@ class Category(StrEnum):
 
 
 class Expense:
+    __slots__ = ('category', 'account_id', 'date', '_expense_id', 'amount', 'description')
+
     def __init__(self, amount, category, account_id, expense_id, description: Optional[str] = ''):
         self.category: Category = category
         self.account_id = account_id
@@ -0,0 +1,303 @@
+"""
+Tests for the command-line budget (main.py and the account package).
+
+Run from the repository root:
+    python -m unittest account.tests
+"""
+import json
+import os
+import sys
+import unittest
+from contextlib import redirect_stdout
+from datetime import date, datetime
+from io import StringIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import mock
+
+# The CLI modules import bank_accounts and expenses as top-level modules.
+ROOT = Path(__file__).resolve().parent.parent
+for folder in ('account/bank_account', 'account/expense'):
+    if str(ROOT / folder) not in sys.path:
+        sys.path.insert(0, str(ROOT / folder))
+
+import main  # noqa: E402
+from account.utils import columnar  # noqa: E402
+from account.utils.columnar import ColumnarSnapshot, ExpenseStore  # noqa: E402
+from account.utils.journal import Journal  # noqa: E402
+
+
+class CLITestCase(unittest.TestCase):
+    def setUp(self):
+        directory = TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.snapshot_path = os.path.join(self.directory, 'budget_data.json')
+        self.journal_path = os.path.join(self.directory, 'budget_data.journal')
+
+    def open_interface(self):
+        interface = main.Interface(load=False)
+        interface.journal = Journal(self.snapshot_path, self.journal_path, default=main.default_serializer)
+        self.addCleanup(interface.journal.close)
+        with redirect_stdout(StringIO()):
+            interface.load_data()
+        return interface
+
+    def answer(self, method, *answers):
+        """Run an interactive method with the given replies to input(); return what it printed."""
+        with mock.patch('builtins.input', side_effect=answers), redirect_stdout(StringIO()) as output:
+            method()
+        return output.getvalue()
+
+    def register(self, interface, username):
+        self.answer(interface.create_new_user_interface, username, 'secret-pass', 'secret-pass')
+        self.answer(interface.add_existing_account_interface, 'adult', '500.00')
+        return interface.get_current_user()
+
+    def add_expense(self, interface, amount, category='food', description=''):
+        account_id = interface.get_current_user().assigned_account[0]
+        self.answer(interface.add_new_expense_interface, str(account_id), amount, category, description)
+
+    def compact(self, interface):
+        with redirect_stdout(StringIO()):
+            interface.save_data()
+
+    def state(self, interface):
+        return json.loads(json.dumps(interface.snapshot(), default=main.default_serializer))
+
+
+class JournalTests(CLITestCase):
+    def test_replays_journal_over_snapshot(self):
+        interface = self.open_interface()
+        user = self.register(interface, 'anna')
+        self.add_expense(interface, '20.00')
+        self.compact(interface)
+        self.add_expense(interface, '30.00', 'bills', 'Electricity')
+        self.assertEqual(interface.journal.pending, 1)
+
+        reloaded = self.open_interface()
+        self.assertEqual(self.state(reloaded), self.state(interface))
+        account = reloaded.all_bank_accounts[user.assigned_account[0]]
+        self.assertEqual(str(account.balance), '450.00')
+        self.assertEqual(sorted(reloaded.get_current_user().assigned_expense), [1, 2])
+        self.assertEqual(reloaded.all_expenses[2].description, 'Electricity')
+
+    def test_ignores_a_torn_final_line(self):
+        interface = self.open_interface()
+        self.register(interface, 'anna')
+        self.add_expense(interface, '20.00')
+        expected = self.state(interface)
+        interface.journal.close()
+        with open(self.journal_path, 'a') as f:
+            f.write('{"op": "add_expense", "expense": {"amou')
+
+        reloaded = self.open_interface()
+        self.assertEqual(self.state(reloaded), expected)
+        self.assertEqual(reloaded.journal.pending, 4)
+
+    def test_compaction_empties_journal_and_keeps_state(self):
+        interface = self.open_interface()
+        self.register(interface, 'anna')
+        self.add_expense(interface, '20.00')
+        self.register(interface, 'bartek')
+        self.add_expense(interface, '5.50', 'transport')
+        expected = self.state(interface)
+
+        self.compact(interface)
+        self.assertEqual(os.path.getsize(self.journal_path), 0)
+        self.assertFalse(os.path.exists(self.snapshot_path + '.tmp'))
+        with open(self.snapshot_path) as f:
+            self.assertEqual(json.load(f), expected)
+        self.assertEqual(self.state(self.open_interface()), expected)
+
+    def test_compacts_after_enough_entries(self):
+        interface = self.open_interface()
+        interface.journal.compact_every = 3
+        with redirect_stdout(StringIO()):
+            self.register(interface, 'anna')
+        self.assertTrue(os.path.exists(self.snapshot_path))
+        self.assertLess(interface.journal.pending, 3)
+
+
+class UsernameIndexTests(CLITestCase):
+    def test_lookup_ignores_case_and_spaces(self):
+        interface = self.open_interface()
+        anna = self.register(interface, 'Anna')
+        bartek = self.register(interface, 'bartek')
+        self.assertIs(interface.find_user_by_username('anna'), anna)
+        self.assertIs(interface.find_user_by_username('  BARTEK '), bartek)
+        self.assertIsNone(interface.find_user_by_username('celina'))
+
+    def test_index_is_rebuilt_on_load(self):
+        self.register(self.open_interface(), 'Anna')
+        reloaded = self.open_interface()
+        self.assertEqual(reloaded.user_ids_by_name, {'anna': 1})
+
+    def test_taken_username_is_refused(self):
+        interface = self.open_interface()
+        self.register(interface, 'Anna')
+        output = self.answer(
+            interface.create_new_user_interface, 'ANNA', 'anna2', 'secret-pass', 'secret-pass',
+        )
+        self.assertIn('Username taken.', output)
+        self.assertEqual(sorted(interface.user_ids_by_name), ['anna', 'anna2'])
+
+
+class ColumnarSnapshotTests(CLITestCase):
+    def setUp(self):
+        super().setUp()
+        self.binary_path = os.path.join(self.directory, 'budget_data.bin')
+        self.interface = self.open_interface()
+        self.anna = self.register(self.interface, 'anna')
+        self.bartek = self.register(self.interface, 'bartek')  # no expenses
+        self.celina = self.register(self.interface, 'celina')
+        for day in range(1, 13):
+            for user in (self.anna, self.celina):
+                self.interface.current_user_id = user.user_id
+                self.add_expense(self.interface, f'{day}.25', 'bills' if day % 3 else 'food', f'day {day}')
+                self.interface.all_expenses[self.interface.next_expense_id - 1].date = datetime(2025, 1, day, 12)
+
+    def write_binary(self):
+        with open(self.binary_path, 'wb') as f:
+            columnar.write(self.interface.snapshot(), f)
+
+    def open_snapshot(self):
+        snapshot = ColumnarSnapshot(self.binary_path)
+        self.addCleanup(snapshot.close)
+        return snapshot
+
+    def open_binary_interface(self):
+        interface = main.Interface(load=False)
+        interface.journal = Journal(self.binary_path, self.journal_path + '.binary', default=main.default_serializer,
+                                    reader=columnar.read, writer=columnar.write)
+        self.addCleanup(interface.journal.close)
+        with redirect_stdout(StringIO()):
+            interface.load_data()
+        self.addCleanup(interface.all_expenses.snapshot.close)
+        return interface
+
+    def rows(self, objects):
+        return [main.default_serializer(obj) for obj in objects]
+
+    def test_write_then_read(self):
+        self.write_binary()
+        snapshot = self.open_snapshot()
+        self.assertEqual(
+            [(user.user_id, user.username, user.user_type, user._password_hash) for user in snapshot.users()],
+            [(user.user_id, user.username, user.user_type, user._password_hash)
+             for user in self.interface.all_users.values()],
+        )
+        self.assertEqual(
+            [(account.account_id, account.user_id, account.balance, account.get_creation_date())
+             for account in snapshot.bank_accounts()],
+            [(account.account_id, account.user_id, account.balance, account.get_creation_date())
+             for account in self.interface.all_bank_accounts.values()],
+        )
+        self.assertEqual(self.rows(ExpenseStore(snapshot).values()), self.rows(self.interface.all_expenses.values()))
+        self.assertEqual(snapshot.meta['next_expense_id'], 25)
+
+    def test_lookup_by_id(self):
+        self.write_binary()
+        store = ExpenseStore(self.open_snapshot())
+        self.assertEqual(len(store), 24)
+        self.assertEqual(store[1].description, 'day 1')
+        self.assertEqual(store[24].amount, store[23].amount)
+        self.assertNotIn(0, store)
+        self.assertNotIn(25, store)
+        with self.assertRaises(KeyError):
+            store[25]
+
+    def test_expenses_per_user(self):
+        self.write_binary()
+        interface = self.open_binary_interface()
+        self.assertIsInstance(interface.all_expenses, ExpenseStore)
+        for user in (self.anna, self.bartek, self.celina):  # first, empty and last user
+            with self.subTest(user=user.username):
+                self.assertEqual(
+                    self.rows(interface.iter_user_expenses(interface.all_users[user.user_id])),
+                    self.rows(self.interface.iter_user_expenses(user)),
+                )
+        self.assertEqual(list(interface.iter_user_expenses(interface.all_users[self.bartek.user_id])), [])
+        self.assertEqual(
+            [expense.expense_id for expense in interface.iter_user_expenses(interface.all_users[self.celina.user_id])],
+            list(range(2, 25, 2)),
+        )
+
+    def test_new_expenses_on_top_of_the_snapshot(self):
+        self.write_binary()
+        interface = self.open_binary_interface()
+        interface.current_user_id = self.bartek.user_id
+        self.add_expense(interface, '7.00')
+        self.assertEqual(
+            [expense.expense_id for expense in interface.iter_user_expenses(interface.get_current_user())], [25],
+        )
+
+    def test_json_binary_json_round_trip(self):
+        self.compact(self.interface)
+        converted = os.path.join(self.directory, 'converted.json')
+        columnar.json_to_binary(self.snapshot_path, self.binary_path)
+        columnar.binary_to_json(self.binary_path, converted)
+        with open(self.snapshot_path) as original, open(converted) as f:
+            self.assertEqual(json.load(f), json.load(original))
+
+    def test_truncated_or_corrupt_files_are_refused(self):
+        self.write_binary()
+        with open(self.binary_path, 'rb') as f:
+            data = f.read()
+        damaged = {
+            'empty': b'',
+            'magic only': data[:len(columnar.MAGIC)],
+            'cut in the header': data[:40],
+            'cut in the columns': data[:-5],
+            'wrong magic': b'NOTBUDGT' + data[8:],
+            'garbled header': data[:20] + b'\xff' * 8 + data[28:],
+        }
+        for name, content in damaged.items():
+            with self.subTest(name):
+                with open(self.binary_path, 'wb') as f:
+                    f.write(content)
+                with self.assertRaisesRegex(ValueError, 'truncated or corrupt|not a columnar budget snapshot'):
+                    ExpenseStore(ColumnarSnapshot(self.binary_path))
+
+
+@mock.patch.object(main, 'EXPENSE_PAGE_SIZE', 5)
+class ExpenseHistoryTests(CLITestCase):
+    def setUp(self):
+        super().setUp()
+        self.interface = self.open_interface()
+        self.user = self.register(self.interface, 'anna')
+        for day in range(1, 11):
+            self.add_expense(self.interface, '1.00', description=f'day {day}')
+            self.interface.all_expenses[self.interface.next_expense_id - 1].date = datetime(2025, 1, day, 9)
+
+    def listed(self, output):
+        return [int(line.split(' | ')[0][len('ID: '):]) for line in output.splitlines() if line.startswith('ID: ')]
+
+    def test_date_filter_is_inclusive(self):
+        expenses = self.interface.iter_user_expenses(self.user, date(2025, 1, 3), date(2025, 1, 5))
+        self.assertEqual([expense.expense_id for expense in expenses], [3, 4, 5])
+        self.assertEqual(len(list(self.interface.iter_user_expenses(self.user, start=date(2025, 1, 10)))), 1)
+        self.assertEqual(len(list(self.interface.iter_user_expenses(self.user, end=date(2024, 12, 31)))), 0)
+
+    def test_full_pages_do_not_prompt_past_the_end(self):
+        # Ten expenses are exactly two pages: one prompt between them and none after.
+        output = self.answer(self.interface.show_user_expenses_interface, '', '', '')
+        self.assertEqual(self.listed(output), list(range(1, 11)))
+        self.assertEqual(output.count('Description: '), 10)
+
+    def test_partial_last_page(self):
+        output = self.answer(self.interface.show_user_expenses_interface, '2025-01-02', '', '')
+        self.assertEqual(self.listed(output), list(range(2, 11)))
+
+    def test_stop_after_first_page(self):
+        output = self.answer(self.interface.show_user_expenses_interface, '', '', 'q')
+        self.assertEqual(self.listed(output), [1, 2, 3, 4, 5])
+
+    def test_no_expenses_in_range(self):
+        output = self.answer(self.interface.show_user_expenses_interface, '2026-01-01', '2026-01-31')
+        self.assertIn('No expenses found for the selected dates.', output)
+
+    def test_invalid_date_is_asked_again(self):
+        output = self.answer(self.interface.show_user_expenses_interface, '31.01.2025', '2025-01-09', '')
+        self.assertIn('Incorrect format.', output)
+        self.assertEqual(self.listed(output), [9, 10])
@@ -0,0 +1,419 @@
+"""
+Binary columnar snapshot for the CLI data store.
+
+Layout: MAGIC, a little-endian uint64 header length, a JSON header and then
+one 8-byte aligned blob per column. Integer columns are packed native arrays
+(amounts in integer grosze, categories and user types as small ints whose
+names live in the header). String columns are an offsets array plus a UTF-8
+blob. Expenses are written in ascending id order so a lookup is a bisect over
+the memory-mapped id column; nothing is decoded until a row is asked for.
+
+    python -m account.utils.columnar to-binary budget_data.json budget_data.bin
+    python -m account.utils.columnar to-json budget_data.bin budget_data.json
+"""
+import argparse
+import bisect
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections.abc import MutableMapping
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Any, BinaryIO, Dict, Iterator, Optional
+
+from account.account_user.users import User, UserType
+from bank_accounts import BankAccount
+from expenses import Category, Expense
+
+MAGIC = b'BUDGCOL1'
+VERSION = 1
+EPOCH = datetime(1970, 1, 1)
+CATEGORIES = [category.value for category in Category]
+USER_TYPES = [user_type.value for user_type in UserType]
+
+SCHEMA = {
+    'users': [
+        ('user_id', 'q'), ('user_type', 'b'), ('username', 'str'), ('password_hash', 'str'),
+    ],
+    'bank_accounts': [
+        ('account_id', 'q'), ('user_id', 'q'), ('account_type', 'str'), ('balance', 'q'),
+        ('is_active', 'b'), ('created', 'q'),
+    ],
+    'expenses': [
+        ('expense_id', 'q'), ('account_id', 'q'), ('user_id', 'q'), ('amount', 'q'),
+        ('category', 'b'), ('date', 'q'), ('description', 'str'),
+    ],
+}
+
+
+def to_grosze(amount) -> int:
+    cents = Decimal(str(amount)) * 100
+    if cents != cents.to_integral_value():
+        raise ValueError(f"Amount {amount} has more than two decimal places.")
+    return int(cents)
+
+
+def from_grosze(value: int) -> Decimal:
+    return Decimal(value).scaleb(-2)
+
+
+def to_micros(value) -> int:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+def from_micros(value: int) -> datetime:
+    return EPOCH + timedelta(microseconds=value)
+
+
+class _StringColumn:
+    def __init__(self):
+        self.offsets = array('q', [0])
+        self.data = bytearray()
+
+    def append(self, value: Optional[str]):
+        self.data += (value or '').encode('utf-8')
+        self.offsets.append(len(self.data))
+
+
+def _columns_for(table):
+    return {name: _StringColumn() if kind == 'str' else array(kind) for name, kind in SCHEMA[table]}
+
+
+def write(snapshot: Dict[str, Any], f: BinaryIO) -> None:
+    """Write a snapshot dict (the same shape Interface.snapshot() returns) in columnar form."""
+    users = _columns_for('users')
+    for user in snapshot['users']:
+        users['user_id'].append(user.user_id)
+        users['user_type'].append(USER_TYPES.index(UserType(user.user_type).value))
+        users['username'].append(user.username)
+        users['password_hash'].append(user._password_hash)
+
+    owners = {}
+    accounts = _columns_for('bank_accounts')
+    for account in snapshot['bank_accounts']:
+        owners[account.account_id] = account.user_id
+        accounts['account_id'].append(account.account_id)
+        accounts['user_id'].append(account.user_id)
+        accounts['account_type'].append(account.account_type)
+        accounts['balance'].append(to_grosze(account.balance))
+        accounts['is_active'].append(int(account.is_active))
+        accounts['created'].append(to_micros(account.get_creation_date()))
+
+    expenses = _columns_for('expenses')
+    last_id = None
+    for expense in snapshot['expenses']:
+        if last_id is not None and expense.expense_id <= last_id:
+            raise ValueError('Expenses must be written in ascending id order.')
+        last_id = expense.expense_id
+        expenses['expense_id'].append(expense.expense_id)
+        expenses['account_id'].append(expense.account_id)
+        expenses['user_id'].append(owners.get(expense.account_id, 0))
+        expenses['amount'].append(to_grosze(expense.amount))
+        expenses['category'].append(CATEGORIES.index(Category(expense.category).value))
+        expenses['date'].append(to_micros(expense.date))
+        expenses['description'].append(expense.description)
+
+    tables = {'users': users, 'bank_accounts': accounts, 'expenses': expenses}
+    blobs = []
+    header = {
+        'version': VERSION,
+        'byteorder': sys.byteorder,
+        'enums': {'category': CATEGORIES, 'user_type': USER_TYPES},
+        'meta': {key: snapshot.get(key) for key in
+                 ('current_user_id', 'next_user_id', 'next_account_id', 'next_expense_id')},
+        'tables': {},
+    }
+    for table, columns in tables.items():
+        rows = len(columns[SCHEMA[table][0][0]])
+        header['tables'][table] = {'rows': rows, 'columns': {}}
+        for name, column in columns.items():
+            if isinstance(column, _StringColumn):
+                header['tables'][table]['columns'][name] = {
+                    'kind': 'str', 'offsets': len(blobs), 'data': len(blobs) + 1,
+                }
+                blobs += [column.offsets.tobytes(), bytes(column.data)]
+            else:
+                header['tables'][table]['columns'][name] = {'kind': column.typecode, 'blob': len(blobs)}
+                blobs.append(column.tobytes())
+
+    # Blob positions depend on the header length, which depends on the positions,
+    # so lay the blobs out after a header with 32 spare bytes per position.
+    positions = []
+    encoded = json.dumps({**header, 'blobs': [[0, 0]] * len(blobs)}).encode()
+    start = _align(len(MAGIC) + 8 + len(encoded) + 32 * len(blobs))
+    for blob in blobs:
+        positions.append([start, len(blob)])
+        start = _align(start + len(blob))
+    encoded = json.dumps({**header, 'blobs': positions}).encode()
+
+    f.write(MAGIC)
+    f.write(struct.pack('<Q', len(encoded)))
+    f.write(encoded)
+    written = len(MAGIC) + 8 + len(encoded)
+    if positions and written > positions[0][0]:
+        raise ValueError('Snapshot header outgrew its reserved space.')
+    for (position, size), blob in zip(positions, blobs):
+        f.write(b'\0' * (position - written))
+        f.write(blob)
+        written = position + size
+
+
+def _align(position: int) -> int:
+    return (position + 7) & ~7
+
+
+class ColumnarSnapshot:
+    """A memory-mapped snapshot; columns are memoryviews into the file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._open()
+        except Exception:
+            self._file.close()
+            raise
+        self.meta = self.header['meta']
+        self.categories = [Category(value) for value in self.header['enums']['category']]
+        self.user_types = [UserType(value) for value in self.header['enums']['user_type']]
+        self._view = memoryview(self._map)
+
+    def _open(self) -> None:
+        if os.fstat(self._file.fileno()).st_size < len(MAGIC) + 8:
+            raise ValueError(f"{self.path} is not a columnar budget snapshot.")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if self._map[:len(MAGIC)] != MAGIC:
+                raise ValueError(f"{self.path} is not a columnar budget snapshot.")
+            (header_length,) = struct.unpack_from('<Q', self._map, len(MAGIC))
+            start = len(MAGIC) + 8
+            if start + header_length > len(self._map):
+                raise self._corrupt()
+            try:
+                self.header = json.loads(self._map[start:start + header_length])
+            except ValueError:
+                raise self._corrupt() from None
+            if self.header['byteorder'] != sys.byteorder:
+                raise ValueError('Snapshot was written on a machine with a different byte order.')
+            for position, size in self.header['blobs']:
+                if position + size > len(self._map):
+                    raise self._corrupt()
+        except Exception:
+            self._map.close()
+            raise
+
+    def _corrupt(self) -> ValueError:
+        return ValueError(f"{self.path} is truncated or corrupt.")
+
+    def _blob(self, index: int) -> memoryview:
+        position, size = self.header['blobs'][index]
+        return self._view[position:position + size]
+
+    def rows(self, table: str) -> int:
+        return self.header['tables'][table]['rows']
+
+    def column(self, table: str, name: str):
+        rows = self.rows(table)
+        spec = self.header['tables'][table]['columns'][name]
+        try:
+            if spec['kind'] == 'str':
+                column = _StringView(self._blob(spec['offsets']).cast('q'), self._blob(spec['data']))
+                if len(column) != rows or (rows and column.offsets[-1] > len(column.data)):
+                    raise self._corrupt()
+            else:
+                column = self._blob(spec['blob']).cast(spec['kind'])
+                if len(column) != rows:
+                    raise self._corrupt()
+        except TypeError:
+            # cast() refuses a blob whose size is not a multiple of the item size.
+            raise self._corrupt() from None
+        return column
+
+    def users(self) -> Iterator[User]:
+        ids, types = self.column('users', 'user_id'), self.column('users', 'user_type')
+        names, hashes = self.column('users', 'username'), self.column('users', 'password_hash')
+        for row in range(self.rows('users')):
+            user = User(username=names[row], user_type=self.user_types[types[row]], user_id=ids[row])
+            user.set_password_hash(hashes[row])
+            yield user
+
+    def bank_accounts(self) -> Iterator[BankAccount]:
+        columns = {name: self.column('bank_accounts', name) for name, _ in SCHEMA['bank_accounts']}
+        for row in range(self.rows('bank_accounts')):
+            account = BankAccount(
+                account_id=columns['account_id'][row],
+                user_id=columns['user_id'][row],
+                account_type=columns['account_type'][row],
+                initial_balance=from_grosze(columns['balance'][row]),
+                is_active=bool(columns['is_active'][row]),
+            )
+            account._creation_date = from_micros(columns['created'][row])
+            yield account
+
+    def close(self) -> None:
+        self._view.release()
+        self._map.close()
+        self._file.close()
+
+
+class _StringView:
+    def __init__(self, offsets: memoryview, data: memoryview):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row: int) -> str:
+        return bytes(self.data[self.offsets[row]:self.offsets[row + 1]]).decode('utf-8')
+
+
+class ExpenseStore(MutableMapping):
+    """
+    expense_id -> Expense over a mapped expenses table plus in-memory additions.
+
+    Rows from the file are decoded on every access, so treat them as read-only
+    values; changes go through Interface and the journal.
+    """
+
+    def __init__(self, snapshot: Optional[ColumnarSnapshot] = None):
+        self.snapshot = snapshot
+        self.added: Dict[int, Expense] = {}
+        if snapshot is not None:
+            self.columns = {name: snapshot.column('expenses', name) for name, _ in SCHEMA['expenses']}
+            self.ids = self.columns['expense_id']
+        else:
+            self.columns = {}
+            self.ids = ()
+
+    def _row(self, expense_id: int) -> Optional[int]:
+        row = bisect.bisect_left(self.ids, expense_id)
+        if row < len(self.ids) and self.ids[row] == expense_id:
+            return row
+        return None
+
+    def expense_at(self, row: int) -> Expense:
+        columns = self.columns
+        expense = Expense(
+            amount=from_grosze(columns['amount'][row]),
+            category=self.snapshot.categories[columns['category'][row]],
+            account_id=columns['account_id'][row],
+            expense_id=columns['expense_id'][row],
+            description=columns['description'][row],
+        )
+        expense.date = from_micros(columns['date'][row])
+        return expense
+
+    def __getitem__(self, expense_id: int) -> Expense:
+        if expense_id in self.added:
+            return self.added[expense_id]
+        row = self._row(expense_id)
+        if row is None:
+            raise KeyError(expense_id)
+        return self.expense_at(row)
+
+    def __setitem__(self, expense_id: int, expense: Expense) -> None:
+        self.added[expense_id] = expense
+
+    def __delitem__(self, expense_id: int) -> None:
+        if self._row(expense_id) is not None:
+            raise TypeError('Expenses stored in the snapshot cannot be deleted.')
+        del self.added[expense_id]
+
+    def __contains__(self, expense_id) -> bool:
+        return expense_id in self.added or self._row(expense_id) is not None
+
+    def __iter__(self) -> Iterator[int]:
+        yield from self.ids
+        yield from sorted(self.added)
+
+    def __len__(self) -> int:
+        return len(self.ids) + len(self.added)
+
+    def max_id(self) -> int:
+        return max(self.ids[-1] if len(self.ids) else 0, max(self.added, default=0))
+
+    def iter_user_expenses(self, user_id: int, start: Optional[date] = None,
+                           end: Optional[date] = None) -> Iterator[Expense]:
+        """
+        Yield a user's mapped expenses in id order, decoding only matching rows.
+        Date bounds are compared on the raw microsecond column.
+        """
+        if self.snapshot is None:
+            return
+        low = to_micros(datetime.combine(start, time.min)) if start else None
+        high = to_micros(datetime.combine(end, time.max)) if end else None
+        owners, dates = self.columns['user_id'], self.columns['date']
+        for row in range(len(self.ids)):
+            if owners[row] != user_id:
+                continue
+            if (low is not None and dates[row] < low) or (high is not None and dates[row] > high):
+                continue
+            yield self.expense_at(row)
+
+
+def read(path: str) -> ColumnarSnapshot:
+    return ColumnarSnapshot(path)
+
+
+def json_to_binary(source: str, target: str) -> None:
+    import main  # the restore_* helpers live on Interface
+
+    interface = main.Interface(load=False)
+    with open(source, 'r') as f:
+        interface.load_snapshot(json.load(f))
+    snapshot = interface.snapshot()
+    snapshot['expenses'] = sorted(snapshot['expenses'], key=lambda expense: expense.expense_id)
+    with open(target, 'wb') as f:
+        write(snapshot, f)
+
+
+def _to_dict(snapshot: ColumnarSnapshot) -> Dict[str, Any]:
+    store = ExpenseStore(snapshot)
+    users = {user.user_id: user for user in snapshot.users()}
+    accounts = {account.account_id: account for account in snapshot.bank_accounts()}
+    for account in accounts.values():
+        if account.account_id not in users[account.user_id].assigned_account:
+            users[account.user_id].assigned_account.append(account.account_id)
+    owners, paid_from = store.columns['user_id'], store.columns['account_id']
+    for row, expense_id in enumerate(store.ids):
+        if owners[row] in users:
+            users[owners[row]].assigned_expense.add(expense_id)
+        if paid_from[row] in accounts:
+            accounts[paid_from[row]].assigned_expense_ids.add(expense_id)
+    return {
+        'users': list(users.values()),
+        'bank_accounts': list(accounts.values()),
+        'expenses': [store.expense_at(row) for row in range(len(store.ids))],
+        **snapshot.meta,
+    }
+
+
+def binary_to_json(source: str, target: str) -> None:
+    import main
+
+    snapshot = ColumnarSnapshot(source)
+    try:
+        # Decoded in a helper so no view into the mapping outlives it when it closes.
+        data = _to_dict(snapshot)
+    finally:
+        snapshot.close()
+    with open(target, 'w') as f:
+        json.dump(data, f, indent=4, default=main.default_serializer)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Convert CLI snapshots between JSON and columnar binary.')
+    parser.add_argument('direction', choices=['to-binary', 'to-json'])
+    parser.add_argument('source')
+    parser.add_argument('target')
+    args = parser.parse_args()
+    if args.direction == 'to-binary':
+        json_to_binary(args.source, args.target)
+    else:
+        binary_to_json(args.source, args.target)
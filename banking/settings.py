@@ -44,6 +44,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'budget.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -51,6 +52,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'budget.profiling.SQLProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'banking.urls'
@@ -84,6 +86,92 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+# Per-process by default; point CACHE_LOCATION at a directory to share a file cache between workers.
+
+if os.getenv('CACHE_LOCATION'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv('CACHE_LOCATION'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'budget',
+        }
+    }
+
+BUDGET_CACHE_TIMEOUT = int(os.getenv('BUDGET_CACHE_TIMEOUT', 300))
+
+
+# Per-request SQL profiling (budget.profiling.SQLProfilingMiddleware)
+
+BUDGET_SQL_PROFILING = os.getenv('BUDGET_SQL_PROFILING', '') == '1'
+# Requests above either limit are logged with their most expensive queries
+BUDGET_SQL_PROFILING_MAX_QUERIES = int(os.getenv('BUDGET_SQL_PROFILING_MAX_QUERIES', 20))
+BUDGET_SQL_PROFILING_MAX_MS = float(os.getenv('BUDGET_SQL_PROFILING_MAX_MS', 100))
+# Requests per view kept for the rolling summary
+BUDGET_SQL_PROFILING_WINDOW = int(os.getenv('BUDGET_SQL_PROFILING_WINDOW', 200))
+
+
+# Prometheus metrics at /metrics (budget.metrics)
+
+BUDGET_METRICS = os.getenv('BUDGET_METRICS', '1') == '1'
+# Shared directory for multi-worker deployments; every worker writes its own file there
+BUDGET_METRICS_DIR = os.getenv('BUDGET_METRICS_DIR')
+BUDGET_METRICS_FLUSH_SECONDS = float(os.getenv('BUDGET_METRICS_FLUSH_SECONDS', 5))
+# When set, scrapers must send "Authorization: Bearer <token>"
+BUDGET_METRICS_TOKEN = os.getenv('BUDGET_METRICS_TOKEN')
+
+
+# JSON API (budget.api)
+
+BUDGET_API_PAGE_SIZE = int(os.getenv('BUDGET_API_PAGE_SIZE', 100))
+BUDGET_API_MAX_PAGE_SIZE = int(os.getenv('BUDGET_API_MAX_PAGE_SIZE', 1000))
+# Most items one POST may create, update and delete together
+BUDGET_API_MAX_BATCH = int(os.getenv('BUDGET_API_MAX_BATCH', 5000))
+# Rows per INSERT/UPDATE statement inside a batch
+BUDGET_API_WRITE_BATCH = int(os.getenv('BUDGET_API_WRITE_BATCH', 500))
+
+
+# Async views (budget.async_views)
+
+# Serve the dashboard, statistics and account pages with async views. Meant for
+# ASGI deployments only: under WSGI and runserver every ORM call of an async view
+# pays for a hop to a worker thread, which makes those pages slower.
+BUDGET_ASYNC_VIEWS = os.getenv('BUDGET_ASYNC_VIEWS', '0') == '1'
+
+
+# Background tasks (budget.tasks, run by `manage.py run_tasks`)
+
+# Private directory for uploaded imports and generated reports
+BUDGET_TASK_FILES_DIR = os.getenv('BUDGET_TASK_FILES_DIR', str(BASE_DIR / 'task_files'))
+# A running task whose worker has not checked in for this long is retried or failed
+BUDGET_TASK_TIMEOUT = int(os.getenv('BUDGET_TASK_TIMEOUT', 600))
+# Uploads larger than this are imported by a worker instead of inside the request
+BUDGET_TASK_INLINE_IMPORT_BYTES = int(os.getenv('BUDGET_TASK_INLINE_IMPORT_BYTES', 1024 * 1024))
+# Finished tasks and their files are deleted after this many days
+BUDGET_TASK_KEEP_DAYS = int(os.getenv('BUDGET_TASK_KEEP_DAYS', 7))
+
+
+# Categories every new user starts with
+
+BUDGET_DEFAULT_CATEGORIES = [
+    'Food',
+    'Bills',
+    'Transport',
+    'Entertainment',
+    'Shopping',
+    'Life',
+    'Investments',
+    'Other',
+]
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
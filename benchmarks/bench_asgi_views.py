@@ -0,0 +1,142 @@
+"""
+Throughput of the dashboard, statistics and account pages under uvicorn:
+the sync views (BUDGET_ASYNC_VIEWS=0) versus the async ones.
+
+Seeds a throwaway user in the configured database, starts uvicorn once per
+mode and fires concurrent keep-alive requests at each page. The database
+must be migrated and reachable from a second process (a file or a server,
+not an in-memory SQLite). The load generator runs on the same machine, so
+compare the two modes with each other rather than with production numbers.
+
+Run from the repository root (needs `pip install uvicorn`):
+    python benchmarks/bench_asgi_views.py --transactions 20000 --concurrency 32 --requests 2000
+"""
+import argparse
+import http.client
+import importlib.util
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'banking.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.test import Client  # noqa: E402
+
+from budget.management.commands.benchmark_views import percentile  # noqa: E402
+from budget.seeding import BudgetSeeder  # noqa: E402
+
+PREFIX = 'asgi-bench-'
+PATHS = ['/budget/', '/budget/statistics/', '/budget/account/']
+
+
+def drop_users():
+    get_user_model().objects.filter(username__startswith=PREFIX).delete()
+
+
+def seed(transactions):
+    """Seed the benchmark user and return a session cookie for it."""
+    drop_users()
+    user = BudgetSeeder(seed=1).seed_users(1, transactions, prefix=PREFIX)[0]
+    client = Client()
+    client.force_login(user)
+    return client.cookies[settings.SESSION_COOKIE_NAME].value
+
+
+def start_server(mode, port, workers):
+    env = {**os.environ, 'BUDGET_ASYNC_VIEWS': '1' if mode == 'async' else '0'}
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'banking.asgi:application',
+         '--port', str(port), '--workers', str(workers), '--log-level', 'warning'],
+        env=env,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return server
+        except OSError:
+            if server.poll() is not None:
+                break
+            time.sleep(0.2)
+    server.kill()
+    raise SystemExit(f"uvicorn did not start on port {port}")
+
+
+def load(port, path, cookie, concurrency, requests):
+    local = threading.local()
+    headers = {'Cookie': f"{settings.SESSION_COOKIE_NAME}={cookie}"}
+
+    def fetch(_):
+        connection = getattr(local, 'connection', None)
+        if connection is None:
+            connection = local.connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        started = time.perf_counter()
+        try:
+            connection.request('GET', path, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            ok = response.status == 200
+        except (OSError, http.client.HTTPException):
+            local.connection = None
+            ok = False
+        return time.perf_counter() - started, ok
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(fetch, range(concurrency)))  # Open the connections and warm the cache.
+        started = time.perf_counter()
+        results = list(pool.map(fetch, range(requests)))
+        elapsed = time.perf_counter() - started
+    latencies = [latency * 1000 for latency, _ in results]
+    errors = sum(not ok for _, ok in results)
+    return requests / elapsed, percentile(latencies, 0.5), percentile(latencies, 0.95), errors
+
+
+def run(transactions, concurrency, requests, port, workers):
+    if importlib.util.find_spec('uvicorn') is None:
+        raise SystemExit('uvicorn is not installed: pip install uvicorn')
+
+    cookie = seed(transactions)
+    results = {}
+    try:
+        for mode in ('sync', 'async'):
+            server = start_server(mode, port, workers)
+            try:
+                for path in PATHS:
+                    results[mode, path] = load(port, path, cookie, concurrency, requests)
+            finally:
+                server.terminate()
+                server.wait()
+    finally:
+        drop_users()
+
+    print(f"{transactions} transactions, {concurrency} concurrent clients, {requests} requests per page, "
+          f"{workers} worker(s)")
+    print(f"{'page':<22}{'mode':<7}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'errors':>8}")
+    for path in PATHS:
+        for mode in ('sync', 'async'):
+            rate, p50, p95, errors = results[mode, path]
+            print(f"{path:<22}{mode:<7}{rate:9.1f}{p50:9.1f}{p95:9.1f}{errors:8d}")
+        speedup = results['async', path][0] / results['sync', path][0]
+        print(f"{'':<22}async/sync throughput: {speedup:.2f}x")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--transactions', type=int, default=20_000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=1)
+    args = parser.parse_args()
+    run(args.transactions, args.concurrency, args.requests, args.port, args.workers)
@@ -0,0 +1,65 @@
+"""
+tracemalloc footprint of the CLI domain objects at scale.
+
+Run from the repository root:
+    PYTHONPATH=account/bank_account:account/expense:. python benchmarks/bench_domain_memory.py --expenses 1000000
+"""
+import argparse
+import gc
+import tracemalloc
+from decimal import Decimal
+
+from account.account_user.users import User, UserType
+from bank_accounts import BankAccount
+from expenses import Category, Expense
+
+
+def build(expense_count, user_count):
+    categories = list(Category)
+    users = {}
+    accounts = {}
+    expenses = {}
+    for user_id in range(1, user_count + 1):
+        users[user_id] = User(username=f"user{user_id}", user_type=UserType.ADULT, user_id=user_id)
+        accounts[user_id] = BankAccount(user_id, user_id, 'ADULT', Decimal('1000.00'))
+        users[user_id].assigned_account.append(user_id)
+
+    for expense_id in range(1, expense_count + 1):
+        owner = expense_id % user_count + 1
+        expense = Expense(
+            amount=Decimal(expense_id % 10000) / 100,
+            category=categories[expense_id % len(categories)],
+            account_id=owner,
+            expense_id=expense_id,
+        )
+        expenses[expense_id] = expense
+        users[owner].assigned_expense.add(expense_id)
+        accounts[owner].assigned_expense_ids.add(expense_id)
+    return users, accounts, expenses
+
+
+def measure(label, factory):
+    gc.collect()
+    tracemalloc.start()
+    result = factory()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return label, result, current, peak
+
+
+def run(expense_count, user_count):
+    _, (users, accounts, expenses), current, peak = measure('all', lambda: build(expense_count, user_count))
+    sample = next(iter(expenses.values()))
+    print(f"{expense_count} expenses, {user_count} users")
+    print(f"  has __dict__      : {hasattr(sample, '__dict__')}")
+    print(f"  traced (current)  : {current / 2**20:8.1f} MiB")
+    print(f"  traced (peak)     : {peak / 2**20:8.1f} MiB")
+    print(f"  bytes per expense : {current / expense_count:8.1f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--expenses', type=int, default=1_000_000)
+    parser.add_argument('--users', type=int, default=1000)
+    args = parser.parse_args()
+    run(args.expenses, args.users)
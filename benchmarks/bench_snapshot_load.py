@@ -0,0 +1,84 @@
+"""
+CLI startup time: JSON snapshot versus the columnar binary snapshot.
+
+Run from the repository root:
+    PYTHONPATH=account/bank_account:account/expense:. python benchmarks/bench_snapshot_load.py --sizes 100000 1000000 10000000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+import main
+from account.utils import columnar
+
+
+def write_json_snapshot(path, expenses, users=1000):
+    categories = [category.value for category in main.Category]
+    with open(path, 'w') as f:
+        f.write('{"users": [')
+        f.write(','.join(json.dumps({
+            '_username': f"user{user_id}", 'user_type': 'adult', 'user_id': user_id,
+            'assigned_account': [user_id],
+            'assigned_expense': list(range(user_id, expenses + 1, users)),
+            '_password_hash': '0' * 64,
+        }) for user_id in range(1, users + 1)))
+        f.write('], "bank_accounts": [')
+        f.write(','.join(json.dumps({
+            'account_id': user_id, 'user_id': user_id, 'account_type': 'ADULT', 'balance': '1000.00',
+            'is_active': True, 'assigned_expense_ids': [], '_creation_date': '2025-01-01T00:00:00',
+        }) for user_id in range(1, users + 1)))
+        f.write('], "expenses": [')
+        for expense_id in range(1, expenses + 1):
+            if expense_id > 1:
+                f.write(',')
+            f.write(json.dumps({
+                'category': categories[expense_id % len(categories)],
+                'account_id': (expense_id - 1) % users + 1,
+                'date': '2025-01-01T12:00:00',
+                '_expense_id': expense_id,
+                'amount': f"{expense_id % 10000 / 100:.2f}",
+                'description': 'synthetic',
+            }))
+        f.write('], "current_user_id": null}')
+
+
+def timed_load(snapshot_format, data_file):
+    main.SNAPSHOT_FORMAT = snapshot_format
+    main.DATA_FILE = main.BINARY_DATA_FILE = data_file
+    tracemalloc.start()
+    start = time.perf_counter()
+    app = main.Interface()
+    first = app.all_expenses[1]
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert first.expense_id == 1
+    return elapsed, peak
+
+
+def run(sizes):
+    workdir = tempfile.mkdtemp()
+    main.JOURNAL_FILE = os.path.join(workdir, 'budget_data.journal')
+    print(f"{'expenses':>10} {'json s':>8} {'json MiB':>9} {'binary s':>9} {'binary MiB':>11} {'file MiB':>9}")
+    for size in sizes:
+        json_path = os.path.join(workdir, f"{size}.json")
+        binary_path = os.path.join(workdir, f"{size}.bin")
+        write_json_snapshot(json_path, size)
+        columnar.json_to_binary(json_path, binary_path)
+
+        json_time, json_peak = timed_load('json', json_path)
+        binary_time, binary_peak = timed_load('binary', binary_path)
+        print(f"{size:>10} {json_time:>8.2f} {json_peak / 2**20:>9.1f} "
+              f"{binary_time:>9.4f} {binary_peak / 2**20:>11.2f} {os.path.getsize(binary_path) / 2**20:>9.1f}")
+        os.remove(json_path)
+        os.remove(binary_path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100_000, 1_000_000, 10_000_000])
+    args = parser.parse_args()
+    run(args.sizes)
@@ -0,0 +1,59 @@
+"""
+Username lookup in the CLI: linear scan (the old find_user_by_username)
+versus the casefolded index kept by Interface.
+
+Run from the repository root:
+    PYTHONPATH=account/bank_account:account/expense:. python benchmarks/bench_username_lookup.py --users 1000000
+"""
+import argparse
+import os
+import random
+import tempfile
+import timeit
+
+import main
+from account.account_user.users import User, UserType
+
+
+def scan(all_users, username):
+    for user in all_users.values():
+        if user.username.lower() == username.lower():
+            return user
+    return None
+
+
+def build_interface(count):
+    workdir = tempfile.mkdtemp()
+    main.DATA_FILE = os.path.join(workdir, 'budget_data.json')
+    main.JOURNAL_FILE = os.path.join(workdir, 'budget_data.journal')
+    app = main.Interface()
+    for user_id in range(1, count + 1):
+        user = User(username=f"User{user_id}", user_type=UserType.ADULT, user_id=user_id)
+        app.all_users[user_id] = user
+        app.index_user(user)
+    return app
+
+
+def run(count, lookups):
+    app = build_interface(count)
+    rng = random.Random(0)
+    names = [f"uSER{rng.randint(1, count)}" for _ in range(lookups)] + ['missing-user']
+
+    for name in names:
+        assert scan(app.all_users, name) is app.find_user_by_username(name)
+
+    scan_time = timeit.timeit(lambda: [scan(app.all_users, name) for name in names], number=1)
+    index_time = timeit.timeit(lambda: [app.find_user_by_username(name) for name in names], number=1)
+    per_scan = scan_time / len(names) * 1e3
+    per_index = index_time / len(names) * 1e6
+    print(f"{count} users, {len(names)} lookups")
+    print(f"  scan : {per_scan:10.3f} ms/lookup")
+    print(f"  index: {per_index:10.3f} us/lookup")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=1_000_000)
+    parser.add_argument('--lookups', type=int, default=20)
+    args = parser.parse_args()
+    run(args.users, args.lookups)
@@ -1,6 +1,13 @@
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
 
-from .models import Transaction, Category
+from .models import Transaction, Category, Task
+
+
+class ExpenseChangeList(ChangeList):
+    def get_queryset(self, request, exclude_parameters=None):
+        # Only the list gets trimmed columns; the change form still loads whole rows.
+        return super().get_queryset(request, exclude_parameters).with_related()
 
 
 @admin.register(Transaction)
@@ -8,14 +15,16 @@ class ExpenseAdmin(admin.ModelAdmin):
     list_display = (
         # 'user',
          'category',
+        'account',
         'amount',
         'date'
     )
+    list_select_related = ('category', 'account')
     # list_filter = (
     #     # 'user',
     #     'expense',
     # )
-    search_fields = ( 'amount','category')
+    search_fields = ( 'amount','category__name')
     # list_editable = ( 'category',)
     ordering = ('-date',)
     date_hierarchy = 'date'
@@ -23,6 +32,18 @@ class ExpenseAdmin(admin.ModelAdmin):
     # search_fields = ('user', 'expense')
     # list_editable = ('user', 'expense')
 
+    def get_changelist(self, request, **kwargs):
+        return ExpenseChangeList
+
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
     pass
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('name', 'user', 'status', 'attempts', 'done', 'total', 'created_at', 'finished_at')
+    list_filter = ('status', 'name')
+    list_select_related = ('user',)
+    ordering = ('-created_at',)
+    readonly_fields = ('started_at', 'finished_at', 'heartbeat_at', 'worker', 'result', 'error')
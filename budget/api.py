@@ -0,0 +1,464 @@
+"""
+JSON API over transactions, bank accounts, categories and savings accounts.
+
+    GET  /budget/api/<resource>/?fields=amount,date&after=<id>&limit=<n>
+    POST /budget/api/<resource>/
+         {"create": [{...}], "update": [{"id": 1, ...}], "delete": [2, 3]}
+    GET  /budget/api/sync/?cursor=<cursor>&limit=<n>
+
+Lists are keyset-paginated by id and carry an ETag, so an unchanged page
+costs the client a 304 and no body. A POST validates every item first and
+then applies the whole batch in one atomic block; one bad item rejects the
+batch. Queries per batch depend on the number of accounts and month buckets
+touched, not on the number of items.
+
+The sync feed lists every row created, changed or deleted after a cursor,
+in the order the changes were committed. See SyncView.
+"""
+import hashlib
+import json
+from collections import defaultdict
+from functools import cached_property
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Q
+from django.forms import modelform_factory
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views import View
+
+from .caching import invalidate_user
+from .importers import RowValidator
+from .metrics import TRANSACTION_WRITES
+from .models import BankAccount, Category, SavingsAccount, SyncState, Tombstone, Transaction
+from .services import apply_transaction_changes
+
+
+class ApiError(Exception):
+    def __init__(self, message, errors=None, status=400):
+        super().__init__(message)
+        self.message = message
+        self.errors = errors
+        self.status = status
+
+    def response(self):
+        payload = {'error': self.message}
+        if self.errors:
+            payload['errors'] = self.errors
+        return JsonResponse(payload, status=self.status)
+
+
+class Resource:
+    name = None
+    model = None
+    # Fields the client may write. Foreign keys are given as ids of the user's own rows.
+    form_fields = ()
+    foreign_keys = {}
+    # Extra read-only fields returned by lists.
+    read_only = ()
+    # Fields whose value each user may have on one row only.
+    unique_per_user = ()
+
+    @property
+    def fields(self):
+        return ('id', *self.form_fields, *self.foreign_keys, *self.read_only)
+
+    @property
+    def writable(self):
+        return (*self.form_fields, *self.foreign_keys)
+
+    @cached_property
+    def validator(self):
+        return RowValidator(modelform_factory(self.model, fields=self.form_fields))
+
+    def queryset(self, user):
+        return self.model.objects.filter(user=user)
+
+    def defaults(self):
+        return {
+            name: field.get_default()
+            for name in self.form_fields
+            if (field := self.model._meta.get_field(name)).has_default()
+        }
+
+    def clean(self, item, owned):
+        data, errors = self.validator.clean(item)
+        for name, model in self.foreign_keys.items():
+            value = item.get(name)
+            if value not in owned[name]:
+                errors[name] = [f"Unknown {model._meta.verbose_name}."]
+            else:
+                data[f"{name}_id"] = value
+        return data, errors
+
+    def write(self, user, create, update, delete):
+        owned = {
+            name: set(model.objects.filter(user=user).values_list('pk', flat=True))
+            for name, model in self.foreign_keys.items()
+        }
+        errors = []
+
+        new_rows = []
+        defaults = self.defaults()
+        for index, item in enumerate(create):
+            unknown = set(item) - set(self.writable)
+            data, item_errors = self.clean({**defaults, **item}, owned)
+            if unknown:
+                item_errors['__all__'] = [f"Unknown or read-only fields: {', '.join(sorted(unknown))}."]
+            if item_errors:
+                errors.append({'operation': 'create', 'index': index, 'errors': item_errors})
+            new_rows.append(data)
+
+        ids = [item.get('id') for item in update]
+        existing = {
+            row['id']: row
+            for row in self.queryset(user).filter(pk__in=[pk for pk in ids if isinstance(pk, int)])
+            .values('id', *self.writable)
+        }
+        changed_rows, changed_fields = {}, set()
+        for index, item in enumerate(update):
+            pk = item.get('id')
+            if pk not in existing:
+                errors.append({'operation': 'update', 'index': index, 'errors': {'id': ['Not found.']}})
+                continue
+            unknown = set(item) - set(self.writable) - {'id'}
+            data, item_errors = self.clean({**existing[pk], **item}, owned)
+            if unknown:
+                item_errors['__all__'] = [f"Unknown or read-only fields: {', '.join(sorted(unknown))}."]
+            if item_errors:
+                errors.append({'operation': 'update', 'index': index, 'errors': item_errors})
+            changed_rows[pk] = data
+            changed_fields.update(name for name in item if name != 'id')
+
+        found = set(self.queryset(user).filter(pk__in=[pk for pk in delete if isinstance(pk, int)])
+                    .values_list('pk', flat=True))
+        for index, pk in enumerate(delete):
+            if pk not in found:
+                errors.append({'operation': 'delete', 'index': index, 'errors': {'id': ['Not found.']}})
+
+        errors += self.duplicate_errors(user, new_rows, update, changed_rows)
+        if errors:
+            raise ApiError('The batch was not applied.', errors)
+
+        with transaction.atomic():
+            created = self.create(user, new_rows)
+            self.update(user, changed_rows, changed_fields, existing)
+            if found:
+                self.delete(user, found)
+            invalidate_user(user.pk)
+        return created
+
+    def duplicate_errors(self, user, new_rows, update, changed_rows):
+        # RowValidator runs no validate_unique(), so a repeated value would only
+        # surface as an IntegrityError from the bulk write. Creates are written
+        # before updates, so a value still held by another row is taken even if
+        # the batch renames that row.
+        errors = []
+        for name in self.unique_per_user:
+            label = self.model._meta.get_field(name).verbose_name
+            holders = defaultdict(set)
+            for pk, value in self.queryset(user).values_list('pk', name):
+                holders[value].add(pk)
+            items = [('create', index, None, row) for index, row in enumerate(new_rows)]
+            items += [
+                ('update', index, item['id'], changed_rows[item['id']])
+                for index, item in enumerate(update) if item.get('id') in changed_rows
+            ]
+            seen = set()
+            for operation, index, pk, row in items:
+                if name not in row:
+                    continue
+                if row[name] in seen or holders[row[name]] - {pk}:
+                    errors.append({'operation': operation, 'index': index, 'errors': {
+                        name: [f"You already have a {self.model._meta.verbose_name} with this {label}."],
+                    }})
+                seen.add(row[name])
+        return errors
+
+    def create(self, user, rows):
+        if not rows:
+            return []
+        first = SyncState.reserve(user.pk, len(rows))
+        return self.model.objects.bulk_create(
+            [self.model(user=user, sync_version=first + offset, **row) for offset, row in enumerate(rows)],
+            batch_size=settings.BUDGET_API_WRITE_BATCH,
+        )
+
+    def update(self, user, rows, fields, existing):
+        if not rows or not fields:
+            return
+        first = SyncState.reserve(user.pk, len(rows))
+        now = timezone.now()
+        objects = [
+            self.model(pk=pk, user=user, sync_version=first + offset, updated_at=now, **row)
+            for offset, (pk, row) in enumerate(rows.items())
+        ]
+        self.model.objects.bulk_update(
+            objects, [*sorted(fields), 'sync_version', 'updated_at'], batch_size=settings.BUDGET_API_WRITE_BATCH,
+        )
+
+    def delete(self, user, ids):
+        self.queryset(user).filter(pk__in=ids).delete()
+
+
+class TransactionResource(Resource):
+    name = 'transactions'
+    model = Transaction
+    form_fields = ('amount', 'type', 'date', 'description')
+    foreign_keys = {'category': Category, 'account': BankAccount}
+
+    # bulk_create and bulk_update send no post_save, so the writes are counted
+    # here. Deletes go through the collector, whose post_delete counts them.
+    def create(self, user, rows):
+        created = super().create(user, rows)
+        apply_transaction_changes(added=[row.rollup_fields() for row in created])
+        TRANSACTION_WRITES.inc(len(created), operation='create')
+        return created
+
+    def update(self, user, rows, fields, existing):
+        if not rows or not fields:
+            return
+        super().update(user, rows, fields, existing)
+        TRANSACTION_WRITES.inc(len(rows), operation='update')
+
+        def rollup_fields(row):
+            return {
+                'user_id': user.pk,
+                'account_id': row.get('account_id', row.get('account')),
+                'category_id': row.get('category_id', row.get('category')),
+                'type': row['type'],
+                'amount': row['amount'],
+                'date': row['date'],
+            }
+
+        apply_transaction_changes(
+            added=[rollup_fields(row) for row in rows.values()],
+            removed=[rollup_fields(existing[pk]) for pk in rows],
+        )
+
+
+class BankAccountResource(Resource):
+    name = 'accounts'
+    model = BankAccount
+    form_fields = ('name_account', 'account_type', 'initial_balance')
+    read_only = ('balance',)
+
+    def create(self, user, rows):
+        created = super().create(user, rows)
+        # As in BankAccountCreateView, the opening balance is booked as an income,
+        # which is what moves the balance, the rollups and the dashboard totals.
+        opening = [account for account in created if account.initial_balance > 0]
+        if opening:
+            category, _ = Category.objects.get_or_create(name='Other', user=user)
+            RESOURCES['transactions'].create(user, [
+                {
+                    'amount': account.initial_balance, 'type': 'IN', 'category_id': category.pk,
+                    'account_id': account.pk, 'description': 'Starting balance',
+                }
+                for account in opening
+            ])
+        return created
+
+
+class CategoryResource(Resource):
+    name = 'categories'
+    model = Category
+    form_fields = ('name',)
+    unique_per_user = ('name',)
+
+    def delete(self, user, ids):
+        # Delete the transactions first so their balances are reverted in bulk
+        # instead of once per row through the cascade.
+        Transaction.objects.filter(user=user, category__in=ids).delete()
+        super().delete(user, ids)
+
+
+class SavingsAccountResource(Resource):
+    name = 'savings'
+    model = SavingsAccount
+    form_fields = ('saving_name', 'saving_type', 'saving_balance', 'interest_rate')
+
+
+RESOURCES = {
+    resource.name: resource
+    for resource in (TransactionResource(), BankAccountResource(), CategoryResource(), SavingsAccountResource())
+}
+
+
+class ResourceView(View):
+    resource = None
+
+    def dispatch(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'Authentication required.'}, status=401)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        except ApiError as error:
+            return error.response()
+
+    def get_fields(self):
+        requested = self.request.GET.get('fields')
+        if not requested:
+            return self.resource.fields
+        fields = [name.strip() for name in requested.split(',') if name.strip()]
+        unknown = set(fields) - set(self.resource.fields)
+        if unknown:
+            raise ApiError(f"Unknown fields: {', '.join(sorted(unknown))}.")
+        return ('id', *[name for name in fields if name != 'id'])
+
+    def get_int(self, name, default):
+        value = self.request.GET.get(name)
+        if value is None:
+            return default
+        try:
+            return int(value)
+        except ValueError:
+            raise ApiError(f"{name} must be an integer.")
+
+    def get(self, request, *args, **kwargs):
+        fields = self.get_fields()
+        limit = min(max(self.get_int('limit', settings.BUDGET_API_PAGE_SIZE), 1), settings.BUDGET_API_MAX_PAGE_SIZE)
+        queryset = self.resource.queryset(request.user).order_by('pk')
+        after = self.get_int('after', None)
+        if after is not None:
+            queryset = queryset.filter(pk__gt=after)
+
+        rows = list(queryset.values(*fields)[:limit + 1])
+        next_after = rows[limit - 1]['id'] if len(rows) > limit else None
+        body = json.dumps({'results': rows[:limit], 'next': next_after}, cls=DjangoJSONEncoder).encode()
+
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(body, content_type='application/json')
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def post(self, request, *args, **kwargs):
+        try:
+            payload = json.loads(request.body)
+        except ValueError:
+            raise ApiError('The body must be JSON.')
+        if not isinstance(payload, dict):
+            raise ApiError('The body must be a JSON object.')
+
+        create = payload.get('create', [])
+        update = payload.get('update', [])
+        delete = payload.get('delete', [])
+        if not all(isinstance(items, list) for items in (create, update, delete)):
+            raise ApiError('create, update and delete must be lists.')
+        if not all(isinstance(item, dict) for item in create + update):
+            raise ApiError('Items to create or update must be objects.')
+        size = len(create) + len(update) + len(delete)
+        if size > settings.BUDGET_API_MAX_BATCH:
+            raise ApiError(f"A batch holds at most {settings.BUDGET_API_MAX_BATCH} items.", status=413)
+
+        created = self.resource.write(request.user, create, update, delete)
+        return JsonResponse({
+            'created': [obj.pk for obj in created],
+            'updated': len(update),
+            'deleted': len(delete),
+        })
+
+
+class SyncView(View):
+    """
+    Changes to the user's rows since a cursor:
+
+        {"changes": [{"resource": "transactions", "id": 7, "version": 42, "data": {...}},
+                     {"resource": "accounts", "id": 3, "version": 43, "deleted": true}],
+         "cursor": "43-4-12", "more": false}
+
+    Start without a cursor, apply the changes, and pass the returned cursor
+    next time; repeat while "more" is true. Only the latest state of a row is
+    sent, so a row changed twice since the cursor appears once. Account
+    balances move with their transactions and are not reported as changes of
+    the account; clients derive them from the transactions they hold.
+
+    Changes are ordered by the per-user SyncState version rather than by
+    updated_at: timestamps are taken before commit, so a slow transaction can
+    commit a row older than rows a client already fetched. Rows written in bulk
+    for a new user share version 0, so the cursor also carries the source and
+    the id to break ties. Each page is one indexed range query per table,
+    whatever the size of the ledger.
+    """
+    sources = (*RESOURCES.values(), Tombstone)
+
+    def dispatch(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'Authentication required.'}, status=401)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        except ApiError as error:
+            return error.response()
+
+    def get_cursor(self):
+        raw = self.request.GET.get('cursor')
+        if not raw:
+            return (-1, 0, 0)
+        try:
+            version, source, pk = (int(part) for part in raw.split('-'))
+        except ValueError:
+            raise ApiError('Invalid cursor.')
+        if not 0 <= source < len(self.sources):
+            raise ApiError('Invalid cursor.')
+        return version, source, pk
+
+    def get_limit(self):
+        try:
+            limit = int(self.request.GET.get('limit', settings.BUDGET_API_PAGE_SIZE))
+        except ValueError:
+            raise ApiError('limit must be an integer.')
+        return min(max(limit, 1), settings.BUDGET_API_MAX_PAGE_SIZE)
+
+    @staticmethod
+    def after(cursor, index):
+        version, source, pk = cursor
+        if index < source:
+            return Q(sync_version__gt=version)
+        if index > source:
+            return Q(sync_version__gte=version)
+        return Q(sync_version__gt=version) | Q(sync_version=version, pk__gt=pk)
+
+    def get(self, request, *args, **kwargs):
+        cursor = self.get_cursor()
+        limit = self.get_limit()
+        names = {resource.model._meta.model_name: resource.name for resource in RESOURCES.values()}
+
+        changes = []
+        for index, source in enumerate(self.sources):
+            if source is Tombstone:
+                rows = (
+                    Tombstone.objects.filter(self.after(cursor, index), user=request.user)
+                    .order_by('sync_version', 'pk')
+                    .values('pk', 'model', 'object_id', 'sync_version')[:limit + 1]
+                )
+                changes.extend(
+                    ((row['sync_version'], index, row['pk']),
+                     {'resource': names[row['model']], 'id': row['object_id'],
+                      'version': row['sync_version'], 'deleted': True})
+                    for row in rows
+                )
+                continue
+            rows = (
+                source.queryset(request.user).filter(self.after(cursor, index))
+                .order_by('sync_version', 'pk')
+                .values(*source.fields, 'updated_at', 'sync_version')[:limit + 1]
+            )
+            for row in rows:
+                version = row.pop('sync_version')
+                changes.append(((version, index, row['id']),
+                                {'resource': source.name, 'id': row['id'], 'version': version, 'data': row}))
+
+        changes.sort(key=lambda change: change[0])
+        page = changes[:limit]
+        next_cursor = '-'.join(map(str, page[-1][0])) if page else request.GET.get('cursor')
+        response = JsonResponse(
+            {'changes': [change for _, change in page], 'cursor': next_cursor, 'more': len(changes) > limit},
+        )
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
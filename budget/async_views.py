@@ -0,0 +1,131 @@
+"""
+Async versions of the read-heavy pages, routed instead of the ones in
+budget.views when BUDGET_ASYNC_VIEWS is on.
+
+They read through the async ORM and the async cache API, so under ASGI a
+request waiting on the database does not hold a worker thread. Independent
+reads of one page are awaited together. Django still runs the queries of
+one request one after another on its connection, so this saves the thread
+hops between them rather than running SQL in parallel.
+"""
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.core.paginator import InvalidPage, Paginator
+from django.http import Http404
+from django.template.response import TemplateResponse
+from django.views import View
+
+from . import views
+from .caching import acached_for_user
+from .forms import BankAccountCreateForm
+from .models import BankAccount, Category, Transaction
+from .pagination import akeyset_paginate
+from .services import acategory_statistics, adashboard_summary
+
+
+async def _list(queryset):
+    return [obj async for obj in queryset]
+
+
+class AsyncLoginRequiredMixin:
+    """LoginRequiredMixin for async views, loading the user with request.auser()."""
+
+    async def dispatch(self, request, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        # Templates and context processors read request.user synchronously.
+        request.user = user
+        return await super().dispatch(request, *args, **kwargs)
+
+
+class ExpenseListView(AsyncLoginRequiredMixin, View):
+    template_name = 'budget/expense.html'
+    paginate_by = 10
+
+    def get_queryset(self):
+        return Transaction.objects.filter(user=self.request.user).with_related().order_by('-date', '-id')
+
+    async def paginate(self, queryset):
+        # Same contract as views.ExpenseListView: ?page=N is OFFSET pagination,
+        # anything else is keyset pagination on (date, id).
+        number = self.request.GET.get('page')
+        if number is None:
+            page = await akeyset_paginate(
+                queryset,
+                self.paginate_by,
+                after=self.request.GET.get('after'),
+                before=self.request.GET.get('before'),
+            )
+            return None, page, page.has_next or page.has_previous
+
+        paginator = Paginator(queryset, self.paginate_by)
+        # Fill in the cached count so the paginator never runs a blocking COUNT(*).
+        paginator.count = await queryset.acount()
+        try:
+            page = paginator.page(paginator.num_pages if number == 'last' else number)
+        except InvalidPage as error:
+            raise Http404(f"Invalid page ({number}): {error}")
+        page.object_list = await _list(page.object_list)
+        return paginator, page, page.has_other_pages()
+
+    async def get(self, request, *args, **kwargs):
+        user = request.user
+        summary, categories, (paginator, page, is_paginated) = await asyncio.gather(
+            acached_for_user(user.pk, 'dashboard', lambda: adashboard_summary(user)),
+            _list(Category.objects.filter(user=user)),
+            self.paginate(self.get_queryset()),
+        )
+        return TemplateResponse(request, self.template_name, {
+            'view': self,
+            'paginator': paginator,
+            'page_obj': page,
+            'is_paginated': is_paginated,
+            'object_list': page.object_list,
+            'transactions': page.object_list,
+            'categories': categories,
+            'total_expenses': summary['total_out'],
+            'total_balance': summary['total_balance'],
+            'transaction_count': summary['account_count'],
+            'savings_count': summary['savings_count'],
+            'total_savings': summary['total_savings'],
+        })
+
+
+class BankAccountListView(AsyncLoginRequiredMixin, View):
+    template_name = 'budget/account.html'
+
+    async def get(self, request, *args, **kwargs):
+        accounts = await _list(BankAccount.objects.filter(user=request.user).with_totals())
+        return TemplateResponse(request, self.template_name, {
+            'view': self,
+            'accounts': accounts,
+            'form': BankAccountCreateForm(user=request.user),
+        })
+
+    async def post(self, request, *args, **kwargs):
+        # The page's form posts back here; creating an account stays synchronous.
+        return await sync_to_async(views.BankAccountCreateView.as_view())(request, *args, **kwargs)
+
+
+class StatisticsListView(AsyncLoginRequiredMixin, views.TransactionFilterMixin, View):
+    template_name = 'budget/statistics.html'
+
+    async def get(self, request, *args, **kwargs):
+        user = request.user
+        filters = self.get_filters()
+        series = await acached_for_user(
+            user.pk,
+            'statistics',
+            lambda: acategory_statistics(user, **filters),
+            *filters.values()
+        )
+        return TemplateResponse(request, self.template_name, {
+            'view': self,
+            'labels': json.dumps(series['labels']),
+            'values': json.dumps(series['outcomes']),
+            'incomes': json.dumps(series['incomes']),
+        })
@@ -0,0 +1,105 @@
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .metrics import CACHE_REQUESTS
+
+# Bump when the shape of cached values changes so old entries are ignored.
+CACHE_KEY_VERSION = 1
+
+_MISSING = object()
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def cache_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+    return stats
+
+
+def _version_key(user_id):
+    return f"budget:v{CACHE_KEY_VERSION}:user:{user_id}:generation"
+
+
+def _user_generation(user_id):
+    key = _version_key(user_id)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, 1, timeout=None)
+        generation = cache.get(key, 1)
+    return generation
+
+
+async def _auser_generation(user_id):
+    key = _version_key(user_id)
+    generation = await cache.aget(key)
+    if generation is None:
+        await cache.aadd(key, 1, timeout=None)
+        generation = await cache.aget(key, 1)
+    return generation
+
+
+def _value_key(user_id, name, params):
+    suffix = ':'.join(str(param) for param in params)
+    return f"budget:v{CACHE_KEY_VERSION}:user:{user_id}:{name}:{suffix}"
+
+
+def _count_lookup(hit):
+    _count('hits' if hit else 'misses')
+    CACHE_REQUESTS.inc(result='hit' if hit else 'miss')
+
+
+def cached_for_user(user_id, name, compute, *params):
+    """
+    Return compute() cached per user. The key carries the module version and
+    the user's generation, which any write to their data moves forward.
+    """
+    key = _value_key(user_id, name, params)
+    version = _user_generation(user_id)
+
+    value = cache.get(key, _MISSING, version=version)
+    _count_lookup(value is not _MISSING)
+    if value is not _MISSING:
+        return value
+
+    value = compute()
+    cache.set(key, value, settings.BUDGET_CACHE_TIMEOUT, version=version)
+    return value
+
+
+async def acached_for_user(user_id, name, compute, *params):
+    """cached_for_user() for async views: compute() returns an awaitable."""
+    key = _value_key(user_id, name, params)
+    version = await _auser_generation(user_id)
+
+    value = await cache.aget(key, _MISSING, version=version)
+    _count_lookup(value is not _MISSING)
+    if value is not _MISSING:
+        return value
+
+    value = await compute()
+    await cache.aset(key, value, settings.BUDGET_CACHE_TIMEOUT, version=version)
+    return value
+
+
+def invalidate_user(user_id):
+    """Drop every cached value of one user once the current transaction commits."""
+    def bump():
+        key = _version_key(user_id)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 2, timeout=None)
+        _count('invalidations')
+
+    transaction.on_commit(bump)
@@ -0,0 +1,73 @@
+import csv
+import json
+import time
+
+from .metrics import EXPORT_SECONDS, EXPORTED_ROWS
+from .models import Transaction
+
+EXPORT_COLUMNS = ['date', 'type', 'amount', 'category', 'account', 'description']
+
+
+class Echo:
+    """File-like object whose write() hands the line back, so csv.writer can feed a generator."""
+
+    def write(self, value):
+        return value
+
+
+def export_rows(user, start=None, end=None, account=None, chunk_size=2000):
+    """
+    Yield one tuple per transaction in EXPORT_COLUMNS order.
+
+    Category and account names come from the same JOIN, and rows are streamed
+    from the cursor in chunks, so memory stays flat however long the history is.
+    """
+    transactions = Transaction.objects.filter(user=user)
+    if start:
+        transactions = transactions.filter(date__date__gte=start)
+    if end:
+        transactions = transactions.filter(date__date__lte=end)
+    if account:
+        transactions = transactions.filter(account=account)
+    rows = (
+        transactions.order_by('date', 'id')
+        .values_list('date', 'type', 'amount', 'category__name', 'account__name_account', 'description')
+        .iterator(chunk_size=chunk_size)
+    )
+    return _metered(rows)
+
+
+def _metered(rows):
+    # Time runs until the consumer stops reading, so it reflects the whole download.
+    count = 0
+    started = time.perf_counter()
+    try:
+        for row in rows:
+            count += 1
+            yield row
+    finally:
+        EXPORTED_ROWS.inc(count)
+        EXPORT_SECONDS.inc(time.perf_counter() - started)
+
+
+def iter_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_COLUMNS)
+    for date, type, amount, category, account, description in rows:
+        yield writer.writerow([date.isoformat(), type, amount, category, account, description or ''])
+
+
+def iter_json(rows):
+    yield '['
+    separator = ''
+    for date, type, amount, category, account, description in rows:
+        item = dict(zip(EXPORT_COLUMNS, [date.isoformat(), type, str(amount), category, account, description]))
+        yield separator + json.dumps(item)
+        separator = ',\n'
+    yield ']\n'
+
+
+EXPORT_FORMATS = {
+    'csv': (iter_csv, 'text/csv'),
+    'json': (iter_json, 'application/json'),
+}
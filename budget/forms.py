@@ -81,6 +81,37 @@ class TransactionForm(forms.ModelForm):
             self.fields['account'].queryset = BankAccount.objects.filter(user=user)
 
 
+class ImportRowForm(TransactionForm):
+    """TransactionForm rules for one imported row; category and account are resolved by the importer."""
+
+    class Meta(TransactionForm.Meta):
+        fields = ['amount', 'type', 'date', 'description']
+
+
+class TransactionImportForm(forms.Form):
+    FORMAT_CHOICES = [
+        ('', 'Detect from file name'),
+        ('csv', 'CSV'),
+        ('ofx', 'OFX'),
+    ]
+    file = forms.FileField(label="Bank statement")
+    file_format = forms.ChoiceField(choices=FORMAT_CHOICES, required=False, label="Format")
+    account = forms.ModelChoiceField(
+        queryset=BankAccount.objects.none(),
+        required=False,
+        label="Account",
+        help_text='Used for OFX files and for CSV rows without an account column.'
+    )
+
+    def __init__(self, *args, **kwargs):
+        user = kwargs.pop('user', None)
+        super().__init__(*args, **kwargs)
+        for field in self.fields.values():
+            field.widget.attrs.update({'class': 'form-control'})
+        if user:
+            self.fields['account'].queryset = BankAccount.objects.filter(user=user)
+
+
 class CategoryForm(forms.ModelForm):
     class Meta:
         model = Category
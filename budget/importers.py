@@ -0,0 +1,260 @@
+import csv
+import io
+import re
+import time
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .caching import invalidate_user
+from .forms import ImportRowForm
+from .metrics import IMPORT_SECONDS, IMPORTED_ROWS, TRANSACTION_WRITES
+from .models import BankAccount, Category, MonthlyCategoryRollup, SyncState, Transaction, month_start
+
+DEFAULT_CATEGORY = 'Other'
+MAX_REPORTED_REJECTIONS = 1000
+
+_OFX_TOKEN = re.compile(r'<(/?)([A-Z0-9.]+)>([^<\r\n]*)', re.IGNORECASE)
+
+
+def detect_format(filename):
+    return 'ofx' if filename.lower().endswith(('.ofx', '.qfx')) else 'csv'
+
+
+def _split_amount(raw, type=None):
+    """Signed statement amount -> (absolute amount, IN/OUT), keeping an explicit type."""
+    try:
+        amount = Decimal(str(raw).replace(',', '.').replace(' ', ''))
+    except InvalidOperation:
+        return raw, type
+    if not type:
+        type = 'OUT' if amount < 0 else 'IN'
+    return abs(amount), type.upper()
+
+
+def iter_csv_rows(stream):
+    """
+    Yield (line number, row dict) from a CSV with a header of
+    date, amount[, type, category, account, description].
+    """
+    reader = csv.DictReader(stream)
+    for row in reader:
+        # DictReader puts fields beyond the header in a list under None; such a
+        # line is usually an unquoted comma, so its columns cannot be trusted.
+        extra = row.pop(None, None)
+        row = {(key or '').strip().lower(): (value or '').strip() for key, value in row.items()}
+        amount, type = _split_amount(row.get('amount', ''), row.get('type'))
+        parsed = {
+            'date': row.get('date', ''),
+            'amount': amount,
+            'type': type,
+            'category': row.get('category', ''),
+            'account': row.get('account', ''),
+            'description': row.get('description', ''),
+        }
+        if extra:
+            parsed['errors'] = {'__all__': [
+                f"Expected {len(reader.fieldnames)} fields, found {len(reader.fieldnames) + len(extra)}."
+            ]}
+        yield reader.line_num, parsed
+
+
+def _ofx_date(raw):
+    # 20240115120000.000[-5:EST] -> 2024-01-15 12:00:00
+    digits = raw[:14]
+    if len(digits) < 8:
+        return raw
+    date = f"{digits[:4]}-{digits[4:6]}-{digits[6:8]}"
+    if len(digits) >= 12:
+        date += f" {digits[8:10]}:{digits[10:12]}:{digits[12:14] or '00'}"
+    return date
+
+
+def iter_ofx_rows(stream):
+    """
+    Yield (line number, row dict) for each <STMTTRN> in an OFX file. Works on
+    both SGML (unclosed tags) and XML OFX and reads the file line by line.
+    """
+    current = None
+    start_line = 0
+    for line_number, line in enumerate(stream, start=1):
+        for closing, tag, value in _OFX_TOKEN.findall(line):
+            tag = tag.upper()
+            if tag == 'STMTTRN':
+                if closing and current is not None:
+                    yield start_line, _ofx_row(current)
+                    current = None
+                elif not closing:
+                    current, start_line = {}, line_number
+            elif current is not None and not closing:
+                current[tag] = value.strip()
+    if current:
+        yield start_line, _ofx_row(current)
+
+
+def _ofx_row(fields):
+    amount, type = _split_amount(fields.get('TRNAMT', ''))
+    return {
+        'date': _ofx_date(fields.get('DTPOSTED', '')),
+        'amount': amount,
+        'type': type,
+        'category': '',
+        'account': '',
+        'description': fields.get('MEMO') or fields.get('NAME', ''),
+    }
+
+
+def iter_rows(stream, file_format):
+    if file_format == 'ofx':
+        return iter_ofx_rows(stream)
+    return iter_csv_rows(stream)
+
+
+def open_text(binary_file):
+    return io.TextIOWrapper(binary_file, encoding='utf-8-sig', newline='')
+
+
+class RowValidator:
+    """
+    Apply a ModelForm's field rules and the model field validators that
+    ModelForm._post_clean would run, without building a form for every row.
+    """
+
+    def __init__(self, form_class=ImportRowForm):
+        self.fields = form_class().fields
+        model = form_class._meta.model
+        self.model_fields = {name: model._meta.get_field(name) for name in self.fields}
+
+    def clean(self, row):
+        cleaned, errors = {}, {}
+        for name, field in self.fields.items():
+            try:
+                value = field.clean(row.get(name))
+                cleaned[name] = self.model_fields[name].clean(value, None)
+            except ValidationError as error:
+                errors[name] = error.messages
+        return cleaned, errors
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.rejected_count = 0
+        self.rejected = []
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_second(self):
+        processed = self.created + self.rejected_count
+        return processed / self.elapsed if self.elapsed else 0.0
+
+    def reject(self, line, errors):
+        self.rejected_count += 1
+        if len(self.rejected) < MAX_REPORTED_REJECTIONS:
+            self.rejected.append((line, errors))
+
+
+class TransactionImporter:
+    """
+    Validate parsed rows and write them with bulk_create in one atomic block.
+
+    Categories and accounts are loaded once up front, so validation does no
+    per-row queries. bulk_create skips Transaction.save(), so account balances
+    and monthly rollups are adjusted once per account and month bucket at the end.
+    """
+
+    def __init__(self, user, account=None, batch_size=1000, create_categories=True):
+        self.user = user
+        self.default_account = account
+        self.batch_size = batch_size
+        self.create_categories = create_categories
+        self.categories = {
+            category.name.lower(): category.pk
+            for category in Category.objects.filter(user=user).only('id', 'name')
+        }
+        self.accounts = {}
+        for pk, name in BankAccount.objects.filter(user=user).values_list('id', 'name_account'):
+            self.accounts[str(pk)] = pk
+            self.accounts.setdefault(name.lower(), pk)
+
+    def insert(self, batch):
+        # bulk_create skips Synced.save(), so hand out the sync versions here.
+        first = SyncState.reserve(self.user.pk, len(batch))
+        for offset, row in enumerate(batch):
+            row.sync_version = first + offset
+        return Transaction.objects.bulk_create(batch)
+
+    def resolve_category(self, name):
+        name = name or DEFAULT_CATEGORY
+        key = name.lower()
+        if key not in self.categories and self.create_categories:
+            category, _ = Category.objects.get_or_create(user=self.user, name=name[:50])
+            self.categories[key] = category.pk
+        return self.categories.get(key)
+
+    def resolve_account(self, name):
+        if not name:
+            return self.default_account.pk if self.default_account else None
+        return self.accounts.get(name.lower())
+
+    def run(self, rows):
+        result = ImportResult()
+        validator = RowValidator()
+        balances = defaultdict(Decimal)
+        rollups = defaultdict(lambda: [Decimal(0), 0])
+        batch = []
+        started = time.perf_counter()
+
+        with transaction.atomic():
+            for line, row in rows:
+                if row.get('errors'):
+                    result.reject(line, row['errors'])
+                    continue
+                data, errors = validator.clean(row)
+                account_id = self.resolve_account(row['account'])
+                if account_id is None:
+                    errors['account'] = ['Unknown account.']
+                category_id = None if errors else self.resolve_category(row['category'])
+                if category_id is None and not errors:
+                    errors['category'] = ['Unknown category.']
+                if errors:
+                    result.reject(line, errors)
+                    continue
+
+                batch.append(Transaction(
+                    user=self.user,
+                    account_id=account_id,
+                    category_id=category_id,
+                    amount=data['amount'],
+                    type=data['type'],
+                    date=data['date'],
+                    description=data['description'],
+                ))
+                balances[account_id] += Transaction.signed_amount(data['type'], data['amount'])
+                bucket = rollups[(account_id, category_id, data['type'], month_start(data['date']))]
+                bucket[0] += data['amount']
+                bucket[1] += 1
+
+                if len(batch) >= self.batch_size:
+                    result.created += len(self.insert(batch))
+                    batch = []
+            if batch:
+                result.created += len(self.insert(batch))
+
+            for account_id, delta in balances.items():
+                BankAccount.apply_balance_delta(account_id, delta)
+            for (account_id, category_id, type, month), (total, count) in rollups.items():
+                MonthlyCategoryRollup.record(
+                    self.user.pk, account_id, category_id, type, total, month, count=count
+                )
+            if result.created:
+                invalidate_user(self.user.pk)
+
+        result.elapsed = time.perf_counter() - started
+        IMPORTED_ROWS.inc(result.created, outcome='created')
+        IMPORTED_ROWS.inc(result.rejected_count, outcome='rejected')
+        IMPORT_SECONDS.inc(result.elapsed)
+        TRANSACTION_WRITES.inc(result.created, operation='create')
+        return result
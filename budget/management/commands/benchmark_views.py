@@ -0,0 +1,158 @@
+import json
+import math
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import URLPattern, reverse
+
+from budget import urls as budget_urls
+from budget.models import BankAccount, SavingsAccount, Task, Transaction
+from budget.seeding import BudgetSeeder
+
+# GET on these changes state, so the harness never calls them.
+SKIPPED = {
+    'account_delete': 'GET deletes the account',
+    'logout': 'GET ends the session',
+    'task_download': 'needs a file written by a finished task',
+}
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = max(0, math.ceil(fraction * len(ordered)) - 1)
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway test database at increasing scales, request every budget URL and '
+        'record query counts, p50/p95 latency and response size. Fails when an endpoint\'s '
+        'query count grows with the amount of data.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scales', type=int, nargs='+', default=[1000, 10000],
+            help='Transactions for the benchmark user at each step (ascending).',
+        )
+        parser.add_argument('--accounts', type=int, default=3)
+        parser.add_argument('--repeat', type=int, default=20, help='Timed requests per endpoint.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write results as JSON to this file.')
+
+    def handle(self, *args, **options):
+        scales = options['scales']
+        if scales != sorted(scales):
+            raise CommandError('--scales must be ascending.')
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            results = self.run(scales, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}.")
+
+        growing = self.growing_endpoints(results)
+        if growing:
+            raise CommandError(
+                'Query count grows with data size for: '
+                + ', '.join(f"{name} ({counts})" for name, counts in growing.items())
+            )
+        self.stdout.write(self.style.SUCCESS('Query counts are independent of data size.'))
+
+    def run(self, scales, options):
+        seeder = BudgetSeeder(seed=options['seed'])
+        client = Client()
+        results = {'scales': scales, 'repeat': options['repeat'], 'endpoints': {}}
+        for step, scale in enumerate(scales):
+            # Every step gets a fresh user; earlier users stay as background data.
+            [user] = seeder.seed_users(1, scale, accounts=options['accounts'], prefix='benchmark', first=step)
+            user.is_staff = True
+            user.save(update_fields=['is_staff'])
+            Task.objects.create(
+                name='export_transactions', user=user, status=Task.SUCCEEDED, attempts=1, result={'rows': scale},
+            )
+            client.force_login(user)
+            self.stdout.write(self.style.MIGRATE_HEADING(f"== {scale} transactions =="))
+            for name, url in self.endpoints(user):
+                if url is None:
+                    results['endpoints'].setdefault(name, {'skipped': SKIPPED[name]})
+                    continue
+                measurement = self.measure(client, url, options['repeat'])
+                results['endpoints'].setdefault(name, {'runs': {}})['runs'][str(scale)] = measurement
+                self.stdout.write(
+                    f"{name:<16} {measurement['status']} queries={measurement['queries']:<3} "
+                    f"p50={measurement['p50_ms']:.1f}ms p95={measurement['p95_ms']:.1f}ms "
+                    f"bytes={measurement['bytes']}"
+                )
+        return results
+
+    def endpoints(self, user):
+        samples = {
+            'account_update': BankAccount.objects.filter(user=user),
+            'expense_detail': Transaction.objects.filter(user=user),
+            'saving_detail': SavingsAccount.objects.filter(user=user),
+            'task_status': Task.objects.filter(user=user),
+        }
+        for pattern in budget_urls.urlpatterns:
+            if not isinstance(pattern, URLPattern) or not pattern.name:
+                continue
+            name = pattern.name
+            if name in SKIPPED:
+                yield name, None
+                continue
+            kwargs = {}
+            if pattern.pattern.converters and name not in samples:
+                raise CommandError(f"No sample object for the {name} URL; add it to samples or SKIPPED.")
+            if name in samples:
+                pk = samples[name].values_list('pk', flat=True).first()
+                if pk is None:
+                    continue
+                kwargs['pk'] = pk
+            yield name, reverse(f"{budget_urls.app_name}:{name}", kwargs=kwargs)
+
+    def measure(self, client, url, repeat):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+            size = self.response_size(response)
+        cold_queries = len(queries)
+
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            response = client.get(url)
+            self.response_size(response)
+            timings.append((time.perf_counter() - start) * 1000)
+
+        return {
+            'url': url,
+            'status': response.status_code,
+            'queries': cold_queries,
+            'p50_ms': percentile(timings, 0.50),
+            'p95_ms': percentile(timings, 0.95),
+            'bytes': size,
+        }
+
+    def response_size(self, response):
+        if response.streaming:
+            return sum(len(chunk) for chunk in response.streaming_content)
+        return len(response.content)
+
+    def growing_endpoints(self, results):
+        growing = {}
+        for name, endpoint in results['endpoints'].items():
+            counts = [run['queries'] for run in endpoint.get('runs', {}).values()]
+            if len(counts) > 1 and counts[-1] > counts[0]:
+                growing[name] = counts
+        return growing
@@ -0,0 +1,65 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, Q, Sum
+
+from budget.models import Transaction
+
+
+class Command(BaseCommand):
+    help = (
+        'Print query plans and timings for the hot Transaction access paths. '
+        'Run it before and after `migrate budget 0004` to compare plans.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='User id to explain for (default: the user with most transactions).')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed executions per query.')
+
+    def get_user_id(self, options):
+        if options['user']:
+            return options['user']
+        busiest = (
+            Transaction.objects.values('user')
+            .annotate(rows=Count('id'))
+            .order_by('-rows')
+            .values_list('user', flat=True)
+            .first()
+        )
+        if busiest is None:
+            raise CommandError('There are no transactions to explain.')
+        return busiest
+
+    def handle(self, *args, **options):
+        user = get_user_model().objects.get(pk=self.get_user_id(options))
+        transactions = Transaction.objects.filter(user=user)
+        queries = {
+            'expense list page': transactions.order_by('-date')[:10],
+            'expense detail': transactions.filter(pk=transactions.values('pk')[:1]),
+            'statistics by category': (
+                transactions.filter(type='OUT')
+                .values('category__name')
+                .annotate(total=Sum('amount'))
+                .order_by()
+            ),
+            'account balances': (
+                Transaction.objects.filter(account__user=user)
+                .values('account')
+                .annotate(
+                    incomes=Sum('amount', filter=Q(type='IN')),
+                    outcomes=Sum('amount', filter=Q(type='OUT')),
+                )
+                .order_by()
+            ),
+        }
+
+        for name, queryset in queries.items():
+            timings = []
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                list(queryset.all())
+                timings.append(time.perf_counter() - start)
+            self.stdout.write(self.style.MIGRATE_HEADING(f"== {name} =="))
+            self.stdout.write(queryset.explain())
+            self.stdout.write(f"best of {options['repeat']}: {min(timings) * 1000:.2f} ms\n")
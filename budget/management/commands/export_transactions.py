@@ -0,0 +1,42 @@
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from budget.exporters import EXPORT_FORMATS, export_rows
+
+
+class Command(BaseCommand):
+    help = 'Stream a user\'s transactions as CSV or JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', required=True, help='Username to export.')
+        parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='csv')
+        parser.add_argument('--start', type=parse_date, help='First day to include (YYYY-MM-DD).')
+        parser.add_argument('--end', type=parse_date, help='Last day to include (YYYY-MM-DD).')
+        parser.add_argument('--account', type=int, help='Only this account id.')
+        parser.add_argument('--output', help='File to write; defaults to stdout.')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(username=options['user'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"User '{options['user']}' does not exist.")
+
+        rows = export_rows(
+            user,
+            start=options['start'],
+            end=options['end'],
+            account=options['account'],
+            chunk_size=options['chunk_size'],
+        )
+        render_rows = EXPORT_FORMATS[options['format']][0]
+        output = open(options['output'], 'w', newline='') if options['output'] else sys.stdout
+        try:
+            for chunk in render_rows(rows):
+                output.write(chunk)
+        finally:
+            if options['output']:
+                output.close()
@@ -0,0 +1,51 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from budget.importers import TransactionImporter, detect_format, iter_rows, open_text
+from budget.models import BankAccount
+
+
+class Command(BaseCommand):
+    help = 'Stream a CSV or OFX statement into a user\'s transactions.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--user', required=True, help='Username to import for.')
+        parser.add_argument('--format', choices=['csv', 'ofx'], help='Defaults to the file extension.')
+        parser.add_argument('--account', type=int, help='Account id for OFX files and CSV rows without one.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--no-create-categories',
+            action='store_true',
+            help='Reject rows whose category does not exist instead of creating it.',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(username=options['user'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"User '{options['user']}' does not exist.")
+
+        account = None
+        if options['account']:
+            account = BankAccount.objects.filter(user=user, pk=options['account']).first()
+            if account is None:
+                raise CommandError(f"Account {options['account']} does not belong to {user}.")
+
+        importer = TransactionImporter(
+            user,
+            account=account,
+            batch_size=options['batch_size'],
+            create_categories=not options['no_create_categories'],
+        )
+        file_format = options['format'] or detect_format(options['path'])
+        with open(options['path'], 'rb') as binary_file:
+            result = importer.run(iter_rows(open_text(binary_file), file_format))
+
+        for line, errors in result.rejected:
+            details = '; '.join(f"{field}: {' '.join(messages)}" for field, messages in errors.items())
+            self.stderr.write(f"line {line}: {details}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result.created} rows, rejected {result.rejected_count} "
+            f"in {result.elapsed:.2f}s ({result.rows_per_second:.0f} rows/s)."
+        ))
@@ -0,0 +1,54 @@
+import csv
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from budget.services import provision_default_categories
+
+
+class Command(BaseCommand):
+    help = (
+        'Create users in bulk from a CSV with a username,email[,password] header '
+        'and give each of them the default categories.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--category',
+            action='append',
+            dest='categories',
+            help='Default category name (repeatable); defaults to BUDGET_DEFAULT_CATEGORIES.',
+        )
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        with open(options['path'], newline='', encoding='utf-8-sig') as f:
+            rows = list(csv.DictReader(f))
+        if rows and 'username' not in rows[0]:
+            raise CommandError('The CSV needs a username column.')
+
+        existing = set(
+            User.objects.filter(username__in=[row['username'] for row in rows])
+            .values_list('username', flat=True)
+        )
+        users = [
+            User(
+                username=row['username'],
+                email=row.get('email', ''),
+                password=make_password(row.get('password') or None),
+            )
+            for row in rows
+            if row['username'] not in existing
+        ]
+
+        with transaction.atomic():
+            users = User.objects.bulk_create(users, batch_size=options['batch_size'])
+            provision_default_categories(users, options['categories'], batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {len(users)} users, skipped {len(existing)} existing."
+        ))
@@ -0,0 +1,51 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q, Sum
+
+from budget.models import BankAccount
+
+
+class Command(BaseCommand):
+    help = 'Recompute BankAccount.balance from transactions and fix or report any drift.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only report accounts whose stored balance differs; exit with an error if any do.',
+        )
+        parser.add_argument('--user', type=int, help='Limit to the accounts of this user id.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        accounts = BankAccount.objects.annotate(
+            incomes=Sum('transactions__amount', filter=Q(transactions__type='IN')),
+            outcomes=Sum('transactions__amount', filter=Q(transactions__type='OUT')),
+        ).only('id', 'name_account', 'balance')
+        if options['user']:
+            accounts = accounts.filter(user_id=options['user'])
+
+        drifted = []
+        checked = 0
+        for account in accounts.iterator(chunk_size=options['batch_size']):
+            checked += 1
+            # SQLite sums decimals as floats, so compare at cent precision.
+            expected = Decimal((account.incomes or 0) - (account.outcomes or 0)).quantize(Decimal('0.01'))
+            if account.balance != expected:
+                self.stdout.write(
+                    f"Account {account.pk} ({account.name_account}): stored {account.balance}, expected {expected}"
+                )
+                account.balance = expected
+                drifted.append(account)
+
+        if options['check']:
+            if drifted:
+                raise CommandError(f"{len(drifted)} of {checked} account balances are out of date.")
+            self.stdout.write(self.style.SUCCESS(f"All {checked} account balances are up to date."))
+            return
+
+        with transaction.atomic():
+            BankAccount.objects.bulk_update(drifted, ['balance'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Checked {checked} accounts, fixed {len(drifted)}."))
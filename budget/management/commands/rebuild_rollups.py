@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from budget.services import rebuild_rollups
+from budget.tasks import enqueue
+
+
+class Command(BaseCommand):
+    help = 'Backfill MonthlyCategoryRollup from existing transactions.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', help='Limit to this user id (repeatable).')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--background', action='store_true', help='Queue it for `run_tasks` instead.')
+
+    def handle(self, *args, **options):
+        if options['background']:
+            task = enqueue('rebuild_monthly_rollups', users=options['user'])
+            self.stdout.write(self.style.SUCCESS(f"Queued task {task.pk}."))
+            return
+        created = rebuild_rollups(users=options['user'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {created} monthly rollup rows."))
@@ -0,0 +1,99 @@
+import signal
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from budget.tasks import Heartbeat, claim, execute, purge_finished, requeue_stale, worker_name
+
+PURGE_EVERY = 3600
+
+
+class Command(BaseCommand):
+    help = (
+        'Run queued background tasks (imports, exports, rollup rebuilds). Runs until stopped '
+        'with Ctrl+C or SIGTERM, which lets the tasks in progress finish first.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=1, help='Tasks this process runs at once.')
+        parser.add_argument('--poll', type=float, default=1.0, help='Seconds to wait when the queue is empty.')
+        parser.add_argument('--once', action='store_true', help='Exit once no task is ready to run.')
+        parser.add_argument('--max-tasks', type=int, help='Exit after running this many tasks.')
+
+    def handle(self, *args, **options):
+        if options['threads'] < 1:
+            raise CommandError('--threads must be at least 1.')
+        self.stopping = threading.Event()
+        self.lock = threading.Lock()
+        self.started = 0
+        self.max_tasks = options['max_tasks']
+        previous = {}
+        if threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                previous[signum] = signal.signal(signum, lambda *_: self.stopping.set())
+
+        heartbeat = Heartbeat(max(settings.BUDGET_TASK_TIMEOUT / 4, 1))
+        heartbeat.start()
+        work = (heartbeat, options['poll'], options['once'])
+        try:
+            if options['threads'] == 1:
+                self.work(*work)
+            else:
+                threads = [
+                    threading.Thread(target=self.work_in_thread, args=work, name=f'worker-{number}')
+                    for number in range(options['threads'])
+                ]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+        finally:
+            heartbeat.stop()
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+        self.stdout.write(self.style.SUCCESS(f"Ran {self.started} tasks."))
+
+    def next_slot(self):
+        with self.lock:
+            if self.max_tasks is not None and self.started >= self.max_tasks:
+                return False
+            self.started += 1
+            return True
+
+    def give_back_slot(self):
+        with self.lock:
+            self.started -= 1
+
+    def work_in_thread(self, *args):
+        try:
+            self.work(*args)
+        finally:
+            connection.close()
+
+    def work(self, heartbeat, poll, once):
+        name = worker_name()
+        last_purge = 0.0
+        while not self.stopping.is_set():
+            if time.monotonic() - last_purge > PURGE_EVERY:
+                purge_finished()
+                last_purge = time.monotonic()
+            requeue_stale()
+            if not self.next_slot():
+                return
+            job = claim(name)
+            if job is None:
+                self.give_back_slot()
+                if once:
+                    return
+                self.stopping.wait(poll)
+                continue
+
+            heartbeat.add(job.pk)
+            try:
+                execute(job)
+            finally:
+                heartbeat.discard(job.pk)
+            self.stdout.write(f"{job} after {job.attempts} attempt(s)")
@@ -0,0 +1,53 @@
+from datetime import date
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from budget.seeding import ACCOUNTS, BudgetSeeder
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate synthetic users with accounts, default categories, savings and years of '
+        'transactions for load testing. The same --seed and --end give the same data.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--transactions', type=int, default=1000, help='Transactions per user.')
+        parser.add_argument('--years', type=int, default=3, help='How far back transactions go.')
+        parser.add_argument('--end', type=date.fromisoformat, help='Last day of generated data (YYYY-MM-DD); defaults to today.')
+        parser.add_argument('--accounts', type=int, default=2, help=f'Maximum bank accounts per user (1-{len(ACCOUNTS)}).')
+        parser.add_argument('--savings', type=int, default=2, help='Maximum savings accounts per user.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--prefix', default='seed', help='Usernames are <prefix><number>.')
+        parser.add_argument('--password', default='budget-pass', help='Password for every generated user.')
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        if not 1 <= options['accounts'] <= len(ACCOUNTS):
+            raise CommandError(f"--accounts must be between 1 and {len(ACCOUNTS)}.")
+        prefix = options['prefix']
+        if get_user_model().objects.filter(username__startswith=prefix).exists():
+            raise CommandError(f"Users with the prefix '{prefix}' already exist; pick another --prefix.")
+
+        seeder = BudgetSeeder(
+            seed=options['seed'],
+            years=options['years'],
+            end=options['end'],
+            batch_size=options['batch_size'],
+            password=options['password'],
+        )
+        seeder.seed_users(
+            options['users'],
+            options['transactions'],
+            accounts=options['accounts'],
+            savings=options['savings'],
+            prefix=prefix,
+        )
+        counts = seeder.counts
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {counts['users']} users, {counts['accounts']} accounts, {counts['savings']} savings "
+            f"and {counts['transactions']} transactions in {counts['seconds']:.1f}s "
+            f"({counts['transactions'] / max(counts['seconds'], 1e-9):.0f} transactions/s)."
+        ))
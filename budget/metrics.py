@@ -0,0 +1,270 @@
+"""
+Counters and histograms in the Prometheus text format.
+
+Each process keeps its own values. With BUDGET_METRICS_DIR set, every process
+also writes them to its own file there (at most once per
+BUDGET_METRICS_FLUSH_SECONDS, and on every scrape), and /metrics adds up all
+the files, so the numbers cover every worker no matter which one is scraped.
+Files of exited workers are kept so their counts are not lost; clear the
+directory when the app is redeployed.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import ExitStack
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+REGISTRY = {}
+_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_last_flush = 0.0
+_owner = None
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        REGISTRY[name] = self
+
+    def key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def label_text(self, key, extra=()):
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    @staticmethod
+    def merge(left, right):
+        return left + right
+
+    def lines(self, values):
+        for key, value in sorted(values.items()):
+            yield f"{self.name}{self.label_text(key)} {_number(value)}"
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self.key(labels)
+        index = bisect_left(self.buckets, value)
+        with _lock:
+            # One count per bucket plus +Inf, then the sum and the number of observations.
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = [0] * (len(self.buckets) + 1) + [0, 0]
+            state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    @staticmethod
+    def merge(left, right):
+        return [a + b for a, b in zip(left, right)]
+
+    def lines(self, values):
+        bounds = [_number(bound) for bound in self.buckets] + ['+Inf']
+        for key, state in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(bounds, state):
+                cumulative += count
+                yield f"{self.name}_bucket{self.label_text(key, [('le', bound)])} {cumulative}"
+            yield f"{self.name}_sum{self.label_text(key)} {_number(state[-2])}"
+            yield f"{self.name}_count{self.label_text(key)} {state[-1]}"
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+REQUEST_LATENCY = Histogram(
+    'budget_request_duration_seconds', 'Time spent handling a request, by URL name.', ['view', 'method'],
+)
+REQUESTS = Counter(
+    'budget_requests_total', 'Finished requests, by URL name and status code.', ['view', 'method', 'status'],
+)
+REQUEST_QUERIES = Histogram(
+    'budget_request_db_queries', 'Database queries run by one request, by URL name.', ['view'], QUERY_BUCKETS,
+)
+DB_QUERIES = Counter('budget_db_queries_total', 'Database queries run while handling requests.')
+CACHE_REQUESTS = Counter('budget_cache_requests_total', 'Per-user cache lookups, by result.', ['result'])
+TRANSACTION_WRITES = Counter(
+    'budget_transaction_writes_total', 'Transaction rows created, updated or deleted.', ['operation'],
+)
+IMPORTED_ROWS = Counter('budget_import_rows_total', 'Rows read by transaction imports, by outcome.', ['outcome'])
+IMPORT_SECONDS = Counter('budget_import_seconds_total', 'Time spent running transaction imports.')
+EXPORTED_ROWS = Counter('budget_export_rows_total', 'Transactions written by exports.')
+EXPORT_SECONDS = Counter('budget_export_seconds_total', 'Time spent streaming exports.')
+
+
+def snapshot():
+    with _lock:
+        return {name: {key: list(value) if isinstance(value, list) else value
+                       for key, value in metric.values.items()}
+                for name, metric in REGISTRY.items()}
+
+
+def _metrics_file():
+    global _owner
+    pid = os.getpid()
+    if _owner is None or _owner[0] != pid:
+        # A fresh name after fork, so a reused pid never overwrites a dead worker's file.
+        _owner = (pid, f"metrics-{pid}-{uuid.uuid4().hex[:8]}.json")
+    return Path(settings.BUDGET_METRICS_DIR) / _owner[1]
+
+
+def flush(force=False):
+    """Write this process's values to BUDGET_METRICS_DIR, if it is set and due."""
+    global _last_flush
+    if not settings.BUDGET_METRICS_DIR:
+        return
+    now = time.monotonic()
+    if not force and now - _last_flush < settings.BUDGET_METRICS_FLUSH_SECONDS:
+        return
+    with _flush_lock:
+        _last_flush = now
+        path = _metrics_file()
+        data = {name: [[list(key), value] for key, value in values.items()] for name, values in snapshot().items()}
+        tmp = path.with_suffix('.tmp')
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp.write_text(json.dumps(data))
+        os.replace(tmp, path)
+
+
+def collect():
+    """Values of this process, or of every process sharing BUDGET_METRICS_DIR."""
+    if not settings.BUDGET_METRICS_DIR:
+        return snapshot()
+
+    flush(force=True)
+    combined = {name: {} for name in REGISTRY}
+    for path in Path(settings.BUDGET_METRICS_DIR).glob('metrics-*.json'):
+        try:
+            data = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue  # Removed or replaced while we were reading.
+        for name, samples in data.items():
+            metric = REGISTRY.get(name)
+            if metric is None:
+                continue
+            values = combined[name]
+            for key, value in samples:
+                key = tuple(key)
+                values[key] = metric.merge(values[key], value) if key in values else value
+    return combined
+
+
+def render(values=None):
+    values = collect() if values is None else values
+    lines = []
+    for name, metric in REGISTRY.items():
+        lines.append(f"# HELP {name} {metric.documentation}")
+        lines.append(f"# TYPE {name} {metric.type}")
+        lines.extend(metric.lines(values.get(name, {})))
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    with _lock:
+        for metric in REGISTRY.values():
+            metric.values.clear()
+
+
+class MetricsMiddleware:
+    """
+    Time every request and count its queries. Disabled with BUDGET_METRICS=0.
+
+    Works in both modes, so under ASGI it does not push async views through a
+    thread of their own.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.BUDGET_METRICS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        start = time.perf_counter()
+        with _QueryCounter() as counter:
+            response = self.get_response(request)
+        self.record(request, response, time.perf_counter() - start, counter.queries)
+        return response
+
+    async def __acall__(self, request):
+        # Connections belong to threads, so the wrapper goes on the thread that
+        # runs this request's ORM calls, not on the event loop's.
+        start = time.perf_counter()
+        counter = _QueryCounter()
+        await sync_to_async(counter.__enter__)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(counter.close)()
+        self.record(request, response, time.perf_counter() - start, counter.queries)
+        return response
+
+    def record(self, request, response, elapsed, queries):
+        # Label by URL name rather than path, so ids in URLs do not create new series.
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        REQUEST_LATENCY.observe(elapsed, view=view, method=request.method)
+        REQUESTS.inc(view=view, method=request.method, status=response.status_code)
+        REQUEST_QUERIES.observe(queries, view=view)
+        DB_QUERIES.inc(queries)
+        flush()
+
+
+class _QueryCounter(ExitStack):
+    """Count the queries run on any connection while the block is open."""
+
+    def __enter__(self):
+        super().__enter__()
+        self.queries = 0
+        for connection in connections.all():
+            self.enter_context(connection.execute_wrapper(self.count))
+        return self
+
+    def count(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
@@ -0,0 +1,31 @@
+# Generated by Django 6.0 on 2026-10-17 21:19
+
+from django.db import migrations, models
+from django.db.models import Q, Sum
+
+
+def populate_balances(apps, schema_editor):
+    BankAccount = apps.get_model('budget', 'BankAccount')
+    accounts = BankAccount.objects.annotate(
+        incomes=Sum('transactions__amount', filter=Q(transactions__type='IN')),
+        outcomes=Sum('transactions__amount', filter=Q(transactions__type='OUT')),
+    )
+    for account in accounts.iterator():
+        account.balance = (account.incomes or 0) - (account.outcomes or 0)
+        account.save(update_fields=['balance'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budget', '0002_remove_bankaccount_balance_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bankaccount',
+            name='balance',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.RunPython(populate_balances, migrations.RunPython.noop),
+    ]
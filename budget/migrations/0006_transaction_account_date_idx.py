@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-17 21:48
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budget', '0005_monthlycategoryrollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['account', '-date'], name='transaction_account_date_idx'),
+        ),
+    ]
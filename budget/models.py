@@ -1,23 +1,137 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.urls import reverse
 from django.utils import timezone
 from django.conf import settings
-from django.db.models import Sum, Q
+from django.db.models import Count, Sum, Q, F, ExpressionWrapper, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, TruncMonth
+from django.core.files.storage import FileSystemStorage
 from django.core.validators import MinValueValidator
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+import os
 
+CENT = Decimal('0.01')
 
-class Category(models.Model):
+
+class SyncState(models.Model):
+    """
+    Per-user counter that orders every change for the sync feed.
+
+    save() on the synced models reserves a version automatically. Bulk writes to
+    an existing user's data must reserve versions themselves, or clients that
+    already synced will not see the rows. Rows written in bulk for a brand-new
+    user may keep version 0, because a first sync downloads everything.
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True)
+    version = models.BigIntegerField(default=0)
+
+    @classmethod
+    def reserve(cls, user_id, count=1):
+        """
+        Return the first of `count` fresh versions. The UPDATE keeps the user's row
+        locked until the surrounding transaction ends, so versions are committed in
+        the order they were handed out and a client's cursor never skips a change.
+        """
+        with transaction.atomic():
+            for _ in range(2):
+                if cls.objects.filter(user_id=user_id).update(version=F('version') + count):
+                    return cls.objects.filter(user_id=user_id).values_list('version', flat=True).get() - count + 1
+                try:
+                    with transaction.atomic():
+                        cls.objects.create(user_id=user_id, version=count)
+                    return 1
+                except IntegrityError:
+                    # Another writer created the row first; take the UPDATE path.
+                    continue
+        raise IntegrityError(f"Could not reserve sync versions for user {user_id}.")
+
+
+class Synced(models.Model):
+    """Rows that appear in the sync feed: stamped with a time and a per-user version on every save."""
+    updated_at = models.DateTimeField(auto_now=True)
+    sync_version = models.BigIntegerField(default=0, editable=False)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'updated_at', 'sync_version'}
+        with transaction.atomic():
+            self.sync_version = SyncState.reserve(self.user_id)
+            super().save(*args, **kwargs)
+
+
+class Tombstone(models.Model):
+    """A deleted synced row, kept so clients can drop their copy."""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    model = models.CharField(max_length=30)
+    object_id = models.BigIntegerField()
+    sync_version = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'sync_version'], name='tombstone_user_sync_idx'),
+        ]
+
+    @classmethod
+    def record(cls, user_id, model, object_ids, batch_size=1000):
+        object_ids = list(object_ids)
+        if not object_ids:
+            return
+        first = SyncState.reserve(user_id, len(object_ids))
+        cls.objects.bulk_create(
+            [
+                cls(user_id=user_id, model=model._meta.model_name, object_id=pk, sync_version=first + offset)
+                for offset, pk in enumerate(object_ids)
+            ],
+            batch_size=batch_size,
+        )
+
+    def __str__(self):
+        return f"{self.model} {self.object_id} deleted at version {self.sync_version}"
+
+
+class Category(Synced):
     name = models.CharField(max_length=50)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
 
     class Meta:
         unique_together = ('name', 'user')
+        indexes = [
+            models.Index(fields=['user', 'sync_version'], name='category_user_sync_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
 
-class BankAccount(models.Model):
+class BankAccountQuerySet(models.QuerySet):
+    def with_totals(self):
+        """
+        Annotate incoming, outgoing and net_balance plus last_transaction_date.
+
+        The sums come from the monthly rollups, a few rows per account and month,
+        in one GROUP BY; the latest date is an indexed lookup per account.
+        """
+        money = models.DecimalField(max_digits=14, decimal_places=2)
+        last_date = (
+            Transaction.objects.filter(account=OuterRef('pk'))
+            .order_by('-date')
+            .values('date')[:1]
+        )
+        return self.annotate(
+            incoming=Coalesce(Sum('rollups__total', filter=Q(rollups__type='IN')), Value(0), output_field=money),
+            outgoing=Coalesce(Sum('rollups__total', filter=Q(rollups__type='OUT')), Value(0), output_field=money),
+            net_balance=ExpressionWrapper(F('incoming') - F('outgoing'), output_field=money),
+            last_transaction_date=Subquery(last_date, output_field=models.DateTimeField()),
+        )
+
+
+class BankAccount(Synced):
     TYPE_ACCOUNT = [
         ('ADULT', 'Adult'),
         ('CHILD', 'Child'),
@@ -40,20 +154,98 @@ class BankAccount(models.Model):
         decimal_places=2,
         validators=[MinValueValidator(0, message='The opening balance cannot be negative.')]
     )
+    # Running total of incomes minus outcomes, maintained by Transaction.save()
+    # and the transaction post_delete handler. Rebuild with `manage.py rebuild_balances`.
+    balance = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        editable=False
+    )
+
+    objects = BankAccountQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'sync_version'], name='bankaccount_user_sync_idx'),
+        ]
 
     @property
     def total_balance(self):
+        # Prefer the with_totals() annotation when the queryset loaded it. SQLite returns
+        # computed decimals unscaled, so bring it to cents like the stored field.
+        if hasattr(self, 'net_balance'):
+            return Decimal(self.net_balance).quantize(CENT)
+        return self.balance
+
+    def compute_balance(self):
         agg = self.transactions.aggregate(
             incomes=Sum('amount', filter=Q(type='IN')),
             outcomes=Sum('amount', filter=Q(type='OUT')),
         )
         return (agg['incomes'] or 0) - (agg['outcomes'] or 0)
 
+    @classmethod
+    def apply_balance_delta(cls, account_id, delta):
+        if delta:
+            cls.objects.filter(pk=account_id).update(balance=F('balance') + delta)
+
     def __str__(self):
         return f"{self.name_account} - Balance: {self.total_balance}"
 
 
-class Transaction(models.Model):
+class TransactionQuerySet(models.QuerySet):
+    # Tells budget.signals that delete() already reverted the rows and left tombstones.
+    reverts_in_bulk = False
+
+    def delete(self):
+        """
+        Revert balances and monthly rollups with one GROUP BY each, rather than
+        leaving it to the post_delete handler one row at a time.
+        """
+        with transaction.atomic():
+            balances = (
+                self.order_by().values('account_id')
+                .annotate(
+                    incomes=Sum('amount', filter=Q(type='IN')),
+                    outcomes=Sum('amount', filter=Q(type='OUT')),
+                )
+            )
+            buckets = (
+                self.order_by()
+                .annotate(month=TruncMonth('date', output_field=models.DateField()))
+                .values('user_id', 'account_id', 'category_id', 'type', 'month')
+                .annotate(total=Sum('amount'), count=Count('id'))
+            )
+            for row in balances:
+                # SQLite sums decimals as floats, so round back to cents.
+                delta = Decimal((row['incomes'] or 0) - (row['outcomes'] or 0)).quantize(CENT)
+                BankAccount.apply_balance_delta(row['account_id'], -delta)
+            for row in buckets:
+                MonthlyCategoryRollup.record(
+                    row['user_id'], row['account_id'], row['category_id'], row['type'],
+                    Decimal(row['total']).quantize(CENT), row['month'], count=-row['count'], sign=-1,
+                )
+            deleted = defaultdict(list)
+            for user_id, pk in self.order_by().values_list('user_id', 'pk'):
+                deleted[user_id].append(pk)
+            for user_id, pks in deleted.items():
+                Tombstone.record(user_id, Transaction, pks)
+            self.reverts_in_bulk = True
+            return super().delete()
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    def with_related(self):
+        """Join category and account, loading only the columns that lists and __str__ read."""
+        return self.select_related('category', 'account').only(
+            'amount', 'type', 'date', 'description', 'user', 'category', 'account',
+            'category__name', 'account__name_account', 'account__balance',
+        )
+
+
+class Transaction(Synced):
     TYPE_CHOICES = [
         ('IN', 'Income'),
         ('OUT', 'Outcome'),
@@ -89,17 +281,110 @@ class Transaction(models.Model):
         on_delete=models.CASCADE
     )
 
+    objects = TransactionQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-date'], name='transaction_user_date_idx'),
+            models.Index(fields=['account', 'type', 'amount'], name='transaction_account_type_idx'),
+            models.Index(fields=['user', 'category', 'type'], name='transaction_user_cat_type_idx'),
+            models.Index(fields=['account', '-date'], name='transaction_account_date_idx'),
+            models.Index(fields=['user', 'sync_version'], name='transaction_user_sync_idx'),
+        ]
+
+    @staticmethod
+    def signed_amount(type, amount):
+        amount = Decimal(str(amount))
+        return amount if type == 'IN' else -amount
+
+    ROLLUP_FIELDS = ('user_id', 'account_id', 'category_id', 'type', 'amount', 'date')
+
+    def rollup_fields(self):
+        return {name: getattr(self, name) for name in self.ROLLUP_FIELDS}
+
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            previous = None
+            if self.pk is not None:
+                previous = (
+                    Transaction.objects.select_for_update()
+                    .filter(pk=self.pk)
+                    .values(*self.ROLLUP_FIELDS)
+                    .first()
+                )
+            super().save(*args, **kwargs)
+
+            if previous is not None:
+                MonthlyCategoryRollup.record(**previous, count=-1, sign=-1)
+            MonthlyCategoryRollup.record(**self.rollup_fields())
+
+            delta = self.signed_amount(self.type, self.amount)
+            if previous is not None:
+                old_delta = self.signed_amount(previous['type'], previous['amount'])
+                if previous['account_id'] == self.account_id:
+                    delta -= old_delta
+                else:
+                    BankAccount.apply_balance_delta(previous['account_id'], -old_delta)
+            BankAccount.apply_balance_delta(self.account_id, delta)
 
     def delete(self, *args, **kwargs):
-        super().delete(*args, **kwargs)
+        # The balance and monthly rollup are reverted by budget.signals.revert_transaction,
+        # which also covers cascades from Category. Queryset deletes revert in bulk
+        # in TransactionQuerySet.delete().
+        return super().delete(*args, **kwargs)
 
     def __str__(self):
         return f"{self.get_type_display()}: {self.amount} PLN ({self.category.name if self.category else 'No Category'})"
 
 
-class SavingsAccount(models.Model):
+def month_start(value):
+    if isinstance(value, datetime):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        value = value.date()
+    return value.replace(day=1)
+
+
+class MonthlyCategoryRollup(models.Model):
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    account = models.ForeignKey(BankAccount, on_delete=models.CASCADE, related_name='rollups')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE)
+    type = models.CharField(max_length=3, choices=Transaction.TYPE_CHOICES)
+    month = models.DateField()
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('account', 'category', 'type', 'month')
+        indexes = [
+            models.Index(fields=['user', 'month'], name='rollup_user_month_idx'),
+        ]
+
+    @classmethod
+    def record(cls, user_id, account_id, category_id, type, amount, date, count=1, sign=1):
+        """Add (or with sign=-1, remove) one transaction's amount in its month bucket."""
+        amount = sign * Decimal(str(amount))
+        lookup = {
+            'account_id': account_id,
+            'category_id': category_id,
+            'type': type,
+            'month': month_start(date),
+        }
+        changes = {'total': F('total') + amount, 'count': F('count') + count}
+        if cls.objects.filter(**lookup).update(**changes):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(user_id=user_id, total=amount, count=count, **lookup)
+        except IntegrityError:
+            # Another writer created the bucket between our UPDATE and INSERT.
+            cls.objects.filter(**lookup).update(**changes)
+
+    def __str__(self):
+        return f"{self.month:%Y-%m} {self.category_id} {self.type}: {self.total} ({self.count})"
+
+
+class SavingsAccount(Synced):
     TYPE_SAVE = [
         ('LOKATY', 'LOKATY'),
         ('FUNDUSZE', 'FUNDUSZE'),
@@ -113,6 +398,11 @@ class SavingsAccount(models.Model):
     saving_balance = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     interest_rate = models.FloatField(default=0.01)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'sync_version'], name='savingsaccount_user_sync_idx'),
+        ]
+
     # def save(self, *args, **kwargs):
     #     super().save(*args, **kwargs)
 
@@ -126,3 +416,85 @@ class SavingsAccount(models.Model):
         if not self.pk:
             raise ValueError("Cannot reverse saving_detail because object has no PK yet")
         return reverse("budget:saving_detail", kwargs={"pk": self.pk})
+
+
+class TaskFileStorage(FileSystemStorage):
+    """
+    Private storage for task uploads and reports, served by TaskDownloadView.
+    The directory is read from BUDGET_TASK_FILES_DIR on every use rather than
+    fixed when the model loads, so overriding the setting takes effect.
+    """
+
+    @property
+    def base_location(self):
+        return settings.BUDGET_TASK_FILES_DIR
+
+    @property
+    def location(self):
+        return os.path.abspath(self.base_location)
+
+
+def task_file_storage():
+    return TaskFileStorage()
+
+
+class Task(models.Model):
+    """A background job, run by `manage.py run_tasks`. See budget.tasks."""
+    QUEUED = 'QUEUED'
+    RUNNING = 'RUNNING'
+    SUCCEEDED = 'SUCCEEDED'
+    FAILED = 'FAILED'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+
+    name = models.CharField(max_length=50)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # Moved forward by the worker while the task runs; see budget.tasks.requeue_stale.
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+    done = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(null=True, blank=True)
+    message = models.CharField(max_length=255, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    input = models.FileField(storage=task_file_storage, upload_to='input/%Y/%m/', blank=True)
+    output = models.FileField(storage=task_file_storage, upload_to='output/%Y/%m/', blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='task_status_run_after_idx'),
+            models.Index(fields=['name', 'status'], name='task_name_status_idx'),
+        ]
+
+    @property
+    def finished(self):
+        return self.status in (self.SUCCEEDED, self.FAILED)
+
+    def report(self, done, total=None, message=''):
+        """
+        Record progress. Pollers see it once the surrounding transaction commits,
+        so a task that wants live progress must not run in one atomic block.
+        """
+        self.done = done
+        if total is not None:
+            self.total = total
+        self.message = message[:255]
+        self.heartbeat_at = timezone.now()
+        Task.objects.filter(pk=self.pk).update(
+            done=self.done, total=self.total, message=self.message, heartbeat_at=self.heartbeat_at,
+        )
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
@@ -0,0 +1,92 @@
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+from django.http import Http404
+
+
+def encode_cursor(obj):
+    raw = f"{obj.date.isoformat()}|{obj.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        date, pk = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        return datetime.fromisoformat(date), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        raise Http404('Invalid cursor.')
+
+
+class KeysetPage:
+    """One page of a (-date, -id) ordered queryset, addressed by opaque cursors."""
+
+    def __init__(self, object_list, next_cursor=None, prev_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.prev_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def _window(queryset, per_page, after, before):
+    # Rows nearest the cursor first, plus one to tell whether another page exists.
+    # The plain date bound is redundant with the OR, but it is the part the
+    # database can seek to on the (user, -date) index; the OR alone is not.
+    if before:
+        date, pk = decode_cursor(before)
+        return (
+            queryset.filter(date__gte=date)
+            .filter(Q(date__gt=date) | Q(date=date, pk__gt=pk))
+            .order_by('date', 'id')[:per_page + 1]
+        )
+    queryset = queryset.order_by('-date', '-id')
+    if after:
+        date, pk = decode_cursor(after)
+        queryset = queryset.filter(date__lte=date).filter(Q(date__lt=date) | Q(date=date, pk__lt=pk))
+    return queryset[:per_page + 1]
+
+
+def _page(rows, per_page, after, before):
+    has_more = len(rows) > per_page
+    if before:
+        rows = rows[:per_page][::-1]
+        return KeysetPage(
+            rows,
+            next_cursor=encode_cursor(rows[-1]) if rows else before,
+            prev_cursor=encode_cursor(rows[0]) if has_more else None,
+        )
+    rows = rows[:per_page]
+    return KeysetPage(
+        rows,
+        next_cursor=encode_cursor(rows[-1]) if has_more else None,
+        prev_cursor=encode_cursor(rows[0]) if after and rows else None,
+    )
+
+
+def keyset_paginate(queryset, per_page, after=None, before=None):
+    """
+    Seek to the page after or before a cursor without OFFSET or COUNT(*).
+
+    Each call reads at most per_page + 1 rows; the extra row only tells us
+    whether another page exists in that direction.
+    """
+    return _page(list(_window(queryset, per_page, after, before)), per_page, after, before)
+
+
+async def akeyset_paginate(queryset, per_page, after=None, before=None):
+    rows = [row async for row in _window(queryset, per_page, after, before)]
+    return _page(rows, per_page, after, before)
@@ -0,0 +1,159 @@
+import logging
+import re
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger('budget.sql')
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_SPACES = re.compile(r"\s+")
+
+_summary_lock = threading.Lock()
+_summary = defaultdict(lambda: deque(maxlen=settings.BUDGET_SQL_PROFILING_WINDOW))
+
+
+def fingerprint(sql):
+    """Reduce a query to its shape, so the same query with other parameters matches."""
+    sql = _LITERALS.sub('?', sql)
+    sql = _IN_LISTS.sub('(...)', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+class QueryRecorder:
+    """Database execute wrapper that notes the SQL and duration of every query."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - start))
+
+    @property
+    def total_ms(self):
+        return sum(duration for _, duration in self.queries) * 1000
+
+    def by_fingerprint(self):
+        """Return [(fingerprint, count, total ms)] with the most expensive first."""
+        grouped = defaultdict(lambda: [0, 0.0])
+        for sql, duration in self.queries:
+            entry = grouped[fingerprint(sql)]
+            entry[0] += 1
+            entry[1] += duration * 1000
+        return sorted(
+            ((shape, count, ms) for shape, (count, ms) in grouped.items()),
+            key=lambda item: item[2],
+            reverse=True,
+        )
+
+
+class SQLProfilingMiddleware:
+    """
+    Count the queries of each request, time them and spot repeated ones.
+
+    Enabled by BUDGET_SQL_PROFILING. Queries run while a streaming response is
+    being consumed happen after the middleware returns and are not counted.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.BUDGET_SQL_PROFILING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        recorder = QueryRecorder()
+        with ExitStack() as stack:
+            _watch_connections(stack, recorder)
+            response = self.get_response(request)
+        return self.report(request, response, recorder)
+
+    async def __acall__(self, request):
+        # As in MetricsMiddleware: the wrappers go on the thread that runs this
+        # request's ORM calls, not on the event loop's.
+        recorder = QueryRecorder()
+        stack = ExitStack()
+        await sync_to_async(_watch_connections)(stack, recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self.report(request, response, recorder)
+
+    def report(self, request, response, recorder):
+        shapes = recorder.by_fingerprint()
+        duplicates = [(shape, count, ms) for shape, count, ms in shapes if count > 1]
+        total_ms = recorder.total_ms
+        count = len(recorder.queries)
+
+        response['X-SQL-Queries'] = str(count)
+        response['Server-Timing'] = f'sql;dur={total_ms:.2f};desc="{count} queries, {len(duplicates)} repeated"'
+
+        # Unresolved requests share one bucket so random 404 paths cannot grow the summary.
+        match = request.resolver_match
+        view = match.view_name if match else '<unresolved>'
+        _record(view, count, total_ms, duplicates)
+
+        if count > settings.BUDGET_SQL_PROFILING_MAX_QUERIES or total_ms > settings.BUDGET_SQL_PROFILING_MAX_MS:
+            top = '\n'.join(f"  {n}x {ms:.1f}ms {shape[:300]}" for shape, n, ms in shapes[:5])
+            logger.warning(
+                "%s %s ran %d queries in %.1fms (%d repeated shapes)\n%s",
+                request.method, request.path, count, total_ms, len(duplicates), top,
+            )
+        return response
+
+
+def _watch_connections(stack, recorder):
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(recorder))
+
+
+def _record(view, count, total_ms, duplicates):
+    with _summary_lock:
+        _summary[view].append((count, total_ms, [(shape, n) for shape, n, _ in duplicates]))
+
+
+def profiling_summary():
+    """Per view statistics over the last BUDGET_SQL_PROFILING_WINDOW requests of this process."""
+    with _summary_lock:
+        windows = {view: list(entries) for view, entries in _summary.items()}
+
+    summary = {}
+    for view, entries in windows.items():
+        counts = sorted(count for count, _, _ in entries)
+        timings = sorted(ms for _, ms, _ in entries)
+        repeated = Counter()
+        for _, _, duplicates in entries:
+            for shape, n in duplicates:
+                repeated[shape] += n
+        summary[view] = {
+            'requests': len(entries),
+            'queries_avg': sum(counts) / len(counts),
+            'queries_max': counts[-1],
+            'sql_ms_avg': sum(timings) / len(timings),
+            'sql_ms_p95': timings[max(0, -(-len(timings) * 95 // 100) - 1)],
+            'repeated_queries': [{'sql': shape, 'count': n} for shape, n in repeated.most_common(5)],
+        }
+    return summary
+
+
+def reset_profiling_summary():
+    with _summary_lock:
+        _summary.clear()
@@ -0,0 +1,229 @@
+"""Synthetic budget data for load tests and benchmarks.
+
+Users, accounts, categories, savings and rollups go through batched
+``bulk_create``. Transactions are by far the bulk of the data, so they skip model
+instances and are written with ``executemany`` using values prepared by the
+model fields themselves. Either way ``Transaction.save()`` is bypassed, so
+account balances and monthly rollups are totalled in memory while generating
+and written once per chunk of users.
+"""
+import calendar
+import math
+import random
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.utils import timezone
+
+from .models import BankAccount, Category, MonthlyCategoryRollup, SavingsAccount, Transaction
+from .services import provision_default_categories
+
+# Category name -> (relative frequency, median amount in PLN, log-normal spread).
+SPENDING = {
+    'Food': (40, 45, 0.8),
+    'Bills': (6, 250, 0.5),
+    'Transport': (15, 30, 0.7),
+    'Entertainment': (10, 60, 0.9),
+    'Shopping': (15, 120, 1.0),
+    'Life': (8, 80, 0.9),
+    'Investments': (2, 500, 0.6),
+    'Other': (4, 50, 1.0),
+}
+DEFAULT_SPENDING = (5, 50, 1.0)
+
+# How busy each weekday is, Monday first.
+WEEKDAY_WEIGHTS = (12, 12, 13, 14, 17, 19, 13)
+
+# Name, account type and share of the user's spending.
+ACCOUNTS = [
+    ('Konto główne', 'ADULT', 70),
+    ('Konto wspólne', 'ADULT', 20),
+    ('Konto dziecka', 'CHILD', 10),
+]
+
+SALARY_MEDIAN = 6500
+SALARY_DAY = 10
+MAX_AMOUNT_CENTS = 10 ** 10 - 1
+
+
+def _cents(rng, median, spread):
+    value = rng.lognormvariate(math.log(median), spread)
+    return min(max(1, round(value * 100)), MAX_AMOUNT_CENTS)
+
+
+def _money(cents):
+    return Decimal(cents).scaleb(-2)
+
+
+class BudgetSeeder:
+    """Create users with accounts, categories, savings and years of transactions.
+
+    The same ``seed``, ``years`` and ``end`` always produce the same data.
+    """
+
+    def __init__(self, seed=0, years=3, end=None, batch_size=10000, password='budget-pass'):
+        self.seed = seed
+        self.end = end or timezone.localdate()
+        year = self.end.year - years
+        # 29 February has no counterpart in a common year; start on the 28th.
+        self.start = self.end.replace(year=year, day=min(self.end.day, calendar.monthrange(year, self.end.month)[1]))
+        self.batch_size = batch_size
+        self.password = make_password(password)
+        self.tz = timezone.get_current_timezone()
+
+        self.days = [self.start + timedelta(days=n) for n in range((self.end - self.start).days + 1)]
+        weights, total = [], 0
+        for day in self.days:
+            total += WEEKDAY_WEIGHTS[day.weekday()]
+            weights.append(total)
+        self.day_weights = weights
+        self.paydays = [day for day in self.days if day.day == SALARY_DAY]
+
+        self.pending = []
+        self.counts = defaultdict(int)
+
+        opts = Transaction._meta
+        quote = connection.ops.quote_name
+        self.amount_field = opts.get_field('amount')
+        # Amounts cluster around a few medians, so each is prepared for the database once.
+        self.prepared_amounts = {}
+        self.date_field = opts.get_field('date')
+        # Raw inserts get no Django defaults, so the sync columns are written explicitly.
+        # Version 0 is fine for brand-new users: their first sync downloads everything.
+        self.sync_columns = (
+            0, opts.get_field('updated_at').get_db_prep_save(timezone.now(), connections[DEFAULT_DB_ALIAS]),
+        )
+        columns = [
+            opts.get_field(name).column
+            for name in ('user', 'account', 'category', 'type', 'amount', 'date', 'sync_version', 'updated_at')
+        ]
+        self.insert_sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            quote(opts.db_table),
+            ', '.join(quote(column) for column in columns),
+            ', '.join(['%s'] * len(columns)),
+        )
+
+    def seed_users(self, count, transactions, accounts=2, savings=2, prefix='seed', first=0):
+        """Create ``count`` users named ``<prefix><n>`` and return the created users."""
+        started = time.perf_counter()
+        per_chunk = max(1, min(1000, 10 * self.batch_size // max(transactions, 1)))
+        created = []
+        for chunk_start in range(first, first + count, per_chunk):
+            indexes = range(chunk_start, min(chunk_start + per_chunk, first + count))
+            with transaction.atomic():
+                created.extend(self._seed_chunk(indexes, transactions, accounts, savings, prefix))
+        self.counts['seconds'] = time.perf_counter() - started
+        return created
+
+    def _seed_chunk(self, indexes, transactions, max_accounts, max_savings, prefix):
+        User = get_user_model()
+        users = User.objects.bulk_create(
+            [User(username=f"{prefix}{index:06d}", password=self.password) for index in indexes],
+            batch_size=self.batch_size,
+        )
+        provision_default_categories(users, batch_size=self.batch_size)
+        categories = defaultdict(list)
+        for category in Category.objects.filter(user__in=users).only('id', 'name', 'user_id').order_by('pk'):
+            categories[category.user_id].append(category)
+
+        rngs = {user.pk: random.Random(f"{self.seed}-{index}") for user, index in zip(users, indexes)}
+        accounts, savings = [], []
+        for user in users:
+            rng = rngs[user.pk]
+            for name, account_type, _ in ACCOUNTS[:rng.randint(1, max_accounts)]:
+                accounts.append(BankAccount(
+                    user=user,
+                    name_account=name,
+                    account_type=account_type,
+                    initial_balance=_money(_cents(rng, 2000, 1.0)),
+                    account_creation_date=datetime.combine(self.start, datetime.min.time(), self.tz),
+                ))
+            for number in range(rng.randint(0, max_savings)):
+                savings.append(SavingsAccount(
+                    user=user,
+                    saving_name=f"Oszczędności {number + 1}",
+                    saving_type=rng.choice(SavingsAccount.TYPE_SAVE)[0],
+                    saving_balance=_money(_cents(rng, 10000, 1.2)),
+                    interest_rate=rng.choice([0.01, 0.02, 0.035, 0.05]),
+                ))
+        accounts = BankAccount.objects.bulk_create(accounts, batch_size=self.batch_size)
+        SavingsAccount.objects.bulk_create(savings, batch_size=self.batch_size)
+        self.counts['users'] += len(users)
+        self.counts['accounts'] += len(accounts)
+        self.counts['savings'] += len(savings)
+
+        accounts_by_user = defaultdict(list)
+        for account in accounts:
+            accounts_by_user[account.user_id].append(account)
+
+        rollups = []
+        for user in users:
+            rollups.extend(self._seed_transactions(
+                rngs[user.pk], user.pk, accounts_by_user[user.pk], categories[user.pk], transactions
+            ))
+        self._flush()
+        MonthlyCategoryRollup.objects.bulk_create(rollups, batch_size=self.batch_size)
+        BankAccount.objects.bulk_update(accounts, ['balance'], batch_size=self.batch_size)
+        return users
+
+    def _seed_transactions(self, rng, user_id, accounts, categories, count):
+        buckets = defaultdict(lambda: [0, 0])
+        balances = defaultdict(int)
+        main = accounts[0]
+        salary = _cents(rng, SALARY_MEDIAN, 0.35)
+        income_category = next((c for c in categories if c.name == 'Other'), categories[0])
+
+        rows = [
+            (datetime.combine(day, datetime.min.time(), self.tz) + timedelta(hours=8),
+             main.pk, income_category.pk, 'IN', salary)
+            for day in self.paydays[max(0, len(self.paydays) - count):]
+        ]
+        spending = [SPENDING.get(category.name, DEFAULT_SPENDING) for category in categories]
+        days = rng.choices(self.days, cum_weights=self.day_weights, k=count - len(rows))
+        picked_accounts = rng.choices(accounts, weights=[share for _, _, share in ACCOUNTS[:len(accounts)]], k=len(days))
+        picked = rng.choices(range(len(categories)), weights=[weight for weight, _, _ in spending], k=len(days))
+        for day, account, index in zip(days, picked_accounts, picked):
+            _, median, spread = spending[index]
+            moment = datetime.combine(day, datetime.min.time(), self.tz) + timedelta(
+                hours=rng.randint(7, 22), minutes=rng.randint(0, 59)
+            )
+            rows.append((moment, account.pk, categories[index].pk, 'OUT', _cents(rng, median, spread)))
+        rows.sort()
+
+        db = connections[DEFAULT_DB_ALIAS]
+        prepare_date = self.date_field.get_db_prep_save
+        amounts = self.prepared_amounts
+        sync_columns = self.sync_columns
+        for moment, account_id, category_id, type, cents in rows:
+            amount = amounts.get(cents)
+            if amount is None:
+                amount = amounts[cents] = self.amount_field.get_db_prep_save(_money(cents), db)
+            self.pending.append((user_id, account_id, category_id, type, amount, prepare_date(moment, db), *sync_columns))
+            bucket = buckets[account_id, category_id, type, moment.date().replace(day=1)]
+            bucket[0] += cents
+            bucket[1] += 1
+            balances[account_id] += cents if type == 'IN' else -cents
+            if len(self.pending) >= self.batch_size:
+                self._flush()
+
+        for account in accounts:
+            account.balance = _money(balances[account.pk])
+        return [
+            MonthlyCategoryRollup(
+                user_id=user_id, account_id=account_id, category_id=category_id,
+                type=type, month=month, total=_money(total), count=number,
+            )
+            for (account_id, category_id, type, month), (total, number) in buckets.items()
+        ]
+
+    def _flush(self):
+        if self.pending:
+            with connection.cursor() as cursor:
+                cursor.executemany(self.insert_sql, self.pending)
+            self.counts['transactions'] += len(self.pending)
+            self.pending = []
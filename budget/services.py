@@ -0,0 +1,168 @@
+import calendar
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, DateField, DecimalField, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, TruncMonth
+
+from .models import BankAccount, Category, MonthlyCategoryRollup, SavingsAccount, Transaction, month_start
+
+
+def _scalar(queryset, expression, output_field):
+    # Correlated subquery returning one aggregate for the outer user row.
+    subquery = (
+        queryset.filter(user=OuterRef('pk'))
+        .order_by()
+        .values('user')
+        .annotate(result=expression)
+        .values('result')
+    )
+    return Coalesce(Subquery(subquery, output_field=output_field), Value(0), output_field=output_field)
+
+
+def _dashboard_query(user):
+    money = DecimalField(max_digits=14, decimal_places=2)
+    rollups = MonthlyCategoryRollup.objects
+    return (
+        get_user_model().objects.filter(pk=user.pk)
+        .annotate(
+            total_in=_scalar(rollups, Sum('total', filter=Q(type='IN')), money),
+            total_out=_scalar(rollups, Sum('total', filter=Q(type='OUT')), money),
+            account_count=_scalar(BankAccount.objects, Count('id'), IntegerField()),
+            savings_count=_scalar(SavingsAccount.objects, Count('id'), IntegerField()),
+            total_savings=_scalar(SavingsAccount.objects, Sum('saving_balance'), money),
+        )
+        .values('total_in', 'total_out', 'account_count', 'savings_count', 'total_savings')
+    )
+
+
+def _dashboard_row(row):
+    if row is None:
+        row = dict.fromkeys(['total_in', 'total_out', 'account_count', 'savings_count', 'total_savings'], 0)
+    row['total_balance'] = row['total_in'] - row['total_out']
+    return row
+
+
+def dashboard_summary(user):
+    """Totals shown on the dashboard, fetched in a single SELECT."""
+    return _dashboard_row(_dashboard_query(user).first())
+
+
+async def adashboard_summary(user):
+    return _dashboard_row(await _dashboard_query(user).afirst())
+
+
+def _whole_months(start, end):
+    starts_on_month = start is None or start.day == 1
+    ends_on_month = end is None or end.day == calendar.monthrange(end.year, end.month)[1]
+    return starts_on_month and ends_on_month
+
+
+def _statistics_query(user, start, end, account):
+    if _whole_months(start, end):
+        rows = MonthlyCategoryRollup.objects.filter(user=user, count__gt=0)
+        amount, date = 'total', 'month'
+    else:
+        rows = Transaction.objects.filter(user=user)
+        amount, date = 'amount', 'date__date'
+    if start:
+        rows = rows.filter(**{f'{date}__gte': start})
+    if end:
+        rows = rows.filter(**{f'{date}__lte': end})
+    if account:
+        rows = rows.filter(account=account)
+
+    return (
+        rows.values('category_id', 'category__name')
+        .annotate(
+            incomes=Sum(amount, filter=Q(type='IN')),
+            outcomes=Sum(amount, filter=Q(type='OUT')),
+        )
+        .order_by('category__name')
+    )
+
+
+def _statistics_series(rows):
+    series = {'labels': [], 'incomes': [], 'outcomes': []}
+    for row in rows:
+        series['labels'].append(row['category__name'])
+        series['incomes'].append(float(row['incomes'] or 0))
+        series['outcomes'].append(float(row['outcomes'] or 0))
+    return series
+
+
+def category_statistics(user, start=None, end=None, account=None):
+    """
+    Per-category income and outcome totals as parallel lists for Chart.js.
+
+    Read from MonthlyCategoryRollup when the date range covers whole months,
+    so the cost is O(months x categories). Ranges that cut a month in half
+    fall back to grouping the raw transactions.
+    """
+    return _statistics_series(_statistics_query(user, start, end, account))
+
+
+async def acategory_statistics(user, start=None, end=None, account=None):
+    return _statistics_series([row async for row in _statistics_query(user, start, end, account)])
+
+
+def rebuild_rollups(users=None, batch_size=1000):
+    """Recompute MonthlyCategoryRollup from transactions, for all or some users."""
+    transactions = Transaction.objects.all()
+    rollups = MonthlyCategoryRollup.objects.all()
+    if users is not None:
+        transactions = transactions.filter(user__in=users)
+        rollups = rollups.filter(user__in=users)
+
+    rows = (
+        transactions.annotate(month=TruncMonth('date', output_field=DateField()))
+        .values('user_id', 'account_id', 'category_id', 'type', 'month')
+        .annotate(total=Sum('amount'), count=Count('id'))
+        .order_by()
+    )
+    with transaction.atomic():
+        rollups.delete()
+        created = MonthlyCategoryRollup.objects.bulk_create(
+            [MonthlyCategoryRollup(**row) for row in rows.iterator(chunk_size=batch_size)],
+            batch_size=batch_size,
+        )
+    return len(created)
+
+
+def apply_transaction_changes(added=(), removed=()):
+    """
+    Update balances and monthly rollups after writes that bypass Transaction.save().
+
+    `added` and `removed` hold Transaction.rollup_fields() dicts of the new rows and
+    of the old state of changed rows. Work is one UPDATE per account and per
+    month bucket, however many rows changed.
+    """
+    balances = defaultdict(Decimal)
+    buckets = defaultdict(lambda: [Decimal(0), 0])
+    for sign, rows in ((1, added), (-1, removed)):
+        for row in rows:
+            balances[row['account_id']] += sign * Transaction.signed_amount(row['type'], row['amount'])
+            bucket = buckets[
+                row['user_id'], row['account_id'], row['category_id'], row['type'], month_start(row['date'])
+            ]
+            bucket[0] += sign * Decimal(str(row['amount']))
+            bucket[1] += sign
+
+    for account_id, delta in balances.items():
+        BankAccount.apply_balance_delta(account_id, delta)
+    for (user_id, account_id, category_id, type, month), (total, count) in buckets.items():
+        if total or count:
+            MonthlyCategoryRollup.record(user_id, account_id, category_id, type, total, month, count=count)
+
+
+def provision_default_categories(users, names=None, batch_size=1000):
+    """Create the default categories for many users in one INSERT per batch."""
+    names = settings.BUDGET_DEFAULT_CATEGORIES if names is None else names
+    Category.objects.bulk_create(
+        [Category(user=user, name=name) for user in users for name in names],
+        batch_size=batch_size,
+        ignore_conflicts=True,
+    )
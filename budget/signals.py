@@ -0,0 +1,68 @@
+from django.contrib.auth import get_user_model
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .caching import invalidate_user
+from .metrics import TRANSACTION_WRITES
+from .models import BankAccount, Category, MonthlyCategoryRollup, SavingsAccount, Tombstone, Transaction
+
+
+def _deleted_with(origin, model):
+    if isinstance(origin, model):
+        return True
+    return isinstance(origin, QuerySet) and origin.model is model
+
+
+@receiver(post_delete, sender=Transaction)
+def revert_transaction(sender, instance, origin=None, **kwargs):
+    # Runs inside the Collector's atomic block, so these updates commit together
+    # with the DELETE. Skipped for rows that are being cascaded away anyway.
+    TRANSACTION_WRITES.inc(operation='delete')
+    if _deleted_with(origin, get_user_model()):
+        return  # A rollup recorded now would point at the user being deleted.
+    if _deleted_with(origin, BankAccount) or getattr(origin, 'reverts_in_bulk', False):
+        return
+    BankAccount.apply_balance_delta(
+        instance.account_id,
+        -Transaction.signed_amount(instance.type, instance.amount)
+    )
+    if not _deleted_with(origin, Category):
+        MonthlyCategoryRollup.record(**instance.rollup_fields(), count=-1, sign=-1)
+
+
+@receiver(post_save, sender=Transaction)
+def count_transaction_write(sender, created, **kwargs):
+    TRANSACTION_WRITES.inc(operation='create' if created else 'update')
+
+
+@receiver(post_save, sender=Transaction)
+@receiver(post_delete, sender=Transaction)
+@receiver(post_save, sender=BankAccount)
+@receiver(post_delete, sender=BankAccount)
+@receiver(post_save, sender=SavingsAccount)
+@receiver(post_delete, sender=SavingsAccount)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_user_cache(sender, instance, **kwargs):
+    invalidate_user(instance.user_id)
+
+
+@receiver(pre_delete, sender=BankAccount)
+def bury_account_transactions(sender, instance, origin=None, **kwargs):
+    # One tombstone batch per account instead of one per cascaded transaction;
+    # record_tombstone skips those rows below.
+    if not _deleted_with(origin, get_user_model()):
+        Tombstone.record(instance.user_id, Transaction, instance.transactions.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Transaction)
+@receiver(post_delete, sender=BankAccount)
+@receiver(post_delete, sender=SavingsAccount)
+@receiver(post_delete, sender=Category)
+def record_tombstone(sender, instance, origin=None, **kwargs):
+    if _deleted_with(origin, get_user_model()):
+        return  # The user's whole history goes, tombstones included.
+    if sender is Transaction and (_deleted_with(origin, BankAccount) or getattr(origin, 'reverts_in_bulk', False)):
+        return
+    Tombstone.record(instance.user_id, sender, [instance.pk])
@@ -0,0 +1,247 @@
+"""
+A small task queue kept in the database, so long jobs need no broker.
+
+Views enqueue() a job and poll its Task row; `manage.py run_tasks` claims
+and runs it. A job is a function registered with @task and called as
+func(job, **payload), where job is the Task row and payload holds
+JSON-serialisable arguments. It may call job.report(done, total, message)
+as it goes. Its return value is stored as the task's result.
+
+A job that raises is retried after retry_delay, doubled on every attempt,
+until it has run max_attempts times. It is then marked failed. At most
+`concurrency` tasks of one name run at a time across all workers. A task
+whose worker stops sending heartbeats for BUDGET_TASK_TIMEOUT seconds goes
+through the same retry rule, so jobs must be safe to run again.
+"""
+import logging
+import os
+import socket
+import tempfile
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import DatabaseError, connection
+from django.db.models import Count, F, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .exporters import EXPORT_FORMATS, export_rows
+from .importers import TransactionImporter, iter_rows, open_text
+from .models import BankAccount, Task
+from .services import rebuild_rollups
+
+logger = logging.getLogger('budget.tasks')
+
+EXPORT_PROGRESS_EVERY = 5000
+
+
+class Registered:
+    def __init__(self, func, max_attempts, concurrency, retry_delay):
+        self.func = func
+        self.max_attempts = max_attempts
+        self.concurrency = concurrency
+        self.retry_delay = retry_delay
+
+
+REGISTRY = {}
+
+
+def task(name=None, max_attempts=3, concurrency=None, retry_delay=30):
+    def register(func):
+        REGISTRY[name or func.__name__] = Registered(func, max_attempts, concurrency, retry_delay)
+        return func
+    return register
+
+
+def enqueue(name, user=None, input=None, **payload):
+    """Queue a registered job. `input` is an optional file the job reads from job.input."""
+    if name not in REGISTRY:
+        raise ValueError(f"Unknown task {name!r}.")
+    job = Task(name=name, user=user, payload=payload, max_attempts=REGISTRY[name].max_attempts)
+    if input is not None:
+        job.input.save(os.path.basename(input.name), input, save=False)
+    job.save()
+    return job
+
+
+def claim(worker):
+    """Mark the next runnable task as running for `worker` and return it, or None."""
+    now = timezone.now()
+    running = dict(
+        Task.objects.filter(status=Task.RUNNING).values('name').annotate(count=Count('id')).values_list('name', 'count')
+    )
+    full = [name for name, spec in REGISTRY.items() if spec.concurrency and running.get(name, 0) >= spec.concurrency]
+    candidates = (
+        Task.objects.filter(status=Task.QUEUED, run_after__lte=now)
+        .exclude(name__in=full)
+        .order_by('run_after', 'pk')
+        .values_list('pk', 'name')[:20]
+    )
+    for pk, name in candidates:
+        claimed = Task.objects.filter(pk=pk, status=Task.QUEUED)
+        limit = REGISTRY[name].concurrency if name in REGISTRY else None
+        if limit:
+            # Re-checked in the UPDATE itself, so two workers racing for the
+            # last slot cannot both take it on databases that serialise writes.
+            busy = (
+                Task.objects.filter(name=name, status=Task.RUNNING).order_by()
+                .values('name').annotate(count=Count('id')).values('count')
+            )
+            claimed = claimed.alias(busy=Coalesce(Subquery(busy), Value(0))).filter(busy__lt=limit)
+        updated = claimed.update(
+            status=Task.RUNNING, worker=worker, attempts=F('attempts') + 1,
+            started_at=now, heartbeat_at=now, finished_at=None,
+        )
+        if updated:
+            return Task.objects.get(pk=pk)
+    return None
+
+
+def _retry_or_fail(job, error):
+    now = timezone.now()
+    spec = REGISTRY.get(job.name)
+    job.error = error
+    if spec is not None and job.attempts < job.max_attempts:
+        job.status = Task.QUEUED
+        job.run_after = now + timedelta(seconds=spec.retry_delay * 2 ** (job.attempts - 1))
+    else:
+        job.status = Task.FAILED
+        job.finished_at = now
+    job.save(update_fields=['status', 'error', 'run_after', 'finished_at'])
+
+
+def execute(job):
+    """Run one claimed task and record its result, retry or failure."""
+    spec = REGISTRY.get(job.name)
+    try:
+        if spec is None:
+            raise LookupError(f"Unknown task {job.name!r}.")
+        result = spec.func(job, **job.payload)
+    except Exception:
+        logger.exception("Task %s failed on attempt %d of %d", job, job.attempts, job.max_attempts)
+        _retry_or_fail(job, traceback.format_exc())
+        return job
+    job.status = Task.SUCCEEDED
+    job.result = result
+    job.error = ''
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'result', 'error', 'finished_at', 'output', 'done', 'total', 'message'])
+    return job
+
+
+def requeue_stale():
+    """Retry or fail running tasks whose worker has stopped sending heartbeats."""
+    cutoff = timezone.now() - timedelta(seconds=settings.BUDGET_TASK_TIMEOUT)
+    requeued = 0
+    for job in Task.objects.filter(status=Task.RUNNING, heartbeat_at__lt=cutoff):
+        # Only one worker wins the row; the others see it already moved on.
+        if Task.objects.filter(pk=job.pk, status=Task.RUNNING, heartbeat_at=job.heartbeat_at).update(
+            heartbeat_at=timezone.now()
+        ):
+            logger.warning("Task %s lost its worker %s", job, job.worker)
+            _retry_or_fail(job, f"Worker {job.worker} stopped responding.")
+            requeued += 1
+    return requeued
+
+
+def purge_finished(days=None):
+    """Delete finished tasks older than BUDGET_TASK_KEEP_DAYS, with their files."""
+    days = settings.BUDGET_TASK_KEEP_DAYS if days is None else days
+    old = Task.objects.filter(
+        status__in=[Task.SUCCEEDED, Task.FAILED], finished_at__lt=timezone.now() - timedelta(days=days),
+    )
+    for job in old.exclude(input='', output=''):
+        for field in (job.input, job.output):
+            if field:
+                field.delete(save=False)
+    return old.delete()[0]
+
+
+class Heartbeat(threading.Thread):
+    """Keeps heartbeat_at fresh for the tasks a worker process is running."""
+
+    def __init__(self, interval):
+        super().__init__(daemon=True, name='task-heartbeat')
+        self.interval = interval
+        self.running = set()
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+
+    def add(self, pk):
+        with self.lock:
+            self.running.add(pk)
+
+    def discard(self, pk):
+        with self.lock:
+            self.running.discard(pk)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            with self.lock:
+                running = list(self.running)
+            if not running:
+                continue
+            try:
+                Task.objects.filter(pk__in=running, status=Task.RUNNING).update(heartbeat_at=timezone.now())
+            except DatabaseError:
+                # SQLite is locked while a task writes; the next beat will get through.
+                logger.debug("Task heartbeat skipped", exc_info=True)
+        connection.close()
+
+    def stop(self):
+        self.stopped.set()
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.current_thread().name}"
+
+
+# Jobs
+
+
+@task(concurrency=2)
+def import_transactions(job, account=None, file_format='csv'):
+    account = BankAccount.objects.filter(pk=account, user=job.user).first() if account else None
+    job.report(0, message='Importing')
+    with job.input.open('rb') as upload:
+        result = TransactionImporter(job.user, account=account).run(iter_rows(open_text(upload), file_format))
+    job.report(result.created + result.rejected_count, message='Imported')
+    return {
+        'created': result.created,
+        'rejected': result.rejected_count,
+        'rejections': [[line, errors] for line, errors in result.rejected[:100]],
+    }
+
+
+@task(concurrency=2)
+def export_transactions(job, file_format='csv', start=None, end=None, account=None):
+    render_rows, _ = EXPORT_FORMATS[file_format]
+    rows = export_rows(job.user, start=parse_date(start or ''), end=parse_date(end or ''), account=account)
+
+    exported = 0
+
+    def counted(rows):
+        nonlocal exported
+        for row in rows:
+            exported += 1
+            if exported % EXPORT_PROGRESS_EVERY == 0:
+                job.report(exported, message='Exporting')
+            yield row
+
+    with tempfile.TemporaryFile() as output:
+        for chunk in render_rows(counted(rows)):
+            output.write(chunk.encode())
+        output.seek(0)
+        job.output.save(f"transactions.{file_format}", File(output), save=False)
+    job.done, job.message = exported, 'Exported'
+    return {'rows': exported}
+
+
+@task(concurrency=1, max_attempts=2)
+def rebuild_monthly_rollups(job, users=None):
+    job.report(0, message='Rebuilding')
+    return {'rows': rebuild_rollups(users=users)}
@@ -1,3 +1,1174 @@
-from django.test import TestCase
+import importlib
+import json
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import clear_url_caches, reverse
+from django.utils import timezone
+
+from . import async_views, metrics, tasks, views
+from . import urls as budget_urls
+from .caching import cache_stats, cached_for_user
+from .exporters import export_rows, iter_csv
+from .importers import TransactionImporter, iter_csv_rows, iter_ofx_rows
+from .models import (
+    BankAccount, Category, MonthlyCategoryRollup, SavingsAccount, SyncState, Task, Tombstone,
+    Transaction,
+)
+from .pagination import keyset_paginate
+from .profiling import fingerprint, profiling_summary, reset_profiling_summary
+from .seeding import BudgetSeeder
+from .services import category_statistics, dashboard_summary, rebuild_rollups
+
+
+class BudgetTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='anna', password='secret-pass-123')
+        cls.category = Category.objects.create(name='Food', user=cls.user)
+        cls.account = BankAccount.objects.create(
+            user=cls.user, name_account='Main', initial_balance=0
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def add_transaction(self, amount, type='OUT', account=None, category=None, **kwargs):
+        return Transaction.objects.create(
+            user=self.user,
+            account=account or self.account,
+            category=category or self.category,
+            amount=Decimal(amount),
+            type=type,
+            **kwargs
+        )
+
+
+class BankAccountBalanceTests(BudgetTestCase):
+    def balance(self, account=None):
+        return BankAccount.objects.get(pk=(account or self.account).pk).balance
+
+    def test_save_and_delete_keep_balance_in_step(self):
+        income = self.add_transaction('100.00', type='IN')
+        outcome = self.add_transaction('30.50')
+        self.assertEqual(self.balance(), Decimal('69.50'))
+
+        outcome.amount = Decimal('40.00')
+        outcome.save()
+        self.assertEqual(self.balance(), Decimal('60.00'))
+
+        income.delete()
+        self.assertEqual(self.balance(), Decimal('-40.00'))
+
+    def test_moving_transaction_between_accounts(self):
+        other = BankAccount.objects.create(user=self.user, name_account='Second', initial_balance=0)
+        transaction = self.add_transaction('25.00', type='IN')
+        transaction.account = other
+        transaction.save()
+        self.assertEqual(self.balance(), 0)
+        self.assertEqual(self.balance(other), Decimal('25.00'))
+
+    def test_category_cascade_reverts_balance(self):
+        category = Category.objects.create(name='Bills', user=self.user)
+        self.add_transaction('10.00', category=category)
+        category.delete()
+        self.assertEqual(self.balance(), 0)
+
+    def test_rebuild_balances_fixes_drift(self):
+        self.add_transaction('50.00', type='IN')
+        BankAccount.objects.filter(pk=self.account.pk).update(balance=0)
+        call_command('rebuild_balances', stdout=StringIO())
+        self.assertEqual(self.balance(), Decimal('50.00'))
+        self.assertEqual(self.account.compute_balance(), Decimal('50.00'))
+
+
+class DashboardSummaryTests(BudgetTestCase):
+    def test_summary_is_one_query(self):
+        self.add_transaction('200.00', type='IN')
+        self.add_transaction('75.25')
+        SavingsAccount.objects.create(user=self.user, saving_name='Lokata', saving_balance=Decimal('300.00'))
+
+        with self.assertNumQueries(1):
+            summary = dashboard_summary(self.user)
+
+        self.assertEqual(summary['total_in'], Decimal('200.00'))
+        self.assertEqual(summary['total_out'], Decimal('75.25'))
+        self.assertEqual(summary['total_balance'], Decimal('124.75'))
+        self.assertEqual(summary['account_count'], 1)
+        self.assertEqual(summary['savings_count'], 1)
+        self.assertEqual(summary['total_savings'], Decimal('300.00'))
+
+    def test_summary_for_empty_user(self):
+        other = User.objects.create_user(username='piotr', password='secret-pass-123')
+        summary = dashboard_summary(other)
+        self.assertEqual(summary['total_balance'], 0)
+        self.assertEqual(summary['account_count'], 0)
+
+    def test_dashboard_query_count(self):
+        SavingsAccount.objects.create(user=self.user, saving_name='Lokata')
+        for _ in range(12):
+            self.add_transaction('3.00')
+        self.client.force_login(self.user)
+        # session, user, page of transactions with category and account, summary, categories
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('budget:expense'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Food', count=len(response.context['transactions']) + 1)
+
+
+class KeysetPaginationTests(BudgetTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        start = timezone.now()
+        cls.transactions = [
+            Transaction.objects.create(
+                user=cls.user, account=cls.account, category=cls.category,
+                amount=Decimal(i + 1), date=start - timedelta(days=i // 2)
+            )
+            for i in range(25)
+        ]
+
+    def test_walks_forward_and_back_without_count(self):
+        queryset = Transaction.objects.filter(user=self.user)
+        expected = list(queryset.order_by('-date', '-id'))
+
+        first = keyset_paginate(queryset, 10)
+        self.assertEqual(list(first), expected[:10])
+        self.assertFalse(first.has_previous)
+
+        second = keyset_paginate(queryset, 10, after=first.next_cursor)
+        self.assertEqual(list(second), expected[10:20])
+
+        third = keyset_paginate(queryset, 10, after=second.next_cursor)
+        self.assertEqual(list(third), expected[20:])
+        self.assertFalse(third.has_next)
+
+        back = keyset_paginate(queryset, 10, before=third.prev_cursor)
+        self.assertEqual(list(back), expected[10:20])
+        self.assertTrue(back.has_previous)
+
+    def test_deep_cursors_across_equal_dates(self):
+        # Pages of 3 over pairs of equal dates, so most cursors land inside a tie.
+        queryset = Transaction.objects.filter(user=self.user)
+        expected = list(queryset.order_by('-date', '-id'))
+
+        pages = [keyset_paginate(queryset, 3)]
+        while pages[-1].has_next:
+            pages.append(keyset_paginate(queryset, 3, after=pages[-1].next_cursor))
+        self.assertEqual([row for page in pages for row in page], expected)
+
+        walked_back = [pages[-1]]
+        while walked_back[-1].has_previous:
+            walked_back.append(keyset_paginate(queryset, 3, before=walked_back[-1].prev_cursor))
+        self.assertEqual([row for page in reversed(walked_back) for row in page], expected)
+
+    def test_list_view_modes(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('budget:expense'))
+        self.assertIsNone(response.context['paginator'])
+        cursor = response.context['page_obj'].next_cursor
+
+        response = self.client.get(reverse('budget:expense'), {'after': cursor})
+        self.assertEqual(len(response.context['transactions']), 10)
+
+        response = self.client.get(reverse('budget:expense'), {'page': 3})
+        self.assertEqual(len(response.context['transactions']), 5)
+
+        response = self.client.get(reverse('budget:expense'), {'after': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+
+class CategoryStatisticsTests(BudgetTestCase):
+    def test_one_row_per_category(self):
+        bills = Category.objects.create(name='Bills', user=self.user)
+        for amount in ('10.00', '15.50', '4.50'):
+            self.add_transaction(amount)
+        self.add_transaction('100.00', type='IN', category=bills)
+        self.add_transaction('20.00', category=bills, date=timezone.now() - timedelta(days=40))
+
+        series = category_statistics(self.user)
+        self.assertEqual(series, {
+            'labels': ['Bills', 'Food'],
+            'incomes': [100.0, 0.0],
+            'outcomes': [20.0, 30.0],
+        })
+
+        recent = category_statistics(self.user, start=(timezone.now() - timedelta(days=7)).date())
+        self.assertEqual(recent['outcomes'], [0.0, 30.0])
+
+    def test_view_filters_by_account(self):
+        other = BankAccount.objects.create(user=self.user, name_account='Second', initial_balance=0)
+        self.add_transaction('5.00')
+        self.add_transaction('7.00', account=other)
+        self.client.force_login(self.user)
+
+        response = self.client.get(reverse('budget:statistics'), {'account': other.pk, 'start': 'bogus'})
+        self.assertEqual(response.context['labels'], '["Food"]')
+        self.assertEqual(response.context['values'], '[7.0]')
+
+
+class MonthlyCategoryRollupTests(BudgetTestCase):
+    def rollups(self):
+        return list(
+            MonthlyCategoryRollup.objects.filter(user=self.user, count__gt=0)
+            .order_by('month', 'type')
+            .values_list('month', 'type', 'total', 'count')
+        )
+
+    def test_writes_update_rollups_incrementally(self):
+        january = timezone.make_aware(datetime(2025, 1, 15))
+        february = timezone.make_aware(datetime(2025, 2, 3))
+        first = self.add_transaction('10.00', date=january)
+        self.add_transaction('5.00', date=january)
+        self.add_transaction('99.00', type='IN', date=february)
+
+        first.date = february
+        first.save()
+        self.assertEqual(self.rollups(), [
+            (date(2025, 1, 1), 'OUT', Decimal('5.00'), 1),
+            (date(2025, 2, 1), 'IN', Decimal('99.00'), 1),
+            (date(2025, 2, 1), 'OUT', Decimal('10.00'), 1),
+        ])
+
+        first.delete()
+        incremental = self.rollups()
+        rebuild_rollups(users=[self.user.pk])
+        self.assertEqual(self.rollups(), incremental)
+
+    def test_statistics_read_rollups_only(self):
+        self.add_transaction('12.00')
+        with self.assertNumQueries(1):
+            series = category_statistics(self.user)
+        self.assertEqual(series['outcomes'], [12.0])
+        self.assertEqual(dashboard_summary(self.user)['total_out'], Decimal('12.00'))
+
+    def test_deleting_a_user_with_transactions(self):
+        self.add_transaction('12.00')
+        self.add_transaction('30.00', type='IN')
+        user_id = self.user.pk
+        self.user.delete()
+        # The FK checks are deferred to commit, which a TestCase never reaches.
+        connection.check_constraints()
+        self.assertFalse(MonthlyCategoryRollup.objects.filter(user_id=user_id).exists())
+        self.assertFalse(Transaction.objects.exists())
+
+
+class UserCacheTests(BudgetTestCase):
+    def test_writes_invalidate_cached_dashboard(self):
+        self.client.force_login(self.user)
+        url = reverse('budget:expense')
+        self.client.get(url)
+        hits = cache_stats()['hits']
+
+        # session, user, page of transactions, categories; the summary comes from cache
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertEqual(cache_stats()['hits'], hits + 1)
+        self.assertEqual(response.context['total_expenses'], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add_transaction('8.00')
+        response = self.client.get(url)
+        self.assertEqual(response.context['total_expenses'], Decimal('8.00'))
+
+    def test_keys_are_per_user_and_params(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return len(calls)
+
+        self.assertEqual(cached_for_user(self.user.pk, 'stats', compute, 'a'), 1)
+        self.assertEqual(cached_for_user(self.user.pk, 'stats', compute, 'a'), 1)
+        self.assertEqual(cached_for_user(self.user.pk, 'stats', compute, 'b'), 2)
+        self.assertEqual(cached_for_user(self.user.pk + 1, 'stats', compute, 'a'), 3)
+
+    def test_stats_view_is_staff_only(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('budget:cache_stats')).status_code, 403)
+
+
+class TransactionImportTests(BudgetTestCase):
+    CSV = (
+        "date,amount,type,category,account,description\n"
+        "2025-03-01,120.00,IN,Salary,Main,March pay\n"
+        "2025-03-02,-15.40,,Food,,Groceries\n"
+        "2025-03-03,abc,OUT,Food,,Broken amount\n"
+        "2025-03-04,10.00,OUT,Food,Nope,Unknown account\n"
+    )
+    OFX = (
+        "OFXHEADER:100\n<OFX><BANKMSGSRSV1><STMTTRSRS><BANKTRANLIST>\n"
+        "<STMTTRN>\n<TRNTYPE>DEBIT\n<DTPOSTED>20250305120000.000[-5:EST]\n<TRNAMT>-9.99\n<NAME>Cinema\n</STMTTRN>\n"
+        "<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20250306<TRNAMT>50.00<MEMO>Refund</STMTTRN>\n"
+        "</BANKTRANLIST></STMTTRSRS></BANKMSGSRSV1></OFX>\n"
+    )
+
+    def test_csv_import_updates_balance_and_reports_rejections(self):
+        importer = TransactionImporter(self.user, account=self.account, batch_size=1)
+        result = importer.run(iter_csv_rows(StringIO(self.CSV)))
+
+        self.assertEqual(result.created, 2)
+        self.assertEqual([line for line, errors in result.rejected], [4, 5])
+        self.assertIn('amount', result.rejected[0][1])
+        self.assertIn('account', result.rejected[1][1])
+        self.assertEqual(BankAccount.objects.get(pk=self.account.pk).balance, Decimal('104.60'))
+        self.assertTrue(Category.objects.filter(user=self.user, name='Salary').exists())
+
+        incremental = list(MonthlyCategoryRollup.objects.order_by('pk').values_list('type', 'total', 'count'))
+        rebuild_rollups(users=[self.user.pk])
+        self.assertEqual(
+            sorted(incremental),
+            sorted(MonthlyCategoryRollup.objects.values_list('type', 'total', 'count'))
+        )
+
+    def test_ofx_rows(self):
+        rows = [row for line, row in iter_ofx_rows(StringIO(self.OFX))]
+        self.assertEqual([(row['amount'], row['type']) for row in rows], [
+            (Decimal('9.99'), 'OUT'),
+            (Decimal('50.00'), 'IN'),
+        ])
+        self.assertEqual(rows[0]['date'], '2025-03-05 12:00:00')
+        self.assertEqual(rows[1]['description'], 'Refund')
+
+    def test_ragged_csv_line_is_rejected_alone(self):
+        csv_text = (
+            "date,amount,type,category\n"
+            "2025-03-01,5.00,OUT,Food\n"
+            "2025-03-02,1,200.00,OUT,Food\n"
+            "2025-03-03,7.00,OUT,Food\n"
+        )
+        result = TransactionImporter(self.user, account=self.account).run(iter_csv_rows(StringIO(csv_text)))
+        self.assertEqual(result.created, 2)
+        self.assertEqual(result.rejected, [(3, {'__all__': ['Expected 4 fields, found 5.']})])
+
+        self.client.force_login(self.user)
+        upload = SimpleUploadedFile('statement.csv', csv_text.encode())
+        response = self.client.post(reverse('budget:expense_import'), {'file': upload, 'account': self.account.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['result'].rejected_count, 1)
+
+    def test_import_view(self):
+        self.client.force_login(self.user)
+        upload = SimpleUploadedFile('statement.ofx', self.OFX.encode())
+        response = self.client.post(
+            reverse('budget:expense_import'), {'file': upload, 'account': self.account.pk}
+        )
+        self.assertEqual(response.context['result'].created, 2)
+        self.assertEqual(Transaction.objects.filter(user=self.user, category__name='Other').count(), 2)
+
+
+class TransactionExportTests(BudgetTestCase):
+    def test_streams_filtered_csv_and_json(self):
+        other = BankAccount.objects.create(user=self.user, name_account='Second', initial_balance=0)
+        self.add_transaction('12.50', description='Lunch')
+        self.add_transaction('3.00', account=other)
+        self.client.force_login(self.user)
+
+        response = self.client.get(reverse('budget:expense_export'), {'account': self.account.pk})
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'date,type,amount,category,account,description')
+        self.assertEqual(lines[1].split(',')[1:], ['OUT', '12.50', 'Food', 'Main', 'Lunch'])
+        self.assertEqual(len(lines), 2)
+
+        response = self.client.get(reverse('budget:expense_export'), {'format': 'json'})
+        items = json.loads(b''.join(response.streaming_content))
+        self.assertEqual([item['account'] for item in items], ['Main', 'Second'])
+
+    def test_export_is_one_query(self):
+        for _ in range(5):
+            self.add_transaction('1.00')
+        with self.assertNumQueries(1):
+            self.assertEqual(len(list(iter_csv(export_rows(self.user)))), 6)
+
+
+class RegistrationTests(TestCase):
+    def test_signup_provisions_categories_in_one_insert(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('budget:register'), {
+                'username': 'nowy',
+                'email': 'nowy@example.com',
+                'password1': 'Very-secret-123',
+                'password2': 'Very-secret-123',
+            })
+        self.assertEqual(response.status_code, 302)
+        user = User.objects.get(username='nowy')
+        self.assertEqual(
+            sorted(Category.objects.filter(user=user).values_list('name', flat=True)),
+            sorted(settings.BUDGET_DEFAULT_CATEGORIES),
+        )
+        category_inserts = [q for q in queries if q['sql'].startswith('INSERT') and 'budget_category' in q['sql']]
+        self.assertEqual(len(category_inserts), 1)
+
+    def test_provision_users_command(self):
+        path = Path(self.enterContext(TemporaryDirectory())) / 'users.csv'
+        path.write_text('username,email\nola,ola@example.com\nolek,olek@example.com\n')
+        call_command('provision_users', str(path), '--category', 'Food', stdout=StringIO())
+        call_command('provision_users', str(path), stdout=StringIO())
+        self.assertEqual(Category.objects.filter(user__username__in=['ola', 'olek']).count(), 2)
+
+
+class BenchmarkViewsTests(TestCase):
+    def test_percentile(self):
+        from .management.commands.benchmark_views import percentile
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 0.50), 50)
+        self.assertEqual(percentile(values, 0.95), 95)
+        self.assertEqual(percentile([7], 0.95), 7)
+
+    def test_flags_endpoints_whose_query_count_grows(self):
+        from .management.commands.benchmark_views import Command
+        results = {'endpoints': {
+            'expense': {'runs': {'1000': {'queries': 5}, '10000': {'queries': 5}}},
+            'account': {'runs': {'1000': {'queries': 4}, '10000': {'queries': 13}}},
+            'logout': {'skipped': 'GET ends the session'},
+        }}
+        self.assertEqual(Command().growing_endpoints(results), {'account': [4, 13]})
+
+    def test_command_requests_every_url(self):
+        from .management.commands import benchmark_views
+        output = StringIO()
+        # The test runner already set up the test environment and database.
+        with mock.patch.object(benchmark_views, 'setup_test_environment'), \
+                mock.patch.object(benchmark_views, 'teardown_test_environment'), \
+                mock.patch.object(connection.creation, 'create_test_db'), \
+                mock.patch.object(connection.creation, 'destroy_test_db'), \
+                TemporaryDirectory() as directory:
+            results_file = Path(directory) / 'results.json'
+            call_command('benchmark_views', '--scales', '20', '40', '--repeat', '1',
+                         '--output', str(results_file), stdout=output)
+            endpoints = json.loads(results_file.read_text())['endpoints']
+        self.assertIn('Query counts are independent of data size.', output.getvalue())
+        named = {pattern.name for pattern in budget_urls.urlpatterns if pattern.name}
+        self.assertEqual(set(endpoints), named)
+        for name, endpoint in endpoints.items():
+            if 'skipped' not in endpoint:
+                self.assertEqual([run['status'] for run in endpoint['runs'].values()], [200, 200], name)
+
+
+class SeedBudgetTests(TestCase):
+    def rollup_rows(self):
+        return sorted(MonthlyCategoryRollup.objects.values_list(
+            'account__name_account', 'category__name', 'type', 'month', 'total', 'count'
+        ))
+
+    def test_balances_and_rollups_match_a_rebuild(self):
+        seeder = BudgetSeeder(seed=7, years=1, end=date(2026, 6, 30), batch_size=100)
+        users = seeder.seed_users(3, 250, accounts=3)
+        self.assertEqual(Transaction.objects.count(), 750)
+        self.assertEqual(seeder.counts['transactions'], 750)
+        self.assertTrue(all(Category.objects.filter(user=user).exists() for user in users))
+
+        for account in BankAccount.objects.all():
+            self.assertEqual(account.balance, Decimal(account.compute_balance()).quantize(Decimal('0.01')))
+        seeded = self.rollup_rows()
+        rebuild_rollups()
+        self.assertEqual(seeded, self.rollup_rows())
+
+    def test_same_seed_gives_same_data(self):
+        def generate(prefix):
+            BudgetSeeder(seed=3, years=1, end=date(2026, 6, 30)).seed_users(2, 100, prefix=prefix)
+            return list(
+                Transaction.objects.filter(user__username__startswith=prefix)
+                .order_by('pk').values_list('category__name', 'type', 'amount', 'date')
+            )
+
+        self.assertEqual(generate('a'), generate('b'))
+
+    def test_leap_day_end(self):
+        seeder = BudgetSeeder(years=1, end=date(2028, 2, 29))
+        self.assertEqual(seeder.start, date(2027, 2, 28))
+        self.assertEqual(BudgetSeeder(years=4, end=date(2028, 2, 29)).start, date(2024, 2, 29))
+
+    def test_command(self):
+        call_command('seed_budget', '--users', '2', '--transactions', '50', '--end', '2026-06-30', stdout=StringIO())
+        self.assertEqual(Transaction.objects.filter(user__username__startswith='seed').count(), 100)
+
+
+@override_settings(BUDGET_SQL_PROFILING=True)
+class SQLProfilingTests(BudgetTestCase):
+    def setUp(self):
+        super().setUp()
+        reset_profiling_summary()
+        self.client.force_login(self.user)
+
+    def test_fingerprint_ignores_parameters(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id = 12 AND name = 'x''y' AND pk IN (1, 2,3)"),
+            fingerprint("SELECT *  FROM t WHERE id = 7 AND name = 'z' AND pk IN (4)"),
+        )
+
+    def test_header_reports_query_count(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('budget:statistics'))
+        self.assertEqual(response['X-SQL-Queries'], str(len(queries)))
+        self.assertIn('sql;dur=', response['Server-Timing'])
+
+    @override_settings(BUDGET_SQL_PROFILING_MAX_QUERIES=0)
+    def test_logs_requests_over_the_threshold(self):
+        with self.assertLogs('budget.sql', 'WARNING') as logs:
+            self.client.get(reverse('budget:statistics'))
+        self.assertIn('/statistics/', logs.output[0])
+
+    def test_unresolved_paths_share_one_entry(self):
+        for path in ('/no-such-page/1/', '/no-such-page/2/', '/budget/nope/'):
+            self.assertEqual(self.client.get(path).status_code, 404)
+        summary = profiling_summary()
+        self.assertEqual(list(summary), ['<unresolved>'])
+        self.assertEqual(summary['<unresolved>']['requests'], 3)
+
+    def test_summary_is_staff_only(self):
+        self.add_transaction('5.00')
+        self.add_transaction('6.00')
+        self.client.get(reverse('budget:expense'))
+        self.assertEqual(self.client.get(reverse('budget:sql_profile')).status_code, 403)
+
+        self.user.is_staff = True
+        self.user.save()
+        summary = self.client.get(reverse('budget:sql_profile')).json()
+        self.assertEqual(summary['budget:expense']['requests'], 1)
+        self.assertGreater(summary['budget:expense']['queries_max'], 0)
+
+
+class MetricsTests(BudgetTestCase):
+    def setUp(self):
+        super().setUp()
+        metrics.reset()
+        self.client.force_login(self.user)
+
+    def test_requests_are_labelled_by_url_name(self):
+        self.client.get(reverse('budget:statistics'))
+        body = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('budget_requests_total{view="budget:statistics",method="GET",status="200"} 1', body)
+        self.assertIn('budget_request_duration_seconds_count{view="budget:statistics",method="GET"} 1', body)
+        self.assertIn('budget_request_db_queries_bucket{view="budget:statistics",le="+Inf"} 1', body)
+        self.assertIn('budget_cache_requests_total{result="miss"} 1', body)
+
+    def test_counts_transaction_writes_and_imports(self):
+        transaction = self.add_transaction('5.00')
+        transaction.amount = Decimal('6.00')
+        transaction.save()
+        transaction.delete()
+        TransactionImporter(self.user, account=self.account).run(
+            iter_csv_rows(['date,type,amount,category', '2026-01-05,OUT,1.00,Food'])
+        )
+        body = metrics.render()
+        self.assertIn('budget_transaction_writes_total{operation="create"} 2', body)
+        self.assertIn('budget_transaction_writes_total{operation="update"} 1', body)
+        self.assertIn('budget_transaction_writes_total{operation="delete"} 1', body)
+        self.assertIn('budget_import_rows_total{outcome="created"} 1', body)
+
+    def test_aggregates_files_of_other_workers(self):
+        directory = self.enterContext(TemporaryDirectory())
+        other_worker = {
+            'budget_requests_total': [[['budget:expense', 'GET', '200'], 3]],
+            'budget_request_duration_seconds': [[['budget:expense', 'GET'], [1] + [0] * 11 + [0.004, 1]]],
+        }
+        Path(directory, 'metrics-1-abc.json').write_text(json.dumps(other_worker))
+        with self.settings(BUDGET_METRICS_DIR=directory):
+            self.client.get(reverse('budget:expense'))
+            body = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('budget_requests_total{view="budget:expense",method="GET",status="200"} 4', body)
+        self.assertIn('budget_request_duration_seconds_count{view="budget:expense",method="GET"} 2', body)
+        self.assertIn('budget_request_duration_seconds_bucket{view="budget:expense",method="GET",le="0.005"}', body)
+
+    def test_token(self):
+        with self.settings(BUDGET_METRICS_TOKEN='s3cret'):
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+            response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer s3cret')
+        self.assertEqual(response.status_code, 200)
+
+
+class TransactionListingQueryTests(BudgetTestCase):
+    def setUp(self):
+        super().setUp()
+        self.other_category = Category.objects.create(user=self.user, name='Transport')
+        for number in range(6):
+            self.add_transaction('4.00', category=self.other_category if number % 2 else self.category)
+
+    def test_list_rows_need_no_extra_queries(self):
+        rows = list(Transaction.objects.filter(user=self.user).with_related())
+        with self.assertNumQueries(0):
+            names = [(str(row), row.account.name_account) for row in rows]
+        self.assertEqual(len(names), 6)
+
+    def test_detail_query_count(self):
+        self.client.force_login(self.user)
+        transaction = Transaction.objects.filter(user=self.user).first()
+        # session, user, transaction with category and account
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('budget:expense_detail', args=[transaction.pk]))
+        self.assertContains(response, transaction.category.name)
+        self.assertContains(response, self.account.name_account)
+
+    def test_admin_changelist_does_not_grow_with_rows(self):
+        admin = User.objects.create_superuser(username='admin', password='secret-pass-123')
+        self.client.force_login(admin)
+        url = reverse('admin:budget_transaction_changelist')
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(url)
+        for _ in range(10):
+            self.add_transaction('1.00')
+        with CaptureQueriesContext(connection) as many:
+            self.client.get(url)
+        self.assertEqual(len(many), len(few))
+        self.assertEqual(self.client.get(url, {'q': 'Food'}).status_code, 200)
+
+
+class AccountTotalsTests(BudgetTestCase):
+    def test_with_totals(self):
+        self.add_transaction('100.00', type='IN')
+        latest = self.add_transaction('30.50', date=timezone.now() + timedelta(days=1))
+        empty = BankAccount.objects.create(user=self.user, name_account='Empty', initial_balance=0)
+
+        accounts = {account.pk: account for account in BankAccount.objects.with_totals()}
+        main = accounts[self.account.pk]
+        self.assertEqual(main.incoming, Decimal('100.00'))
+        self.assertEqual(main.outgoing, Decimal('30.50'))
+        self.assertEqual(main.net_balance, Decimal('69.50'))
+        self.assertEqual(main.last_transaction_date, latest.date)
+        self.assertEqual(str(main), 'Main - Balance: 69.50')
+        self.assertEqual(accounts[empty.pk].net_balance, 0)
+        self.assertIsNone(accounts[empty.pk].last_transaction_date)
+
+    def test_account_page_query_count_is_constant(self):
+        self.client.force_login(self.user)
+        url = reverse('budget:account')
+        with CaptureQueriesContext(connection) as one_account:
+            self.client.get(url)
+        for number in range(50):
+            account = BankAccount.objects.create(user=self.user, name_account=f"Konto {number}", initial_balance=0)
+            self.add_transaction('2.00', type='IN', account=account)
+        with CaptureQueriesContext(connection) as many_accounts:
+            response = self.client.get(url)
+        self.assertEqual(len(many_accounts), len(one_account))
+        self.assertContains(response, 'Wpływy: <span class="text-success">+2.00</span>', count=50)
+
+
+class ApiTests(BudgetTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+        self.url = reverse('budget:api_transactions')
+
+    def post(self, payload, url=None):
+        return self.client.post(url or self.url, json.dumps(payload), content_type='application/json')
+
+    def item(self, amount='10.00', type='OUT', **extra):
+        return {
+            'amount': amount, 'type': type, 'date': '2026-03-05T12:00:00Z',
+            'category': self.category.pk, 'account': self.account.pk, **extra,
+        }
+
+    def assert_derived_data_consistent(self):
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal(self.account.compute_balance()).quantize(Decimal('0.01')))
+        # Emptied buckets stay behind as zero rows, which a rebuild does not recreate.
+        def rollups():
+            return sorted(MonthlyCategoryRollup.objects.exclude(count=0).values_list(
+                'category_id', 'type', 'month', 'total', 'count'
+            ))
+
+        rows = rollups()
+        rebuild_rollups()
+        self.assertEqual(rows, rollups())
+
+    def test_batch_query_count_does_not_grow(self):
+        def batch(size):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.post({'create': [self.item() for _ in range(size)]})
+            self.assertEqual(response.status_code, 200)
+            return len(queries)
+
+        # The first batch also creates the SyncState row and the month bucket. 100 rows
+        # still fit in one INSERT under SQLite's 999-parameter limit.
+        batch(5)
+        self.assertEqual(batch(5), batch(100))
+        self.assertEqual(Transaction.objects.count(), 110)
+        self.assert_derived_data_consistent()
+
+    def test_create_update_delete_in_one_batch(self):
+        keep = self.add_transaction('20.00')
+        drop = self.add_transaction('30.00', type='IN')
+        other = Category.objects.create(user=self.user, name='Transport')
+        metrics.reset()
+        response = self.post({
+            'create': [self.item('5.00', description='nowa'), self.item('6.00')],
+            'update': [{'id': keep.pk, 'amount': '25.00', 'category': other.pk}],
+            'delete': [drop.pk],
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['updated'], 1)
+        self.assertEqual(metrics.TRANSACTION_WRITES.values, {('create',): 2, ('update',): 1, ('delete',): 1})
+        keep.refresh_from_db()
+        self.assertEqual((keep.amount, keep.category_id), (Decimal('25.00'), other.pk))
+        self.assertFalse(Transaction.objects.filter(pk=drop.pk).exists())
+        self.assert_derived_data_consistent()
+
+    def test_invalid_item_rejects_the_whole_batch(self):
+        other_user = User.objects.create_user(username='piotr', password='secret-pass-123')
+        foreign = Category.objects.create(user=other_user, name='Food')
+        response = self.post({'create': [self.item(), self.item(amount='-1'), self.item(category=foreign.pk)]})
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()['errors']
+        self.assertEqual([(error['index'], sorted(error['errors'])) for error in errors], [(1, ['amount']), (2, ['category'])])
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_list_with_sparse_fields_and_etag(self):
+        for _ in range(3):
+            self.add_transaction('1.50')
+        response = self.client.get(self.url, {'fields': 'amount', 'limit': 2})
+        body = response.json()
+        self.assertEqual(body['results'][0], {'id': body['results'][0]['id'], 'amount': '1.50'})
+        self.assertEqual(len(body['results']), 2)
+        rest = self.client.get(self.url, {'fields': 'amount', 'after': body['next']}).json()
+        self.assertEqual((len(rest['results']), rest['next']), (1, None))
+
+        etag = response['ETag']
+        cached = self.client.get(self.url, {'fields': 'amount', 'limit': 2}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached.content, b'')
+        Transaction.objects.filter(user=self.user).update(amount=Decimal('2.00'))
+        changed = self.client.get(self.url, {'fields': 'amount', 'limit': 2}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+
+    def test_other_resources_and_auth(self):
+        response = self.post({'create': [{'name': 'Wakacje'}]}, url=reverse('budget:api_categories'))
+        self.assertEqual(response.status_code, 200)
+        category_id = response.json()['created'][0]
+        self.add_transaction('7.00', category=Category.objects.get(pk=category_id))
+        response = self.post({'delete': [category_id]}, url=reverse('budget:api_categories'))
+        self.assertEqual(response.status_code, 200)
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, 0)
+
+        accounts = self.client.get(reverse('budget:api_accounts'), {'fields': 'name_account,balance'}).json()
+        self.assertEqual(accounts['results'], [{'id': self.account.pk, 'name_account': 'Main', 'balance': '0.00'}])
+        self.assertEqual(self.client.get(self.url, {'fields': 'user'}).status_code, 400)
+        self.client.logout()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    def test_repeated_category_names_are_rejected_per_item(self):
+        url = reverse('budget:api_categories')
+        bills = Category.objects.create(user=self.user, name='Bills')
+        response = self.post({'create': [{'name': 'Food'}, {'name': 'Travel'}, {'name': 'Travel'}]}, url=url)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            [(error['operation'], error['index'], list(error['errors'])) for error in response.json()['errors']],
+            [('create', 0, ['name']), ('create', 2, ['name'])],
+        )
+
+        response = self.post({'update': [{'id': bills.pk, 'name': 'Food'}]}, url=url)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'][0]['operation'], 'update')
+        response = self.post({'create': [{'name': 'Bills'}], 'update': [{'id': bills.pk, 'name': 'Rent'}]}, url=url)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Category.objects.filter(user=self.user).count(), 2)
+
+        response = self.post({'update': [{'id': bills.pk, 'name': 'Bills'}], 'create': [{'name': 'Travel'}]}, url=url)
+        self.assertEqual(response.status_code, 200)
+        other_user = User.objects.create_user(username='piotr', password='secret-pass-123')
+        Category.objects.create(user=other_user, name='Holidays')
+        self.assertEqual(self.post({'create': [{'name': 'Holidays'}]}, url=url).status_code, 200)
+
+    def test_created_account_books_its_opening_balance(self):
+        response = self.post({'create': [
+            {'name_account': 'Savings', 'initial_balance': '250.00'},
+            {'name_account': 'Empty', 'initial_balance': '0'},
+        ]}, url=reverse('budget:api_accounts'))
+        self.assertEqual(response.status_code, 200)
+        savings, empty = BankAccount.objects.filter(pk__in=response.json()['created']).order_by('pk')
+        self.assertEqual((savings.balance, empty.balance), (Decimal('250.00'), 0))
+        opening = Transaction.objects.get(account=savings)
+        self.assertEqual((opening.type, opening.description, opening.category.name), ('IN', 'Starting balance', 'Other'))
+        self.assertFalse(Transaction.objects.filter(account=empty).exists())
+        self.assertEqual(dashboard_summary(self.user)['total_balance'], Decimal('250.00'))
+        self.assertEqual(
+            BankAccount.objects.with_totals().get(pk=savings.pk).total_balance, Decimal('250.00'),
+        )
+        self.assert_derived_data_consistent()
+
+    def test_queryset_delete_reverts_in_bulk(self):
+        for amount in ('3.00', '4.00', '5.00'):
+            self.add_transaction(amount)
+        self.add_transaction('50.00', type='IN')
+        with self.assertNumQueries(14):
+            Transaction.objects.filter(user=self.user, type='OUT').delete()
+        self.assert_derived_data_consistent()
+
+
+class SyncFeedTests(BudgetTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+        self.url = reverse('budget:api_sync')
+
+    def sync(self, cursor=None, **params):
+        if cursor:
+            params['cursor'] = cursor
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def changed(self, feed):
+        return [(change['resource'], change['id'], change.get('deleted', False)) for change in feed['changes']]
+
+    def test_first_sync_returns_everything(self):
+        expense = self.add_transaction('12.00')
+        feed = self.sync()
+        self.assertEqual(self.changed(feed), [
+            ('categories', self.category.pk, False),
+            ('accounts', self.account.pk, False),
+            ('transactions', expense.pk, False),
+        ])
+        self.assertFalse(feed['more'])
+        self.assertEqual(feed['changes'][2]['data']['amount'], '12.00')
+        self.assertIn('updated_at', feed['changes'][2]['data'])
+
+    def test_only_changes_after_the_cursor(self):
+        kept = self.add_transaction('12.00')
+        edited = self.add_transaction('8.00')
+        cursor = self.sync()['cursor']
+        self.assertEqual(self.sync(cursor)['changes'], [])
+
+        edited.amount = Decimal('9.00')
+        edited.save()
+        added = self.add_transaction('1.00')
+        feed = self.sync(cursor)
+        # Saving a transaction moves the account balance with an UPDATE, not a save of the account.
+        self.assertEqual(self.changed(feed), [
+            ('transactions', edited.pk, False),
+            ('transactions', added.pk, False),
+        ])
+        self.assertNotIn(kept.pk, [change['id'] for change in feed['changes']])
+        self.assertEqual(self.sync(feed['cursor'])['changes'], [])
+
+    def test_deletes_leave_tombstones(self):
+        single = self.add_transaction('1.00')
+        bulk = [self.add_transaction('2.00'), self.add_transaction('3.00', type='IN')]
+        other = BankAccount.objects.create(user=self.user, name_account='Second', initial_balance=0)
+        cascaded = self.add_transaction('4.00', account=other)
+        cursor = self.sync()['cursor']
+        expected = [
+            ('transactions', single.pk, True),
+            ('transactions', bulk[0].pk, True),
+            ('transactions', bulk[1].pk, True),
+            ('transactions', cascaded.pk, True),
+            ('accounts', other.pk, True),
+        ]
+
+        single.delete()
+        Transaction.objects.filter(pk__in=[row.pk for row in bulk]).delete()
+        other.delete()
+        self.assertCountEqual(self.changed(self.sync(cursor)), expected)
+        self.assertEqual(Tombstone.objects.filter(object_id=cascaded.pk).count(), 1)
+
+    def test_deleting_a_user_removes_sync_state(self):
+        other = BankAccount.objects.create(user=self.user, name_account='Second', initial_balance=0)
+        self.add_transaction('4.00', account=other)
+        self.add_transaction('5.00')
+        other.delete()
+        user_id = self.user.pk
+        self.assertTrue(SyncState.objects.filter(user_id=user_id).exists())
+        self.assertTrue(Tombstone.objects.filter(user_id=user_id).exists())
+
+        self.user.delete()
+        connection.check_constraints()
+        self.assertFalse(SyncState.objects.filter(user_id=user_id).exists())
+        self.assertFalse(Tombstone.objects.filter(user_id=user_id).exists())
+        self.assertFalse(MonthlyCategoryRollup.objects.filter(user_id=user_id).exists())
+
+    def test_pages_follow_the_cursor(self):
+        for amount in range(1, 8):
+            self.add_transaction(f'{amount}.00')
+        seen, cursor = [], None
+        while True:
+            feed = self.sync(cursor, limit=3)
+            seen.extend(change['id'] for change in feed['changes'] if change['resource'] == 'transactions')
+            cursor = feed['cursor']
+            if not feed['more']:
+                break
+        self.assertEqual(seen, list(Transaction.objects.order_by('pk').values_list('pk', flat=True)))
+
+    def test_version_zero_rows_from_seeding_are_paged_by_id(self):
+        user = BudgetSeeder(seed=3, years=1).seed_users(1, transactions=30)[0]
+        self.client.force_login(user)
+        ids, cursor = [], None
+        while True:
+            feed = self.sync(cursor, limit=7)
+            ids.extend((change['resource'], change['id']) for change in feed['changes'])
+            cursor = feed['cursor']
+            if not feed['more']:
+                break
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(sum(resource == 'transactions' for resource, _ in ids), 30)
+
+    def test_cost_does_not_depend_on_ledger_size(self):
+        self.add_transaction('1.00')
+        cursor = self.sync()['cursor']
+        self.add_transaction('2.00')
+
+        def queries():
+            with CaptureQueriesContext(connection) as captured:
+                self.assertEqual(len(self.sync(cursor)['changes']), 1)
+            return len(captured)
+
+        small = queries()
+        for _ in range(50):
+            self.add_transaction('3.00')
+        cursor = self.sync()['cursor']
+        self.add_transaction('2.00')
+        self.assertEqual(queries(), small)
+
+    def test_rejects_bad_cursor_and_anonymous(self):
+        self.assertEqual(self.client.get(self.url, {'cursor': 'abc'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'cursor': '1-9-1'}).status_code, 400)
+        self.client.logout()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+
+@contextmanager
+def async_views_routed():
+    # budget.urls picks its views when it is imported.
+    def reload_urls():
+        importlib.reload(importlib.import_module('budget.urls'))
+        importlib.reload(importlib.import_module(settings.ROOT_URLCONF))
+        clear_url_caches()
+
+    try:
+        with override_settings(BUDGET_ASYNC_VIEWS=True):
+            reload_urls()
+            yield
+    finally:
+        reload_urls()
+
+
+class AsyncViewsTests(BudgetTestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.enterClassContext(async_views_routed())
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        SavingsAccount.objects.create(user=cls.user, saving_name='Lokata', saving_balance=Decimal('100.00'))
+        start = timezone.now()
+        for i in range(15):
+            Transaction.objects.create(
+                user=cls.user, account=cls.account, category=cls.category,
+                amount=Decimal(i + 1), type='IN' if i % 4 == 0 else 'OUT', date=start - timedelta(days=i),
+            )
+
+    def sync_context(self, view, **params):
+        request = RequestFactory().get('/', params)
+        request.user = self.user
+        context = view.as_view()(request).context_data
+        # Evaluate lazy querysets here, outside the event loop.
+        for key in ('transactions', 'categories'):
+            if key in context:
+                context[key] = list(context[key])
+        return context
+
+    def test_urls_route_to_async_views(self):
+        self.assertTrue(settings.BUDGET_ASYNC_VIEWS)
+        for name, view in (('expense', async_views.ExpenseListView),
+                           ('account', async_views.BankAccountListView),
+                           ('statistics', async_views.StatisticsListView)):
+            self.assertIs(self.client.get(reverse(f'budget:{name}')).resolver_match.func.view_class, view)
+
+    async def test_dashboard_matches_sync_view(self):
+        await self.async_client.aforce_login(self.user)
+        for params in ({}, {'page': '2'}):
+            response = await self.async_client.get(reverse('budget:expense'), params)
+            self.assertEqual(response.status_code, 200)
+            expected = await sync_to_async(self.sync_context)(views.ExpenseListView, **params)
+            for key in ('total_expenses', 'total_balance', 'transaction_count', 'savings_count',
+                        'total_savings', 'is_paginated'):
+                self.assertEqual(response.context[key], expected[key], key)
+            self.assertEqual([row.pk for row in response.context['transactions']],
+                             [row.pk for row in expected['transactions']])
+            self.assertEqual(response.context['categories'], expected['categories'])
+
+    async def test_dashboard_keyset_pages(self):
+        await self.async_client.aforce_login(self.user)
+        first = (await self.async_client.get(reverse('budget:expense'))).context['page_obj']
+        second = (await self.async_client.get(
+            reverse('budget:expense'), {'after': first.next_cursor}
+        )).context['page_obj']
+        back = (await self.async_client.get(
+            reverse('budget:expense'), {'before': second.prev_cursor}
+        )).context['page_obj']
+        self.assertEqual(len(first) + len(second), 15)
+        self.assertEqual([row.pk for row in back], [row.pk for row in first])
+        self.assertEqual((await self.async_client.get(reverse('budget:expense'), {'page': '9'})).status_code, 404)
+
+    async def test_statistics_and_accounts_match_sync_views(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('budget:statistics'), {'start': '2000-01-01'})
+        expected = await sync_to_async(self.sync_context)(views.StatisticsListView, start='2000-01-01')
+        for key in ('labels', 'values', 'incomes'):
+            self.assertEqual(response.context[key], expected[key])
+
+        response = await self.async_client.get(reverse('budget:account'))
+        account = response.context['accounts'][0]
+        self.assertEqual(account.total_balance, await sync_to_async(self.account.compute_balance)())
+        self.assertIsNotNone(account.last_transaction_date)
+
+    async def test_account_form_posts_through_the_sync_view(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.post(reverse('budget:account'), {
+            'name_account': 'Savings', 'account_type': 'ADULT', 'initial_balance': '50.00',
+        })
+        self.assertRedirects(response, reverse('budget:account'), fetch_redirect_response=False)
+        account = await BankAccount.objects.aget(user=self.user, name_account='Savings')
+        self.assertEqual(account.balance, Decimal('50.00'))
+
+    async def test_metrics_middleware_runs_async(self):
+        metrics.reset()
+        await self.async_client.aforce_login(self.user)
+        await self.async_client.get(reverse('budget:expense'))
+        self.assertEqual(metrics.REQUESTS.values[('budget:expense', 'GET', '200')], 1)
+        # session, user, summary, categories and one page of transactions
+        self.assertEqual(metrics.REQUEST_QUERIES.values[('budget:expense',)][-2], 5)
+
+    @override_settings(BUDGET_SQL_PROFILING=True)
+    async def test_sql_profiling_middleware_runs_async(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('budget:expense'))
+        self.assertEqual(response['X-SQL-Queries'], '5')
+
+    async def test_anonymous_users_are_redirected(self):
+        for name in ('expense', 'account', 'statistics'):
+            response = await self.async_client.get(reverse(f'budget:{name}'))
+            self.assertEqual(response.status_code, 302)
+            self.assertIn('login', response['Location'])
+
+
+class TaskQueueTests(BudgetTestCase):
+    CSV = "date,amount,type,category\n2025-03-01,120.00,IN,Salary\n2025-03-02,-15.40,,Food\n2025-03-03,abc,OUT,Food\n"
+
+    def setUp(self):
+        super().setUp()
+        files = TemporaryDirectory()
+        self.addCleanup(files.cleanup)
+        self.files_dir = Path(files.name)
+        self.enterContext(override_settings(BUDGET_TASK_FILES_DIR=files.name))
+        registry = dict(tasks.REGISTRY)
+        self.addCleanup(lambda: (tasks.REGISTRY.clear(), tasks.REGISTRY.update(registry)))
+
+    def run_worker(self, **options):
+        out = StringIO()
+        call_command('run_tasks', once=True, stdout=out, **options)
+        return out.getvalue()
+
+    def test_large_import_is_queued_and_polled(self):
+        self.client.force_login(self.user)
+        upload = SimpleUploadedFile('statement.csv', self.CSV.encode())
+        with override_settings(BUDGET_TASK_INLINE_IMPORT_BYTES=10):
+            response = self.client.post(reverse('budget:expense_import'), {'file': upload, 'account': self.account.pk})
+        task = response.context['task']
+        self.assertTrue((self.files_dir / task.input.name).is_file())
+        self.assertFalse(Transaction.objects.exists())
+        status_url = reverse('budget:task_status', args=[task.pk])
+        self.assertEqual(self.client.get(status_url).json()['status'], Task.QUEUED)
+
+        self.assertIn('Ran 1 tasks.', self.run_worker())
+        status = self.client.get(status_url).json()
+        self.assertEqual(status['status'], Task.SUCCEEDED)
+        self.assertEqual((status['result']['created'], status['result']['rejected']), (2, 1))
+        self.assertEqual(status['done'], 3)
+        self.assertEqual(BankAccount.objects.get(pk=self.account.pk).balance, Decimal('104.60'))
+
+        other = User.objects.create_user(username='piotr', password='secret-pass-123')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(status_url).status_code, 404)
+
+    def test_background_export_can_be_downloaded(self):
+        self.add_transaction('12.50', description='Lunch')
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('budget:expense_export'), {'format': 'csv', 'background': '1'})
+        self.assertEqual(response.status_code, 202)
+        self.run_worker()
+
+        status = self.client.get(response.json()['status']).json()
+        self.assertEqual(status['result'], {'rows': 1})
+        output = Task.objects.get(pk=status['id']).output
+        self.assertEqual(Path(output.path).parent.parent.parent, self.files_dir / 'output')
+        download = self.client.get(status['download'])
+        self.assertIn('Lunch', b''.join(download.streaming_content).decode())
+
+    def test_failed_task_is_retried_then_marked_failed(self):
+        calls = []
+
+        @tasks.task(name='flaky', max_attempts=2, retry_delay=60)
+        def flaky(job, fail):
+            calls.append(job.attempts)
+            if fail:
+                raise RuntimeError('boom')
+
+        job = tasks.enqueue('flaky', fail=True)
+        with self.assertLogs('budget.tasks', 'ERROR'):
+            self.run_worker()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Task.QUEUED, 1))
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertIn('boom', job.error)
+        self.run_worker()
+        self.assertEqual(calls, [1])  # Not due yet.
+
+        Task.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        with self.assertLogs('budget.tasks', 'ERROR'):
+            self.run_worker()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, calls), (Task.FAILED, 2, [1, 2]))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_concurrency_limit_per_task_name(self):
+        tasks.task(name='single', concurrency=1)(lambda job: None)
+        tasks.task(name='other')(lambda job: None)
+        busy = tasks.enqueue('single')
+        waiting = tasks.enqueue('single')
+        other = tasks.enqueue('other')
+        self.assertEqual(tasks.claim('worker-a'), busy)
+
+        self.assertEqual(tasks.claim('worker-b'), other)
+        self.assertIsNone(tasks.claim('worker-b'))
+        tasks.execute(Task.objects.get(pk=busy.pk))
+        self.assertEqual(tasks.claim('worker-b'), waiting)
+
+    def test_stale_tasks_are_requeued(self):
+        tasks.task(name='slow', max_attempts=2)(lambda job: None)
+        job = tasks.enqueue('slow')
+        tasks.claim('gone')
+        Task.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - timedelta(hours=2))
+        self.assertEqual(tasks.requeue_stale(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Task.QUEUED)
+        self.assertIn('gone', job.error)
+
+    def test_max_tasks_and_purge(self):
+        tasks.task(name='noop')(lambda job: {'ok': True})
+        for _ in range(3):
+            tasks.enqueue('noop')
+        self.assertIn('Ran 2 tasks.', self.run_worker(max_tasks=2))
+        self.assertEqual(Task.objects.filter(status=Task.SUCCEEDED).count(), 2)
+
+        Task.objects.filter(status=Task.SUCCEEDED).update(finished_at=timezone.now() - timedelta(days=30))
+        self.assertEqual(tasks.purge_finished(), 2)
+        self.assertEqual(Task.objects.count(), 1)
@@ -1,24 +1,46 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import api, async_views, views
 from .views import SavingCreateView, SavingDetailView, SavingListView
 
 app_name = 'budget'
 
+if settings.BUDGET_ASYNC_VIEWS:
+    ExpenseListView = async_views.ExpenseListView
+    AccountView = async_views.BankAccountListView
+    StatisticsListView = async_views.StatisticsListView
+else:
+    ExpenseListView = views.ExpenseListView
+    AccountView = views.BankAccountCreateView
+    StatisticsListView = views.StatisticsListView
+
 urlpatterns = [
     path('login/', views.LoginView.as_view(), name='login'),
     path('logout/', views.LogoutView.as_view(), name='logout'),
     path('register/', views.RegisterView.as_view(), name='register'),
-    path('', views.ExpenseListView.as_view(), name='expense'),
-    path('account/', views.BankAccountCreateView.as_view(), name='account'),
+    path('', ExpenseListView.as_view(), name='expense'),
+    path('account/', AccountView.as_view(), name='account'),
     path('account/create/', views.BankAccountCreateView.as_view(), name='account_create'),
     path('account/update/<int:pk>/', views.BankAccountUpdateView.as_view(), name='account_update'),
     path('account/delete/<int:pk>/', views.BankAccountDeleteView.as_view(), name='account_delete'),
     path('expense/add/', views.ExpenseCreateView.as_view(), name='expense_add'),
+    path('expense/export/', views.TransactionExportView.as_view(), name='expense_export'),
+    path('expense/import/', views.TransactionImportView.as_view(), name='expense_import'),
     path('expense/<int:pk>/', views.ExpenseDetailView.as_view(), name='expense_detail'),
     path('category/add/', views.CategoryCreateView.as_view(), name='category_add'),
     path('saving/add/', SavingCreateView.as_view(), name='saving_add'),
     path('saving/<int:pk>/', SavingDetailView.as_view(), name='saving_detail'),
     path('saving/', SavingListView.as_view(), name='saving_list'),
-    path('statistics/', views.StatisticsListView.as_view(), name='statistics'),
+    path('statistics/', StatisticsListView.as_view(), name='statistics'),
+    path('cache/stats/', views.CacheStatsView.as_view(), name='cache_stats'),
+    path('sql/profile/', views.SQLProfileView.as_view(), name='sql_profile'),
+    path('tasks/<int:pk>/', views.TaskStatusView.as_view(), name='task_status'),
+    path('tasks/<int:pk>/download/', views.TaskDownloadView.as_view(), name='task_download'),
+
+]
 
+urlpatterns += [
+    path(f'api/{name}/', api.ResourceView.as_view(resource=resource), name=f'api_{name}')
+    for name, resource in api.RESOURCES.items()
 ]
+urlpatterns.append(path('api/sync/', api.SyncView.as_view(), name='api_sync'))
@@ -1,10 +1,13 @@
 from django.shortcuts import render, redirect
-from django.contrib.auth.mixins import LoginRequiredMixin
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.auth import authenticate, login, logout
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.forms import AuthenticationForm, UserCreationForm
+from django.db import transaction
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
 from django.urls import reverse, reverse_lazy
-from django.db.models import Sum
+from django.utils.dateparse import parse_date
 from django.views.generic import (
     CreateView,
     ListView,
@@ -12,6 +15,7 @@ from django.views.generic import (
     UpdateView,
     DeleteView,
     FormView,
+    TemplateView,
     View
 )
 
@@ -19,14 +23,24 @@ from .models import (
     Transaction,
     Category,
     BankAccount,
-    SavingsAccount
+    SavingsAccount,
+    Task
 )
+from . import tasks
+from .caching import cache_stats, cached_for_user
+from .exporters import EXPORT_FORMATS, export_rows
+from .importers import TransactionImporter, detect_format, iter_rows, open_text
+from . import metrics
+from .pagination import keyset_paginate
+from .profiling import profiling_summary
+from .services import category_statistics, dashboard_summary, provision_default_categories
 from .forms import (
     RegisterForm,
     BankAccountForm,
     BankAccountCreateForm,
     SavingAccountForm,
-    TransactionForm
+    TransactionForm,
+    TransactionImportForm
 )
 import json
 
@@ -36,25 +50,11 @@ class RegisterView(CreateView):
     success_url = reverse_lazy('budget:expense')
 
     def form_valid(self, form):
-        response = super().form_valid(form)
+        with transaction.atomic():
+            response = super().form_valid(form)
+            provision_default_categories([self.object])
         login(self.request, self.object)
 
-        default_categories = [
-            'Food',
-            'Bills',
-            'Transport',
-            'Entertainment',
-            'Shopping',
-            'Life',
-            'Investments',
-            'Other',
-        ]
-        for name in default_categories:
-            Category.objects.get_or_create(
-                user=self.object,
-                name=name
-            )
-
         return response
 
 
@@ -64,24 +64,32 @@ class ExpenseListView(LoginRequiredMixin, ListView):
     paginate_by = 10
 
     def get_queryset(self):
-        return Transaction.objects.filter(account__user=self.request.user).order_by('-date')
+        return Transaction.objects.filter(user=self.request.user).with_related().order_by('-date', '-id')
+
+    def paginate_queryset(self, queryset, page_size):
+        # ?page=N keeps the old OFFSET pagination; everything else is keyset-paginated
+        # on (date, id) with ?after=/?before= cursors and no COUNT(*).
+        if self.page_kwarg in self.request.GET or self.page_kwarg in self.kwargs:
+            return super().paginate_queryset(queryset, page_size)
+        page = keyset_paginate(
+            queryset,
+            page_size,
+            after=self.request.GET.get('after'),
+            before=self.request.GET.get('before'),
+        )
+        return None, page, page.object_list, page.has_next or page.has_previous
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        user_transactions = Transaction.objects.filter(user=self.request.user)
-        total_in = user_transactions.filter(type='IN').aggregate(Sum('amount'))['amount__sum'] or 0
-        total_out = user_transactions.filter(type='OUT').aggregate(Sum('amount'))['amount__sum'] or 0
+        user = self.request.user
+        summary = cached_for_user(user.pk, 'dashboard', lambda: dashboard_summary(user))
 
-        total_balance = total_in - total_out
         context['categories'] = Category.objects.filter(user=self.request.user)
-        context['total_expenses'] = total_out
-        context['total_balance'] = total_balance
-        context['transaction_count'] = BankAccount.objects.filter(user=self.request.user).count()
-
-        context['savings_count'] = SavingsAccount.objects.filter(user=self.request.user).count()
-        context['total_savings'] = SavingsAccount.objects.filter(user=self.request.user).aggregate(
-            total_sum=Sum('saving_balance')
-        )['total_sum'] or 0
+        context['total_expenses'] = summary['total_out']
+        context['total_balance'] = summary['total_balance']
+        context['transaction_count'] = summary['account_count']
+        context['savings_count'] = summary['savings_count']
+        context['total_savings'] = summary['total_savings']
 
         return context
 
@@ -92,7 +100,7 @@ class BankAccountListView(LoginRequiredMixin, ListView):
     context_object_name = 'accounts'
 
     def get_queryset(self):
-        return BankAccount.objects.filter(user=self.request.user)
+        return BankAccount.objects.filter(user=self.request.user).with_totals()
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -136,7 +144,7 @@ class BankAccountCreateView(LoginRequiredMixin, CreateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['accounts'] = BankAccount.objects.filter(user=self.request.user)
+        context['accounts'] = BankAccount.objects.filter(user=self.request.user).with_totals()
         return context
 
 
@@ -190,6 +198,31 @@ class ExpenseCreateView(LoginRequiredMixin, CreateView):
         return super().form_valid(form)
 
 
+class TransactionImportView(LoginRequiredMixin, FormView):
+    form_class = TransactionImportForm
+    template_name = 'budget/transaction_import.html'
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['user'] = self.request.user
+        return kwargs
+
+    def form_valid(self, form):
+        upload = form.cleaned_data['file']
+        file_format = form.cleaned_data['file_format'] or detect_format(upload.name)
+        account = form.cleaned_data['account']
+        if upload.size > settings.BUDGET_TASK_INLINE_IMPORT_BYTES:
+            # Large statements go to a worker; the page polls the task instead of waiting.
+            task = tasks.enqueue(
+                'import_transactions', user=self.request.user, input=upload,
+                account=account.pk if account else None, file_format=file_format,
+            )
+            return self.render_to_response(self.get_context_data(form=form, task=task))
+        importer = TransactionImporter(self.request.user, account=account)
+        result = importer.run(iter_rows(open_text(upload.file), file_format))
+        return self.render_to_response(self.get_context_data(form=form, result=result))
+
+
 class LogoutView(View):
     def get(self, request, *args, **kwargs):
         logout(request)
@@ -202,7 +235,7 @@ class ExpenseDetailView(DetailView):
     context_object_name = 'expense'
 
     def get_queryset(self):
-        return Transaction.objects.filter(user=self.request.user).order_by('-date')
+        return Transaction.objects.filter(user=self.request.user).with_related()
 
 
 class CategoryCreateView(LoginRequiredMixin, CreateView):
@@ -247,25 +280,123 @@ class SavingListView(LoginRequiredMixin, ListView):
         return SavingsAccount.objects.filter(user=self.request.user).order_by('-id')
 
 
-class StatisticsListView(ListView):
-    template_name = 'budget/statistics.html'
-    def get_queryset(self):
-        data_query = Transaction.objects.filter(user=self.request.user).annotate(total=Sum('amount'))
+class TransactionFilterMixin:
+    """Optional ?start=, ?end= (YYYY-MM-DD) and ?account= filters."""
+
+    def get_date(self, name):
+        try:
+            return parse_date(self.request.GET.get(name, ''))
+        except ValueError:
+            return None
+
+    def get_filters(self):
+        account = self.request.GET.get('account')
+        return {
+            'start': self.get_date('start'),
+            'end': self.get_date('end'),
+            'account': int(account) if account and account.isdigit() else None,
+        }
 
-        return data_query
+
+class StatisticsListView(LoginRequiredMixin, TransactionFilterMixin, TemplateView):
+    template_name = 'budget/statistics.html'
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        data_query = self.object_list.values('category__name', 'total')
-        labels = [item['category__name'] for item in data_query if item['category__name']]
-        values = [float(item['total']) for item in data_query]
-
-        context['labels'] = json.dumps([labels])
-        context['values'] = json.dumps(values)
+        user = self.request.user
+        filters = self.get_filters()
+        series = cached_for_user(
+            user.pk,
+            'statistics',
+            lambda: category_statistics(user, **filters),
+            *filters.values()
+        )
+
+        context['labels'] = json.dumps(series['labels'])
+        context['values'] = json.dumps(series['outcomes'])
+        context['incomes'] = json.dumps(series['incomes'])
 
         return context
 
 
+class TransactionExportView(LoginRequiredMixin, TransactionFilterMixin, View):
+    def get(self, request, *args, **kwargs):
+        file_format = request.GET.get('format', 'csv')
+        if file_format not in EXPORT_FORMATS:
+            return HttpResponseBadRequest('Unsupported export format.')
+        render_rows, content_type = EXPORT_FORMATS[file_format]
+
+        filters = self.get_filters()
+        if request.GET.get('background'):
+            task = tasks.enqueue(
+                'export_transactions', user=request.user, file_format=file_format,
+                start=filters['start'] and filters['start'].isoformat(),
+                end=filters['end'] and filters['end'].isoformat(),
+                account=filters['account'],
+            )
+            return JsonResponse(
+                {'task': task.pk, 'status': reverse('budget:task_status', args=[task.pk])}, status=202,
+            )
+
+        rows = export_rows(request.user, **filters)
+        response = StreamingHttpResponse(render_rows(rows), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="transactions.{file_format}"'
+        return response
+
+
+class TaskStatusView(LoginRequiredMixin, View):
+    """Progress of one of the user's background tasks, for pages that poll it."""
 
+    def get_task(self):
+        try:
+            return Task.objects.get(pk=self.kwargs['pk'], user=self.request.user)
+        except Task.DoesNotExist:
+            raise Http404('No such task.')
 
+    def get(self, request, *args, **kwargs):
+        task = self.get_task()
+        return JsonResponse({
+            'id': task.pk,
+            'name': task.name,
+            'status': task.status,
+            'finished': task.finished,
+            'attempts': task.attempts,
+            'done': task.done,
+            'total': task.total,
+            'message': task.message,
+            'result': task.result,
+            # Tracebacks stay in the logs and the admin.
+            'error': 'The task failed.' if task.status == Task.FAILED else None,
+            'download': reverse('budget:task_download', args=[task.pk]) if task.output else None,
+        })
+
+
+class TaskDownloadView(TaskStatusView):
+    def get(self, request, *args, **kwargs):
+        task = self.get_task()
+        if not task.output:
+            raise Http404('This task has no file.')
+        return FileResponse(task.output.open('rb'), as_attachment=True, filename=task.output.name.rsplit('/', 1)[-1])
 
+
+class CacheStatsView(LoginRequiredMixin, UserPassesTestMixin, View):
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get(self, request, *args, **kwargs):
+        return JsonResponse(cache_stats())
+
+
+class SQLProfileView(CacheStatsView):
+    def get(self, request, *args, **kwargs):
+        return JsonResponse(profiling_summary())
+
+
+class MetricsView(View):
+    def get(self, request, *args, **kwargs):
+        if not settings.BUDGET_METRICS:
+            raise Http404
+        token = settings.BUDGET_METRICS_TOKEN
+        if token and request.headers.get('Authorization') != f"Bearer {token}":
+            return HttpResponse(status=401)
+        return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE)
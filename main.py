@@ -1,21 +1,31 @@
 import hashlib
-import json
 import os
 from typing import Dict, Optional
 from decimal import Decimal
 from account.account_user.users import User, UserType
 from bank_accounts import BankAccount
 from expenses import Expense, Category
+from account.utils import columnar
+from account.utils.columnar import ColumnarSnapshot, ExpenseStore
+from account.utils.journal import Journal
 import datetime
+import itertools
 
 DATA_FILE = 'account/account_data/data/budget_data.json'
+BINARY_DATA_FILE = 'account/account_data/data/budget_data.bin'
+JOURNAL_FILE = 'account/account_data/data/budget_data.journal'
+# 'json' or 'binary' (columnar, memory-mapped; see account/utils/columnar.py)
+SNAPSHOT_FORMAT = os.getenv('BUDGET_SNAPSHOT_FORMAT', 'json')
+EXPENSE_PAGE_SIZE = 20
 
 
 def default_serializer(obj):
     if isinstance(obj, (datetime.date, datetime.datetime)):
         return obj.isoformat()
     if isinstance(obj, (User, BankAccount, Expense)):
-        return {k: v for k, v in obj.__dict__.items() if not k.startswith('__')}
+        return {k: getattr(obj, k) for k in obj.__slots__}
+    if isinstance(obj, set):
+        return sorted(obj)
     elif isinstance(obj, Decimal):
         return str(obj)
     elif isinstance(obj, (UserType, Category)):
@@ -25,10 +35,12 @@ def default_serializer(obj):
 
 
 class Interface:
-    def __init__(self):
+    def __init__(self, load: bool = True):
         self.all_users: Dict[int, User] = {}
         self.all_bank_accounts: Dict[int, BankAccount] = {}
         self.all_expenses: Dict[int, Expense] = {}
+        # casefolded username -> user_id, kept in step by index_user()
+        self.user_ids_by_name: Dict[str, int] = {}
 
         self.next_user_id = 1
         self.next_account_id = 1
@@ -36,83 +48,188 @@ class Interface:
 
         self.current_user_id: Optional[int] = None
 
-        self.load_data()
+        if SNAPSHOT_FORMAT == 'binary':
+            self.journal = Journal(BINARY_DATA_FILE, JOURNAL_FILE, default=default_serializer,
+                                   reader=columnar.read, writer=columnar.write)
+        else:
+            self.journal = Journal(DATA_FILE, JOURNAL_FILE, default=default_serializer)
+        if load:
+            self.load_data()
 
 
     def load_data(self):
-        if not os.path.exists(DATA_FILE):
-            print(f"INFO: Data file '{DATA_FILE}' doesn't exist. Starting with empty database.")
-            return
-
         try:
-            with open(DATA_FILE, 'r') as f:
-                data = json.load(f)
-            for user_data in data.get('users', []):
-                user_type = UserType(user_data['user_type'])
-
-                user = User(
-                    username="temp",
-                    user_type=user_type,
-                    user_id=user_data['user_id']
-                )
-
-                user._username = user_data['_username']
-
-                user.set_password_hash(user_data['_password_hash'])
-
-                user.assigned_account = [int(aid) for aid in user_data['assigned_account']]  # KLUCZOWE
-                user.assigned_expense = [int(eid) for eid in user_data['assigned_expense']]
-
-                self.all_users[user.user_id] = user
-                self.next_user_id = max(self.next_user_id, user.user_id + 1)
-
-            for account_data in data.get('bank_accounts', []):
-                account = BankAccount(
-                    account_id=account_data['account_id'],
-                    user_id=account_data['user_id'],
-                    account_type=account_data['account_type'],
-                    initial_balance=Decimal(account_data['balance'])
-                )
-                self.all_bank_accounts[account.account_id] = account
-                self.next_account_id = max(self.next_account_id, account.account_id + 1)
-
-            for expense_data in data.get('expenses', []):
-                expense_id = expense_data['_expense_id']
-
-                expense = Expense(
-                    amount=Decimal(expense_data['amount']),
-                    category=Category(expense_data['category']),
-                    account_id=expense_data['account_id'],
-                    expense_id=expense_id,
-                    description=expense_data['description']
-                )
-                self.all_expenses[expense.expense_id] = expense
-                self.next_expense_id = max(self.next_expense_id, expense.expense_id + 1)
-
-            self.current_user_id = data.get('current_user_id')
-
-            print(f"Data loaded successfully {DATA_FILE}. Found: {len(self.all_users)} users.")
+            data = self.journal.read_snapshot()
+            if data is None:
+                print(f"INFO: Data file '{self.journal.snapshot_path}' doesn't exist. Starting with empty database.")
+            elif isinstance(data, ColumnarSnapshot):
+                self.load_columnar(data)
+            else:
+                self.load_snapshot(data)
+
+            for entry in self.journal.replay():
+                self.apply_entry(entry)
+
+            print(f"Data loaded successfully {self.journal.snapshot_path}. Found: {len(self.all_users)} users.")
 
         except Exception as e:
-            print(f"Can't load JSON data: {e}")
+            print(f"Can't load data from '{self.journal.snapshot_path}': {e}")
+
+
+    def load_snapshot(self, data):
+        for user_data in data.get('users', []):
+            self.restore_user(user_data)
+        for account_data in data.get('bank_accounts', []):
+            self.restore_account(account_data)
+        for expense_data in data.get('expenses', []):
+            self.restore_expense(expense_data)
+        self.current_user_id = data.get('current_user_id')
+
+
+    def load_columnar(self, snapshot: ColumnarSnapshot):
+        # Users and accounts are few and get decoded now; expenses stay in the
+        # mapped file and are decoded one row at a time by ExpenseStore.
+        for user in snapshot.users():
+            self.all_users[user.user_id] = user
+            self.index_user(user)
+            self.next_user_id = max(self.next_user_id, user.user_id + 1)
+        for account in snapshot.bank_accounts():
+            self.all_bank_accounts[account.account_id] = account
+            self.next_account_id = max(self.next_account_id, account.account_id + 1)
+            owner = self.all_users.get(account.user_id)
+            if owner and account.account_id not in owner.assigned_account:
+                owner.assigned_account.append(account.account_id)
+        self.all_expenses = ExpenseStore(snapshot)
+        self.next_expense_id = max(self.next_expense_id, self.all_expenses.max_id() + 1)
+        self.current_user_id = snapshot.meta.get('current_user_id')
+
+
+    def iter_user_expenses(self, user: User, start: Optional[datetime.date] = None,
+                           end: Optional[datetime.date] = None):
+        """Yield the user's expenses in id order, reading the snapshot lazily when it is mapped."""
+        def in_range(expense):
+            day = expense.date.date()
+            return (start is None or day >= start) and (end is None or day <= end)
+
+        if isinstance(self.all_expenses, ExpenseStore):
+            yield from self.all_expenses.iter_user_expenses(user.user_id, start, end)
+            added = self.all_expenses.added
+            expense_ids = (eid for eid in sorted(user.assigned_expense) if eid in added)
+        else:
+            expense_ids = sorted(user.assigned_expense)
+
+        for expense_id in expense_ids:
+            expense = self.all_expenses.get(expense_id)
+            if expense and in_range(expense):
+                yield expense
 
 
-    def save_data(self):
-        data_to_save = {
+    def restore_user(self, user_data) -> User:
+        user_type = UserType(user_data['user_type'])
+
+        user = User(
+            username="temp",
+            user_type=user_type,
+            user_id=user_data['user_id']
+        )
+
+        user._username = user_data['_username']
+
+        user.set_password_hash(user_data['_password_hash'])
+
+        user.assigned_account = [int(aid) for aid in user_data['assigned_account']]  # KLUCZOWE
+        user.assigned_expense = {int(eid) for eid in user_data['assigned_expense']}
+
+        self.all_users[user.user_id] = user
+        self.index_user(user)
+        self.next_user_id = max(self.next_user_id, user.user_id + 1)
+        return user
+
+
+    def restore_account(self, account_data) -> BankAccount:
+        account = BankAccount(
+            account_id=account_data['account_id'],
+            user_id=account_data['user_id'],
+            account_type=account_data['account_type'],
+            initial_balance=Decimal(account_data['balance'])
+        )
+        account.assigned_expense_ids = {int(eid) for eid in account_data.get('assigned_expense_ids', [])}
+        if account_data.get('_creation_date'):
+            account._creation_date = datetime.datetime.fromisoformat(account_data['_creation_date'])
+        self.all_bank_accounts[account.account_id] = account
+        self.next_account_id = max(self.next_account_id, account.account_id + 1)
+        return account
+
+
+    def restore_expense(self, expense_data) -> Expense:
+        expense_id = expense_data['_expense_id']
+
+        expense = Expense(
+            amount=Decimal(expense_data['amount']),
+            category=Category(expense_data['category']),
+            account_id=expense_data['account_id'],
+            expense_id=expense_id,
+            description=expense_data['description']
+        )
+        if expense_data.get('date'):
+            expense.date = datetime.datetime.fromisoformat(expense_data['date'])
+        self.all_expenses[expense.expense_id] = expense
+        self.next_expense_id = max(self.next_expense_id, expense.expense_id + 1)
+        return expense
+
+
+    def apply_entry(self, entry):
+        # Journal ops carry absolute values, so replaying one twice is harmless.
+        op = entry['op']
+        if op == 'create_user':
+            self.restore_user(entry['user'])
+        elif op == 'add_account':
+            account = self.restore_account(entry['account'])
+            user = self.all_users.get(account.user_id)
+            if user and account.account_id not in user.assigned_account:
+                user.assigned_account.append(account.account_id)
+        elif op == 'add_expense':
+            expense = self.restore_expense(entry['expense'])
+            account = self.all_bank_accounts.get(expense.account_id)
+            if account:
+                account.balance = Decimal(entry['balance'])
+                account.assigned_expense_ids.add(expense.expense_id)
+            user = self.all_users.get(entry['user_id'])
+            if user:
+                user.add_expense(expense.expense_id)
+        elif op == 'session':
+            self.current_user_id = entry['current_user_id']
+
+
+    def record(self, op, **payload):
+        self.journal.append(op, **payload)
+        if self.journal.needs_compaction:
+            self.save_data()
+
+
+    def snapshot(self):
+        expenses = self.all_expenses.values()
+        return {
             'users': list(self.all_users.values()),
             'bank_accounts': list(self.all_bank_accounts.values()),
-            'expenses': list(self.all_expenses.values()),
+            # ExpenseStore yields in id order without decoding everything up front
+            'expenses': expenses if isinstance(self.all_expenses, ExpenseStore) else list(expenses),
             'current_user_id': self.current_user_id,
             'next_user_id': self.next_user_id,
             'next_account_id': self.next_account_id,
             'next_expense_id': self.next_expense_id,
         }
+
+
+    def save_data(self):
+        """Fold the journal into a fresh snapshot; individual changes are already journaled."""
+        if not self.journal.pending:
+            return
         try:
-            with open(DATA_FILE, 'w') as f:
-                json.dump(data_to_save, f, indent=4, default=default_serializer)
-            print(f"\nData saved successfully to {DATA_FILE}.")
+            self.journal.compact(self.snapshot())
+            print(f"\nData saved successfully to {self.journal.snapshot_path}.")
         except Exception as e:
-            print(f"Can't load JSON data: {e}")
+            print(f"Can't save JSON data: {e}")
 
 
     def get_current_user(self) -> User | None:
@@ -121,11 +238,15 @@ class Interface:
         return self.all_users.get(self.current_user_id)
 
 
+    def index_user(self, user: User):
+        self.user_ids_by_name[user.username.casefold()] = user.user_id
+
+
     def find_user_by_username(self, username: str) -> User | None:
-        for user in self.all_users.values():
-            if user.username.lower() == username.lower():
-                return user
-        return None
+        user_id = self.user_ids_by_name.get(username.strip().casefold())
+        if user_id is None:
+            return None
+        return self.all_users.get(user_id)
 
 
     def create_new_user_interface(self):
@@ -162,8 +283,11 @@ class Interface:
         new_user.set_password_hash(password_hash)
 
         self.all_users[self.next_user_id] = new_user
+        self.index_user(new_user)
         self.next_user_id += 1
         self.current_user_id = new_user.user_id
+        self.record('create_user', user=new_user)
+        self.record('session', current_user_id=self.current_user_id)
 
         print(f"\nCreated and logged in as {username.upper()}.")
 
@@ -183,6 +307,7 @@ class Interface:
 
         if user.verify_password(input_hash):
             self.current_user_id = user.user_id
+            self.record('session', current_user_id=self.current_user_id)
             print(f"Singed in! Welcome, {user.username}.")
         else:
             print("Incorrect username or password")
@@ -222,6 +347,7 @@ class Interface:
         success, message = current_user.add_account(new_account)
 
         if success:
+            self.record('add_account', account=new_account)
             print(f"SUCCESS: {message}")
         else:
             print(f"ERROR: {message}")
@@ -327,36 +453,58 @@ class Interface:
             curr_user.add_expense(new_id)
 
             selected_acc.add_expense_id(new_id)
+            self.record('add_expense', expense=new_expense, user_id=curr_user.user_id,
+                        balance=selected_acc.balance)
 
             print(f"EXPENSE {new_expense.category.value.capitalize()}: {new_expense.amount:.2f}")
         else:
             print("Transaction cancelled.")
 
 
+    def ask_date(self, prompt: str) -> Optional[datetime.date]:
+        while True:
+            value = input(prompt).strip()
+            if not value:
+                return None
+            try:
+                return datetime.date.fromisoformat(value)
+            except ValueError:
+                print("Incorrect format. (e.g. 2025-01-31)")
+
+
     def show_user_expenses_interface(self):
         current_user = self.get_current_user()
         if current_user is None:
             print("You have to be signed in.")
             return
 
-        expense_ids = current_user.assigned_expense
+        start = self.ask_date("From date (YYYY-MM-DD, empty for all): ")
+        end = self.ask_date("To date (YYYY-MM-DD, empty for all): ")
+
+        expenses = self.iter_user_expenses(current_user, start, end)
+        page = list(itertools.islice(expenses, EXPENSE_PAGE_SIZE))
 
-        if not expense_ids:
-            print(f"\nUser {current_user.username} haven't added any expenses.")
+        if not page:
+            if start or end:
+                print("\nNo expenses found for the selected dates.")
+            else:
+                print(f"\nUser {current_user.username} haven't added any expenses.")
             return
 
         print(f"\n--- EXPENSES FOR {current_user.username.upper()} ---")
 
-        for expense_id in expense_ids:
-            expense = self.all_expenses.get(expense_id)
-
-            if expense:
+        while page:
+            for expense in page:
                 account = self.all_bank_accounts.get(expense.account_id)
                 account_type = account.account_type if account else "Unknown Account"
                 print(
                     f"ID: {expense.expense_id} | Amount: ${expense.amount:.2f} | Category: {expense.category.value} | Paid with: {account_type}")
                 if expense.description:
                     print(f"    Description: {expense.description}")
+
+            page = list(itertools.islice(expenses, EXPENSE_PAGE_SIZE))
+            if page and input("Enter - next page, q - back: ").strip().lower() == 'q':
+                break
         print("---------------------------------------")
 
 
@@ -406,6 +554,7 @@ class Interface:
                     self.add_existing_account_interface()
                 elif choice == '7':
                     self.current_user_id = None; print("Logged Out.")
+                    self.record('session', current_user_id=None)
                 else:
                     print("\nIncorrect choice.")
 